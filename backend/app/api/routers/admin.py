@@ -12,6 +12,11 @@ from sqlalchemy.orm import Session
 from app.api.deps import get_db, require_admin
 from app.models.task import Task
 from app.schemas.task import TaskCreate, TaskPublic, TaskUpdate
+from app.services.checker import answer_matchers
+from app.services.task_cache import task_cache
+from app.services.task_facets import adjust_facet_counts, count_keys, facet_key
+from app.services.task_pool import task_pool
+from app.services.task_search import task_search
 
 router = APIRouter(dependencies=[Depends(require_admin)])
 
@@ -29,8 +34,12 @@ def create_task(payload: TaskCreate, db: Session = Depends(get_db)) -> TaskPubli
         hints=payload.hints,
     )
     db.add(task)
+    adjust_facet_counts(db, {facet_key(task): 1})
     db.commit()
     db.refresh(task)
+    task_pool.upsert(task)
+    task_search.upsert(task)
+    task_cache.invalidate()
     return TaskPublic.model_validate(task)
 
 
@@ -41,10 +50,17 @@ def update_task(task_id: int, payload: TaskUpdate, db: Session = Depends(get_db)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
 
     data = payload.model_dump(exclude_unset=True)
+    old_key = facet_key(task)
     for key, value in data.items():
         setattr(task, key, value)
+    if facet_key(task) != old_key:
+        adjust_facet_counts(db, {old_key: -1, facet_key(task): 1})
     db.commit()
     db.refresh(task)
+    task_pool.upsert(task)
+    task_search.upsert(task)
+    answer_matchers.invalidate(task.id)
+    task_cache.invalidate()
     return TaskPublic.model_validate(task)
 
 
@@ -59,7 +75,7 @@ async def import_tasks_json(
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}") from exc
 
-    created = 0
+    created: list[Task] = []
     for item in items:
         task = Task(
             title=str(item["title"]),
@@ -72,9 +88,14 @@ async def import_tasks_json(
             hints=item.get("hints"),
         )
         db.add(task)
-        created += 1
+        created.append(task)
+    adjust_facet_counts(db, count_keys(created))
     db.commit()
-    return {"created": created}
+    for task in created:
+        task_pool.upsert(task)
+        task_search.upsert(task)
+    task_cache.invalidate()
+    return {"created": len(created)}
 
 
 @router.post("/tasks/import/csv", response_model=dict[str, int])
@@ -86,7 +107,7 @@ async def import_tasks_csv(
     text = raw.decode("utf-8")
     reader = csv.DictReader(io.StringIO(text))
 
-    created = 0
+    created: list[Task] = []
     for row in reader:
         task = Task(
             title=row["title"],
@@ -98,9 +119,14 @@ async def import_tasks_csv(
             correct_answer=row.get("correct_answer") or "",
         )
         db.add(task)
-        created += 1
+        created.append(task)
+    adjust_facet_counts(db, count_keys(created))
     db.commit()
-    return {"created": created}
+    for task in created:
+        task_pool.upsert(task)
+        task_search.upsert(task)
+    task_cache.invalidate()
+    return {"created": len(created)}
 
 
 @router.post("/tasks/bootstrap", response_model=dict[str, int])
@@ -124,5 +150,10 @@ def bootstrap_if_empty(db: Session = Depends(get_db)) -> dict[str, int]:
     ]
     for t in tasks:
         db.add(t)
+    adjust_facet_counts(db, count_keys(tasks))
     db.commit()
+    for t in tasks:
+        task_pool.upsert(t)
+        task_search.upsert(t)
+    task_cache.invalidate()
     return {"created": len(tasks)}
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Any
 
+from fastapi import APIRouter, Depends, Query, WebSocket
+from fastapi.responses import PlainTextResponse
+from starlette.websockets import WebSocketState
+
+from app.api.deps import require_admin, require_metrics_token
 from app.core.security import decode_access_token
+from app.services.metrics import registry
+from app.services.pvp_codec import MSGPACK_SUBPROTOCOL, codec, msgpack_codec
 from app.services.pvp_manager import pvp_manager
 
 router = APIRouter()
@@ -15,12 +22,44 @@ async def ws_pvp(websocket: WebSocket, token: str = Query(...)) -> None:
         await websocket.close(code=4401)
         return
 
-    await websocket.accept()
-    await pvp_manager.connect(user_id=payload.user_id, websocket=websocket)
+    # JSON text frames by default; clients offering the MessagePack subprotocol get binary frames both ways.
+    binary = msgpack_codec is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+    await pvp_manager.connect(user_id=payload.user_id, websocket=websocket, binary=binary)
     try:
         while True:
-            message = await websocket.receive_json()
-            await pvp_manager.handle_message(user_id=payload.user_id, message=message)
-    except WebSocketDisconnect:
-        await pvp_manager.disconnect(user_id=payload.user_id)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            await pvp_manager.handle_message(user_id=payload.user_id, message=_decode(frame, binary))
+    except RuntimeError:
+        # The server closed this socket itself (replaced by a reconnect, reaped, slow consumer).
+        if websocket.application_state != WebSocketState.DISCONNECTED:
+            raise
+    finally:
+        await pvp_manager.disconnect(user_id=payload.user_id, websocket=websocket)
+
+
+def _decode(frame: dict, binary: bool) -> Any:
+    """Message of one websocket frame in the negotiated format, or None if it does not decode."""
+    try:
+        if binary and frame.get("bytes") is not None:
+            return msgpack_codec.loads(frame["bytes"])
+        if not binary and frame.get("text") is not None:
+            return codec.loads(frame["text"])
+    except (ValueError, RecursionError):
+        # json/orjson decode errors and msgpack's format, stack-depth and extra-data errors are ValueErrors.
+        pass
+    return None
+
+
+@router.get("/connections", response_model=list[dict[str, int]], dependencies=[Depends(require_admin)])
+def pvp_connections() -> list[dict[str, int]]:
+    # Per-connection outbound queue depth and counters for this worker.
+    return pvp_manager.connection_stats()
+
 
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+def pvp_metrics() -> PlainTextResponse:
+    # Prometheus text exposition format; counters and histograms are per worker.
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,23 +1,105 @@
 from __future__ import annotations
 
-from typing import Optional
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import and_, or_, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, get_db
+from app.core.config import get_settings
 from app.models.submission import Submission
 from app.models.task import Task
-from app.schemas.submission import SubmissionCreate, SubmissionPublic
-from app.schemas.task import TaskPublic
-from app.services.checker import check_answer
+from app.schemas.submission import (
+    SubmissionBatch,
+    SubmissionBatchItem,
+    SubmissionBatchResult,
+    SubmissionCreate,
+    SubmissionPublic,
+)
+from app.schemas.task import TaskFacets, TaskPublic
+from app.services.checker import CheckTimeout, task_matcher
+from app.services.checker_pool import checker_pool
+from app.services.task_cache import CachedResponse, task_cache
+from app.services.task_facets import facet_counts
+from app.services.task_pool import task_pool
+from app.services.task_search import task_search
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Search results past this rank are not paged through; refine the query instead.
+SEARCH_MAX_RESULTS = 1000
+
+_TASK_LIST = TypeAdapter(list[TaskPublic])
+
+
+def _encode_cursor(last_id: int, filters: list[Any], position: Optional[int] = None) -> str:
+    data: dict[str, Any] = {"id": last_id, "f": filters}
+    if position is not None:
+        data["p"] = position
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, filters: list[Any]) -> tuple[int, Optional[int]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = int(data["id"])
+        position = int(data["p"]) if "p" in data else None
+        cursor_filters = data["f"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from None
+    if cursor_filters != filters:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the filters")
+    return last_id, position
+
+
+def _fulltext_search(db: Session, q: str, where: list) -> list[int]:
+    """Ids of tasks matching q and the filters, best match first (MySQL FULLTEXT, natural language mode)."""
+    relevance = match(Task.title, Task.statement, against=q)
+    stmt = select(Task.id).where(relevance, *where).order_by(relevance.desc(), Task.id.desc())
+    return list(db.scalars(stmt.limit(SEARCH_MAX_RESULTS)))
+
+
+def _resume(ranked: list[int], last_id: int, position: Optional[int]) -> int:
+    # The ranking may have shifted since the cursor was issued (tasks edited): continue after the
+    # last task seen if it is still there, otherwise at the same rank.
+    if position is not None and 0 < position <= len(ranked) and ranked[position - 1] == last_id:
+        return position
+    try:
+        return ranked.index(last_id) + 1
+    except ValueError:
+        return min(position or 0, len(ranked))
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x".
+    if not if_none_match:
+        return False
+    return any(tag.strip() in ("*", etag, f"W/{etag}") for tag in if_none_match.split(","))
+
+
+def _cached_response(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers={**headers, **entry.headers})
+
 
 @router.get("", response_model=list[TaskPublic])
 def list_tasks(
+    request: Request,
     subject: Optional[str] = None,
     topic: Optional[str] = None,
     difficulty_min: Optional[int] = Query(default=None, ge=1),
@@ -25,8 +107,66 @@ def list_tasks(
     q: Optional[str] = None,
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-) -> list[TaskPublic]:
+) -> Response:
+    """
+    Newest tasks first. Page with `cursor` (keyset: WHERE id < last seen id, served by the
+    (filter column, id) indexes) rather than `offset`, which scans and discards every skipped
+    row. The cursor is bound to the filters it was issued for; a page that has more rows after
+    it carries the next cursor in the X-Next-Cursor header.
+
+    With `q`, tasks are ranked by relevance instead (see task_search_backend), and only the
+    first SEARCH_MAX_RESULTS matches can be paged through.
+
+    Pages are served from task_cache with a strong ETag; a client that sends it back in
+    If-None-Match gets 304 until an admin changes the tasks.
+    """
+    if cursor is not None and offset:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either cursor or offset")
+    key = json.dumps(
+        ["list", subject, topic, difficulty_min, difficulty_max, q, limit, offset, cursor], ensure_ascii=False
+    )
+
+    def render() -> CachedResponse:
+        tasks, next_cursor = _list_page(
+            db, subject, topic, difficulty_min, difficulty_max, q, limit=limit, offset=offset, cursor=cursor
+        )
+        body = _TASK_LIST.dump_json([TaskPublic.model_validate(t) for t in tasks])
+        return CachedResponse.render(body, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+    return _cached_response(request, task_cache.get_or_render(key, render))
+
+
+def _list_page(
+    db: Session,
+    subject: Optional[str],
+    topic: Optional[str],
+    difficulty_min: Optional[int],
+    difficulty_max: Optional[int],
+    q: Optional[str],
+    *,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+) -> tuple[list[Task], Optional[str]]:
+    """One page of list_tasks and the cursor of the next page, if there is one."""
+    filters = [subject, topic, difficulty_min, difficulty_max, q]
+    settings = get_settings()
+    search_backend = settings.task_search_backend
+    if q and search_backend == "index":
+        # Other workers' admin writes bump the shared cache generation; the TTL bounds staleness otherwise.
+        task_search.sync(db, generation=task_cache.generation, max_age=settings.task_cache_ttl_seconds)
+        ranked = task_search.search(
+            q,
+            subject=subject or None,
+            topic=topic or None,
+            difficulty_min=difficulty_min,
+            difficulty_max=difficulty_max,
+            limit=SEARCH_MAX_RESULTS,
+        )
+        return _ranked_page(db, ranked, filters, limit=limit, offset=offset, cursor=cursor)
+
     where = []
     if subject:
         where.append(Task.subject == subject)
@@ -36,24 +176,209 @@ def list_tasks(
         where.append(Task.difficulty >= difficulty_min)
     if difficulty_max is not None:
         where.append(Task.difficulty <= difficulty_max)
+    if q and search_backend == "fulltext":
+        ranked = _fulltext_search(db, q, where)
+        return _ranked_page(db, ranked, filters, limit=limit, offset=offset, cursor=cursor)
     if q:
         like = f"%{q}%"
         where.append(or_(Task.title.like(like), Task.statement.like(like)))
 
-    stmt = select(Task).order_by(Task.id.desc()).limit(limit).offset(offset)
+    if cursor is not None:
+        last_id, _ = _decode_cursor(cursor, filters)
+        where.append(Task.id < last_id)
+
+    # One extra row tells whether there is a next page.
+    stmt = select(Task).order_by(Task.id.desc()).limit(limit + 1).offset(offset)
     if where:
         stmt = stmt.where(and_(*where))
 
-    tasks = db.execute(stmt).scalars().all()
-    return [TaskPublic.model_validate(t) for t in tasks]
+    tasks = list(db.execute(stmt).scalars())
+    if len(tasks) > limit:
+        return tasks[:limit], _encode_cursor(tasks[limit - 1].id, filters)
+    return tasks, None
+
+
+def _ranked_page(
+    db: Session,
+    ranked: list[int],
+    filters: list[Any],
+    *,
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+) -> tuple[list[Task], Optional[str]]:
+    start = offset
+    if cursor is not None:
+        start = _resume(ranked, *_decode_cursor(cursor, filters))
+    page_ids = ranked[start : start + limit]
+    by_id = {t.id: t for t in db.execute(select(Task).where(Task.id.in_(page_ids))).scalars()} if page_ids else {}
+    next_cursor = _encode_cursor(page_ids[-1], filters, start + limit) if len(ranked) > start + limit else None
+    return [by_id[task_id] for task_id in page_ids if task_id in by_id], next_cursor
+
+
+@router.get("/facets", response_model=TaskFacets)
+def task_facets(
+    request: Request,
+    subject: Optional[str] = None,
+    topic: Optional[str] = None,
+    difficulty_min: Optional[int] = Query(default=None, ge=1),
+    difficulty_max: Optional[int] = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Available subjects, topics and difficulties with task counts for the same filters as
+    GET /api/tasks (without q). Served from the task_facet_counts aggregate and task_cache.
+    """
+    key = json.dumps(["facets", subject, topic, difficulty_min, difficulty_max], ensure_ascii=False)
+
+    def render() -> CachedResponse:
+        facets = facet_counts(
+            db, subject=subject, topic=topic, difficulty_min=difficulty_min, difficulty_max=difficulty_max
+        )
+        return CachedResponse.render(TaskFacets.model_validate(facets).model_dump_json().encode("utf-8"))
+
+    return _cached_response(request, task_cache.get_or_render(key, render))
 
 
 @router.get("/{task_id}", response_model=TaskPublic)
-def get_task(task_id: int, db: Session = Depends(get_db)) -> TaskPublic:
-    task = db.get(Task, task_id)
-    if task is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
-    return TaskPublic.model_validate(task)
+def get_task(task_id: int, request: Request, db: Session = Depends(get_db)) -> Response:
+    def render() -> CachedResponse:
+        task = db.get(Task, task_id)
+        if task is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        return CachedResponse.render(TaskPublic.model_validate(task).model_dump_json().encode("utf-8"))
+
+    return _cached_response(request, task_cache.get_or_render(f"task:{task_id}", render))
+
+
+def _new_submission(user_id: int, task_id: int, payload: SubmissionCreate, is_correct: bool) -> Submission:
+    # created_at is set here instead of by the server default, so the row needs no reload after INSERT.
+    return Submission(
+        user_id=user_id,
+        task_id=task_id,
+        answer=payload.answer,
+        is_correct=is_correct,
+        duration_ms=payload.duration_ms,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+@router.post("/submit", response_model=list[SubmissionBatchResult])
+def submit_batch(
+    payload: SubmissionBatch,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> list[SubmissionBatchResult]:
+    """
+    Answers to many tasks in one request (offline and contest clients uploading what they solved).
+
+    Results come in input order. An already answered task (also one repeated within the batch)
+    is reported as duplicate with the stored submission, so re-sending a batch after a lost
+    response is safe; items with status timeout can be resent. All answers are checked in one
+    checker_pool call, and the whole batch costs two SELECTs, one INSERT that skips rows a
+    concurrent request stored first, and one commit.
+    """
+    snapshots = task_pool.get_many(db, [item.task_id for item in payload.items])
+    saved: dict[int, Submission] = {}
+    if snapshots:
+        rows = db.execute(
+            select(Submission).where(Submission.user_id == current_user.id, Submission.task_id.in_(list(snapshots)))
+        )
+        saved = {submission.task_id: submission for submission in rows.scalars()}
+
+    # The first answer to each unanswered task; later ones in the batch are duplicates of it.
+    answers: dict[int, SubmissionBatchItem] = {}
+    for item in payload.items:
+        if item.task_id in snapshots and item.task_id not in saved:
+            answers.setdefault(item.task_id, item)
+    verdicts = checker_pool.check_pairs(
+        [(task_matcher(snapshots[task_id]), item.answer) for task_id, item in answers.items()]
+    )
+    accepted = {
+        task_id: _new_submission(current_user.id, task_id, item, is_correct)
+        for (task_id, item), is_correct in zip(answers.items(), verdicts)
+        if is_correct is not None
+    }
+
+    created: set[int] = set()
+    if accepted:
+        _insert_missing_submissions(db, accepted.values())
+        rows = db.execute(
+            select(Submission).where(Submission.user_id == current_user.id, Submission.task_id.in_(list(accepted)))
+        )
+        for submission in rows.scalars():
+            saved[submission.task_id] = submission
+            # A concurrent request may have stored its own answer first: then this one is a duplicate.
+            if _same_submission(submission, accepted[submission.task_id]):
+                created.add(submission.task_id)
+        db.commit()
+
+    results = []
+    reported: set[int] = set()
+    for item in payload.items:
+        task_id = item.task_id
+        if task_id not in snapshots:
+            item_status = "not_found"
+        elif task_id in created and task_id not in reported:
+            item_status = "created"
+        elif task_id in saved:
+            item_status = "duplicate"
+        else:
+            item_status = "timeout"
+        reported.add(task_id)
+        submission = saved.get(task_id) if item_status in ("created", "duplicate") else None
+        results.append(
+            SubmissionBatchResult(
+                task_id=task_id,
+                status=item_status,
+                submission=SubmissionPublic.model_validate(submission) if submission is not None else None,
+            )
+        )
+    return results
+
+
+def _insert_missing_submissions(db: Session, submissions: Iterable[Submission]) -> None:
+    """One INSERT of the submissions that skips (user, task) pairs already stored."""
+    rows = [
+        {
+            "user_id": submission.user_id,
+            "task_id": submission.task_id,
+            "answer": submission.answer,
+            "is_correct": submission.is_correct,
+            "duration_ms": submission.duration_ms,
+            "created_at": submission.created_at,
+        }
+        for submission in submissions
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(Submission).values(rows)
+        # A no-op update: an existing row is left as it is.
+        db.execute(stmt.on_duplicate_key_update(user_id=stmt.inserted.user_id))
+    elif dialect == "sqlite":
+        db.execute(sqlite_insert(Submission).values(rows).on_conflict_do_nothing(index_elements=["user_id", "task_id"]))
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Submission).values(**row))
+            except IntegrityError as exc:
+                if not _is_duplicate_submission(exc):
+                    raise
+
+
+def _same_submission(stored: Submission, submission: Submission) -> bool:
+    return (stored.answer, stored.is_correct, stored.duration_ms) == (
+        submission.answer,
+        submission.is_correct,
+        submission.duration_ms,
+    )
+
+
+def _is_duplicate_submission(exc: IntegrityError) -> bool:
+    # MySQL and PostgreSQL name the violated key; SQLite lists its columns.
+    message = str(exc.orig)
+    return "uq_submissions_user_task" in message or "submissions.user_id, submissions.task_id" in message
 
 
 @router.post("/{task_id}/submit", response_model=SubmissionPublic, status_code=status.HTTP_201_CREATED)
@@ -63,28 +388,26 @@ def submit(
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> SubmissionPublic:
-    task = db.get(Task, task_id)
-    if task is None:
+    """
+    The answer key comes from task_pool's snapshot cache, and a second answer to the same task
+    is rejected by the uq_submissions_user_task unique key (409), so an answer costs one INSERT
+    and its commit, and concurrent duplicates cannot both get in.
+    """
+    snapshot = task_pool.get(db, task_id)
+    if snapshot is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
 
-    existing = db.execute(
-        select(Submission.id).where(
-            Submission.user_id == current_user.id,
-            Submission.task_id == task.id,
-        )
-    ).first()
-    if existing is not None:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Answer already submitted")
-
-    is_correct = check_answer(answer=payload.answer, correct_answer=task.correct_answer, answer_type=task.answer_type)
-    submission = Submission(
-        user_id=current_user.id,
-        task_id=task.id,
-        answer=payload.answer,
-        is_correct=is_correct,
-        duration_ms=payload.duration_ms,
-    )
+    try:
+        is_correct = checker_pool.check_sync(task_matcher(snapshot), payload.answer)
+    except CheckTimeout as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+    submission = _new_submission(current_user.id, task_id, payload, is_correct)
     db.add(submission)
-    db.commit()
-    db.refresh(submission)
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if not _is_duplicate_submission(exc):
+            raise
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Answer already submitted") from None
     return SubmissionPublic.model_validate(submission)
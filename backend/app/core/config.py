@@ -21,12 +21,44 @@ class Settings(BaseSettings):
 
     cors_origins: list[str] = Field(default_factory=list)
 
+    metrics_token: str = ""
+
     pvp_initial_rating: int = 1000
     pvp_rating_k: int = 32
     pvp_matchmaking_max_diff: int = 300
+    pvp_matchmaking_window_growth_per_second: float = 10.0
+    pvp_matchmaking_window_max: int = 1000
+    pvp_matchmaking_tick_seconds: float = 1.0
+    pvp_matchmaking_mode: str = "greedy"
     pvp_match_timeout_seconds: int = 60
     pvp_target_score: int = 3
     pvp_max_rounds: int = 10
+    pvp_db_workers: int = 4
+    pvp_timer_tick_ms: int = 100
+    pvp_heartbeat_interval_seconds: float = 15.0
+    pvp_heartbeat_timeout_seconds: float = 45.0
+    pvp_send_queue_size: int = 64
+    pvp_send_queue_policy: str = "coalesce"
+    pvp_json_codec: str = "auto"
+    pvp_write_behind: bool = False
+    pvp_write_behind_flush_ms: int = 200
+    pvp_write_behind_max_events: int = 500
+    pvp_rating_settle_window_ms: int = 50
+    pvp_rating_settle_max_batch: int = 200
+    pvp_state_backend: str = "memory"
+    pvp_redis_url: str = "redis://127.0.0.1:6379/0"
+
+    checker_workers: int = 2
+    checker_timeout_seconds: float = 2.0
+    checker_wait_seconds: float = 5.0
+    checker_cache_size: int = 10000
+
+    task_search_backend: str = "index"
+    task_pool_recheck_seconds: float = 5.0
+    task_cache_size: int = 10000
+    task_cache_ttl_seconds: float = 300.0
+    task_cache_backend: str = "memory"
+    task_cache_redis_url: str = "redis://127.0.0.1:6379/0"
 
 
 @lru_cache(maxsize=1)
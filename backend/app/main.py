@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -8,13 +10,32 @@ from fastapi.staticfiles import StaticFiles
 
 from app.api.router import api_router
 from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.services.checker_pool import checker_pool
+from app.services.pvp_manager import pvp_manager
+from app.services.task_facets import ensure_facet_counts
+from app.services.task_pool import task_pool
+from app.services.task_search import task_search
 from app.ui.router import ui_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    with SessionLocal() as db:
+        task_pool.load(db)
+        ensure_facet_counts(db)
+        if get_settings().task_search_backend == "index":
+            task_search.load(db)
+    await pvp_manager.start()
+    yield
+    await pvp_manager.shutdown()
+    checker_pool.shutdown()
+
+
 def create_app() -> FastAPI:
     settings = get_settings()
 
-    app = FastAPI(title=settings.name, debug=settings.debug)
+    app = FastAPI(title=settings.name, debug=settings.debug, lifespan=lifespan)
 
     allow_origins = settings.cors_origins or ["*"]
     app.add_middleware(
@@ -23,6 +44,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
 
     app.include_router(api_router, prefix="/api")
@@ -2,7 +2,8 @@ from app.models.base import Base
 from app.models.match import Match, MatchAnswer
 from app.models.submission import Submission
 from app.models.task import Task
+from app.models.task_facet import TaskFacetCount
 from app.models.user import User
 
-__all__ = ["Base", "Match", "MatchAnswer", "Submission", "Task", "User"]
+__all__ = ["Base", "Match", "MatchAnswer", "Submission", "Task", "TaskFacetCount", "User"]
 
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import JSON, DateTime, Integer, String, Text, func
+from sqlalchemy import JSON, DateTime, Index, Integer, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
@@ -11,13 +11,22 @@ from app.models.base import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Filter columns + id: GET /api/tasks seeks by id within a filter (keyset pagination).
+    __table_args__ = (
+        Index("ix_tasks_subject_id", "subject", "id"),
+        Index("ix_tasks_topic_id", "topic", "id"),
+        Index("ix_tasks_subject_topic_id", "subject", "topic", "id"),
+        Index("ix_tasks_difficulty_id", "difficulty", "id"),
+        # TaskSearchIndex catches up with tasks written by other workers by updated_at.
+        Index("ix_tasks_updated_at", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     statement: Mapped[str] = mapped_column(Text, nullable=False)
-    subject: Mapped[str] = mapped_column(String(80), index=True, nullable=False)
-    topic: Mapped[str] = mapped_column(String(120), index=True, nullable=False)
-    difficulty: Mapped[int] = mapped_column(Integer, index=True, default=1, nullable=False)
+    subject: Mapped[str] = mapped_column(String(80), nullable=False)
+    topic: Mapped[str] = mapped_column(String(120), nullable=False)
+    difficulty: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     answer_type: Mapped[str] = mapped_column(String(20), default="text", nullable=False)
     correct_answer: Mapped[str] = mapped_column(Text, nullable=False)
     hints: Mapped[Optional[List[str]]] = mapped_column("hints_json", JSON, nullable=True)
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class TaskFacetCount(Base):
+    """Number of tasks per (subject, topic, difficulty), kept up to date by every task write (see task_facets)."""
+
+    __tablename__ = "task_facet_counts"
+
+    subject: Mapped[str] = mapped_column(String(80), primary_key=True)
+    topic: Mapped[str] = mapped_column(String(120), primary_key=True)
+    difficulty: Mapped[int] = mapped_column(Integer, primary_key=True)
+    task_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -11,6 +11,14 @@ class SubmissionCreate(BaseModel):
     duration_ms: Optional[int] = Field(default=None, ge=0)
 
 
+class SubmissionBatchItem(SubmissionCreate):
+    task_id: int
+
+
+class SubmissionBatch(BaseModel):
+    items: List[SubmissionBatchItem] = Field(min_length=1, max_length=500)
+
+
 class SubmissionPublic(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -21,3 +29,10 @@ class SubmissionPublic(BaseModel):
     is_correct: bool
     duration_ms: Optional[int]
     created_at: datetime
+
+
+class SubmissionBatchResult(BaseModel):
+    task_id: int
+    # created, duplicate (answered before: submission is the stored one), not_found or timeout (resend it)
+    status: str
+    submission: Optional[SubmissionPublic] = None
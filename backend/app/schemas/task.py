@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -38,3 +38,15 @@ class TaskUpdate(BaseModel):
     answer_type: Optional[str] = Field(default=None, max_length=20)
     correct_answer: Optional[str] = None
     hints: Optional[List[str]] = None
+
+
+class FacetValue(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class TaskFacets(BaseModel):
+    total: int
+    subject: List[FacetValue]
+    topic: List[FacetValue]
+    difficulty: List[FacetValue]
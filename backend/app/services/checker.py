@@ -1,32 +1,459 @@
 from __future__ import annotations
 
+import ast
+import functools
+import importlib
+import math
+import random
+import re
+import signal
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from fractions import Fraction
+from types import CodeType
+from typing import Callable, Optional
+
+FLOAT_TOLERANCE = 1e-6
+
+
+class CheckTimeout(TimeoutError):
+    """An answer check did not finish within its time budget."""
+
 
 def _normalize_text(value: str) -> str:
     return " ".join(value.strip().split()).upper()
 
 
-def check_answer(*, answer: str, correct_answer: str, answer_type: str) -> bool:
+class AnswerMatcher:
     """
-    MVP checker:
-    - text: case-insensitive, whitespace-normalized compare
-    - int: integer parse compare
-    - float: float parse, compare with small tolerance, supports comma decimal separator
+    An answer key parsed once; matches() only has to parse the submitted answer.
+
+    Heavy matchers may take long enough to block the event loop: callers run them through
+    checker_pool, which ships (answer_type, source) to a worker process and recompiles there.
+    compile_matcher() stamps both on every matcher: the registry name and the answer key.
     """
-    at = (answer_type or "text").strip().lower()
 
-    if at == "int":
+    __slots__ = ("answer_type", "source")
+
+    @property
+    def heavy(self) -> bool:
+        entry = _ANSWER_TYPES.get(self.answer_type)
+        return entry is not None and entry.heavy
+
+    def matches(self, answer: str) -> bool:
+        raise NotImplementedError
+
+
+class _NeverMatcher(AnswerMatcher):
+    # The key itself does not parse as its answer type, so no answer can be correct.
+    __slots__ = ()
+
+    heavy = False
+
+    def matches(self, answer: str) -> bool:
+        return False
+
+
+class IntMatcher(AnswerMatcher):
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+
+    def matches(self, answer: str) -> bool:
         try:
-            return int(answer.strip()) == int(correct_answer.strip())
+            return int(answer.strip()) == self.expected
         except Exception:
             return False
 
-    if at == "float":
+
+class FloatMatcher(AnswerMatcher):
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: float) -> None:
+        self.expected = expected
+
+    def matches(self, answer: str) -> bool:
         try:
-            a = float(answer.strip().replace(",", "."))
-            b = float(correct_answer.strip().replace(",", "."))
+            value = float(answer.strip().replace(",", "."))
         except Exception:
             return False
-        return abs(a - b) <= 1e-6
+        return abs(value - self.expected) <= FLOAT_TOLERANCE
+
+
+class TextMatcher(AnswerMatcher):
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: str) -> None:
+        self.expected = _normalize_text(expected)
+
+    def matches(self, answer: str) -> bool:
+        return _normalize_text(answer) == self.expected
+
+
+_FRACTION_BAR = re.compile(r"\s*/\s*")
+
+
+def _parse_fraction(value: str) -> Fraction | int:
+    # "3/4", "-1 / 2", "0,75", "1.5e3"; Fraction rejects anything else with ValueError.
+    # Integers stay ints: they compare and hash equal to the same Fraction, and parse much faster.
+    text = value.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    numerator, bar, denominator = text.partition("/")
+    if bar:
+        try:
+            return Fraction(int(numerator), int(denominator))
+        except ValueError:
+            pass
+    return Fraction(_FRACTION_BAR.sub("/", text.replace(",", ".")))
+
+
+class FractionMatcher(AnswerMatcher):
+    """Exact rational compare: 3/4, 6/8 and 0.75 are the same answer."""
+
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: Fraction | int) -> None:
+        self.expected = expected
+
+    def matches(self, answer: str) -> bool:
+        try:
+            return _parse_fraction(answer) == self.expected
+        except (ValueError, ZeroDivisionError):
+            return False
+
+
+def _split_items(value: str) -> list[str]:
+    # "1; 2; 3" or "1, 2, 3"; with ";" present a comma is a decimal separator ("1,5; 2").
+    separator = ";" if ";" in value else ","
+    return [item for item in (part.strip() for part in value.split(separator)) if item]
+
+
+def _set_item(value: str) -> Fraction | int | str:
+    try:
+        return _parse_fraction(value)
+    except (ValueError, ZeroDivisionError):
+        return _normalize_text(value)
+
+
+class SetMatcher(AnswerMatcher):
+    """Unordered set of numbers and/or words; duplicates are ignored ("2; 1; 2" == "1; 2")."""
+
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: frozenset) -> None:
+        self.expected = expected
+
+    def matches(self, answer: str) -> bool:
+        return frozenset(_set_item(item) for item in _split_items(answer)) == self.expected
+
+
+class NumbersMatcher(AnswerMatcher):
+    """Several numeric answers in a fixed order, each compared like float."""
+
+    __slots__ = ("expected",)
+
+    def __init__(self, expected: tuple[float, ...]) -> None:
+        self.expected = expected
+
+    def matches(self, answer: str) -> bool:
+        try:
+            values = [float(item.replace(",", ".")) for item in _split_items(answer)]
+        except ValueError:
+            return False
+        return len(values) == len(self.expected) and all(
+            abs(value - expected) <= FLOAT_TOLERANCE for value, expected in zip(values, self.expected)
+        )
+
+
+# Expressions are compared by evaluating both sides at random points (polynomial identity
+# testing, extended to elementary functions): no symbolic algebra, but safe and deterministic.
+EXPR_MAX_LENGTH = 500
+EXPR_SAMPLES = 24
+EXPR_MIN_VALID_SAMPLES = 6
+EXPR_REL_TOLERANCE = 1e-7
+
+_EXPR_FUNCTIONS: dict[str, Callable[..., float]] = {
+    "sqrt": math.sqrt,
+    "abs": abs,
+    "exp": math.exp,
+    "ln": math.log,
+    "log": math.log,
+    "lg": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "tg": math.tan,
+}
+_EXPR_CONSTANTS = {"pi": math.pi, "e": math.e}
+_IMPLICIT_MUL = re.compile(r"(?<=[\d)])\s*(?=[A-Za-z(])|(?<=\))\s*(?=\d)")
+
+
+_EXPR_NODES = (ast.BinOp, ast.UnaryOp, ast.Load, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub)
+
+
+def _expr_compile(value: str) -> tuple[CodeType, set[str]]:
+    """Validated, compiled expression and its variable names; ValueError/SyntaxError if not allowed."""
+    text = value.strip().replace("^", "**").replace("·", "*").replace("×", "*").replace("−", "-").replace(":", "/")
+    if not text or len(text) > EXPR_MAX_LENGTH:
+        raise ValueError("empty or too long expression")
+    tree = ast.parse(_IMPLICIT_MUL.sub("*", text), mode="eval")
+    names: set[str] = set()
+    called: set[int] = set()
+    for node in ast.walk(tree.body):
+        if isinstance(node, ast.Name):
+            if id(node) not in called and node.id not in _EXPR_CONSTANTS:
+                names.add(node.id)
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError("unsupported constant")
+            # Float-only arithmetic: 9^9^9 overflows at once instead of building a huge int.
+            node.value = float(node.value)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _EXPR_FUNCTIONS or node.keywords:
+                raise ValueError("unsupported function")
+            called.add(id(node.func))
+        elif not isinstance(node, _EXPR_NODES):
+            raise ValueError(f"unsupported syntax: {type(node).__name__}")
+    # Only whitelisted nodes are left, so evaluating the code without builtins is safe.
+    return compile(tree, "<answer>", "eval"), names
+
+
+_EXPR_NAMESPACE = {"__builtins__": {}, **_EXPR_FUNCTIONS, **_EXPR_CONSTANTS}
+
+
+def _expr_eval(code: CodeType, env: dict[str, float]) -> float:
+    value = eval(code, {**_EXPR_NAMESPACE, **env})
+    if isinstance(value, complex):
+        raise ValueError("complex result")
+    return value
+
+
+class ExpressionMatcher(AnswerMatcher):
+    """Algebraic expressions equal as functions of their variables: (x+1)^2 == x^2 + 2x + 1."""
+
+    __slots__ = ("code", "variables")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.code, self.variables = _expr_compile(source)
+
+    def matches(self, answer: str) -> bool:
+        try:
+            code, names = _expr_compile(answer)
+        except (ValueError, SyntaxError, RecursionError, MemoryError):
+            return False
+        variables = sorted(self.variables | names)
+        # Seeded by the key so a verdict never depends on which process computed it.
+        rng = random.Random(self.source)
+        valid = 0
+        for _ in range(EXPR_SAMPLES):
+            env = {name: rng.uniform(-3.0, 3.0) for name in variables}
+            try:
+                expected = _expr_eval(self.code, env)
+                value = _expr_eval(code, env)
+            except (ArithmeticError, ValueError, TypeError, NameError, RecursionError):
+                continue
+            if not (math.isfinite(expected) and math.isfinite(value)):
+                continue
+            if not math.isclose(value, expected, rel_tol=EXPR_REL_TOLERANCE, abs_tol=FLOAT_TOLERANCE):
+                return False
+            valid += 1
+        return valid >= EXPR_MIN_VALID_SAMPLES
+
+
+@dataclass(frozen=True)
+class AnswerType:
+    name: str
+    compile: Callable[[str], AnswerMatcher]
+    heavy: bool = False
+    # "module:qualname" of `compile` for heavy types: checker_pool workers import it from there.
+    reference: str = ""
+
+
+_ANSWER_TYPES: dict[str, AnswerType] = {}
+
+
+def _resolve(reference: str) -> Callable[[str], AnswerMatcher]:
+    module, _, qualname = reference.partition(":")
+    target = importlib.import_module(module)
+    for attr in qualname.split("."):
+        target = getattr(target, attr)
+    return target
+
+
+def register_answer_type(name: str, compile: Callable[[str], AnswerMatcher], *, heavy: bool = False) -> None:
+    """
+    Make `name` a valid Task.answer_type. `compile` turns the task's correct_answer into a
+    matcher and may raise ValueError for a malformed key (no answer is then correct).
+
+    Answers of a `heavy` type are checked in checker_pool's worker processes, which are spawned
+    and only know the types registered when this module is imported; they register other heavy
+    types from their compile function's module and qualified name, so that function must be
+    importable (a module-level function or class, not a lambda or a closure).
+    """
+    reference = ""
+    if heavy:
+        reference = f"{compile.__module__}:{compile.__qualname__}"
+        try:
+            importable = _resolve(reference) is compile
+        except (ImportError, AttributeError):
+            importable = False
+        if not importable:
+            raise ValueError(f"compile function of heavy answer type {name!r} is not importable as {reference}")
+    _ANSWER_TYPES[name] = AnswerType(name=name, compile=compile, heavy=heavy, reference=reference)
+
+
+def answer_types() -> list[str]:
+    return sorted(_ANSWER_TYPES)
+
+
+register_answer_type("text", TextMatcher)
+register_answer_type("int", lambda key: IntMatcher(int(key.strip())))
+register_answer_type("float", lambda key: FloatMatcher(float(key.strip().replace(",", "."))))
+register_answer_type("fraction", lambda key: FractionMatcher(_parse_fraction(key)))
+register_answer_type("set", lambda key: SetMatcher(frozenset(_set_item(item) for item in _split_items(key))))
+register_answer_type(
+    "numbers", lambda key: NumbersMatcher(tuple(float(item.replace(",", ".")) for item in _split_items(key)))
+)
+register_answer_type("expr", ExpressionMatcher, heavy=True)
+
+
+def compile_matcher(*, correct_answer: str, answer_type: str) -> AnswerMatcher:
+    """
+    Checkers by answer_type (unknown types are checked as text):
+    - text: case-insensitive, whitespace-normalized compare
+    - int: integer parse compare
+    - float: float parse, compare with small tolerance, supports comma decimal separator
+    - fraction: exact rational compare (3/4 == 0,75)
+    - set: unordered items separated by ";" (or "," when there is no ";")
+    - numbers: ordered numbers, same separators, each compared like float
+    - expr: algebraic expressions in the task's variables (heavy: run via checker_pool)
+    """
+    entry = _ANSWER_TYPES.get((answer_type or "text").strip().lower()) or _ANSWER_TYPES["text"]
+    return _compile(entry, correct_answer)
+
+
+def _compile(entry: AnswerType, correct_answer: str) -> AnswerMatcher:
+    try:
+        matcher = entry.compile(correct_answer)
+    except (ValueError, ArithmeticError, SyntaxError, RecursionError):
+        matcher = _NeverMatcher()
+    matcher.answer_type = entry.name
+    matcher.source = correct_answer
+    return matcher
+
+
+def check_answer(*, answer: str, correct_answer: str, answer_type: str) -> bool:
+    return compile_matcher(correct_answer=correct_answer, answer_type=answer_type).matches(answer)
+
+
+def answer_type_reference(name: str) -> str:
+    entry = _ANSWER_TYPES.get(name)
+    return entry.reference if entry is not None else ""
+
+
+@functools.lru_cache(maxsize=256)
+def _worker_matcher(answer_type: str, reference: str, correct_answer: str) -> AnswerMatcher:
+    # Never falls back to text like compile_matcher(): a wrong checker would return (and cache) wrong verdicts.
+    entry = _ANSWER_TYPES.get(answer_type)
+    if entry is None and reference:
+        register_answer_type(answer_type, _resolve(reference), heavy=True)
+        entry = _ANSWER_TYPES[answer_type]
+    if entry is None:
+        raise ValueError(f"unknown answer type {answer_type!r} in checker worker")
+    return _compile(entry, correct_answer)
+
+
+def _raise_timeout(signum, frame) -> None:
+    raise CheckTimeout("answer check timed out")
+
+
+def check_in_worker(
+    answer_type: str, reference: str, correct_answer: str, answers: list[str], timeout: float
+) -> list[bool]:
+    """
+    Process-pool entry point for heavy checks. Where SIGALRM exists each answer gets `timeout`
+    seconds of work; an answer that cannot be checked within it counts as wrong. `reference`
+    is the type's compile function (see register_answer_type), registered here if unknown.
+    """
+    matcher = _worker_matcher(answer_type, reference, correct_answer)
+    alarm = hasattr(signal, "setitimer") and timeout > 0
+    if alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+    verdicts = []
+    for answer in answers:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            verdict = matcher.matches(answer)
+        except CheckTimeout:
+            verdict = False
+        finally:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        verdicts.append(verdict)
+    return verdicts
+
+
+class MatcherCache:
+    """
+    Compiled matchers by task id, LRU-bounded.
+
+    An entry is reused while the task's updated_at and its raw key are unchanged, so the matcher
+    always fits the row or snapshot it is asked for, even when an edit lands within updated_at's
+    resolution. How fresh that snapshot is is up to its source: TaskPool rechecks its snapshots
+    against the database, so an edit on another worker applies within its recheck interval.
+    Admin writes also drop the entry via invalidate().
+    """
+
+    def __init__(self, *, max_size: int = 4096) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[Optional[datetime], str, str, AnswerMatcher]] = OrderedDict()
+        self._max_size = max_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self, task_id: int, *, updated_at: Optional[datetime], correct_answer: str, answer_type: str
+    ) -> AnswerMatcher:
+        # Hits skip the lock: dict reads are atomic, and a concurrent eviction only costs a recompile.
+        entry = self._entries.get(task_id)
+        if entry is not None and entry[0] == updated_at and entry[1] == correct_answer and entry[2] == answer_type:
+            try:
+                self._entries.move_to_end(task_id)
+            except KeyError:
+                pass
+            return entry[3]
+
+        matcher = compile_matcher(correct_answer=correct_answer, answer_type=answer_type)
+        with self._lock:
+            self._entries[task_id] = (updated_at, correct_answer, answer_type, matcher)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return matcher
+
+    def invalidate(self, task_id: int) -> None:
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+answer_matchers = MatcherCache()
 
-    return _normalize_text(answer) == _normalize_text(correct_answer)
 
+def task_matcher(task) -> AnswerMatcher:
+    """Cached matcher for a Task row or a TaskSnapshot."""
+    return answer_matchers.get(
+        task.id, updated_at=task.updated_at, correct_answer=task.correct_answer, answer_type=task.answer_type
+    )
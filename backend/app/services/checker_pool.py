@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Iterable, Optional
+
+from app.core.config import get_settings
+from app.services.checker import AnswerMatcher, CheckTimeout, answer_type_reference, check_in_worker
+from app.services.metrics import registry
+
+check_seconds = registry.histogram(
+    "checker_pool_check_seconds",
+    "Heavy answer checks, from submission to the pool until the verdict.",
+    labelnames=("answer_type",),
+)
+check_timeouts = registry.counter(
+    "checker_pool_timeouts_total",
+    "Heavy checks not answered within checker_wait_seconds.",
+    labelnames=("answer_type",),
+)
+cache_hits = registry.counter("checker_pool_cache_hits_total", "Heavy checks answered from the verdict cache.")
+
+# Answers per pool task in check_pairs(): amortizes pickling and IPC for bulk regrades.
+BATCH_SIZE = 64
+
+
+class CheckerPool:
+    """
+    Runs heavy answer checks (types registered with heavy=True) in a bounded process pool; cheap ones inline.
+
+    Each answer gets checker_timeout_seconds of work in the worker and counts as wrong past it,
+    so a pathological answer is just incorrect (and cached as such). If the pool itself cannot
+    answer within checker_wait_seconds (overloaded, or no SIGALRM to stop a runaway check),
+    CheckTimeout is raised and nothing is cached: the caller can ask the player to resend.
+    Verdicts are cached by (answer_type, key, answer) in an LRU shared by all tasks.
+    """
+
+    def __init__(self, *, workers: int, timeout: float, wait: float, cache_size: int) -> None:
+        self._workers = max(1, workers)
+        self._timeout = timeout
+        self._wait = wait
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, str, str], bool] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_size = cache_size
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a process that runs an event loop and DB threads is not safe.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        # A worker died (e.g. killed by the OOM killer) and took the executor down: start a new one.
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cached(self, key: tuple[str, str, str]) -> Optional[bool]:
+        with self._cache_lock:
+            verdict = self._cache.get(key)
+            if verdict is not None:
+                self._cache.move_to_end(key)
+        if verdict is not None:
+            cache_hits.inc()
+        return verdict
+
+    def _remember(self, key: tuple[str, str, str], verdict: bool) -> None:
+        with self._cache_lock:
+            self._cache[key] = verdict
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _submit(self, matcher: AnswerMatcher, answers: list[str]) -> Future:
+        args = (matcher.answer_type, answer_type_reference(matcher.answer_type), matcher.source, answers, self._timeout)
+        executor = self._pool()
+        try:
+            future = executor.submit(check_in_worker, *args)
+        except BrokenExecutor:
+            self._replace_broken(executor)
+            executor = self._pool()
+            future = executor.submit(check_in_worker, *args)
+        future.add_done_callback(lambda done: self._on_done(executor, done))
+        return future
+
+    def _on_done(self, executor: ProcessPoolExecutor, future: Future) -> None:
+        if not future.cancelled() and isinstance(future.exception(), BrokenExecutor):
+            self._replace_broken(executor)
+
+    def _timed_out(self, matcher: AnswerMatcher, future: Future) -> CheckTimeout:
+        future.cancel()
+        check_timeouts.inc(answer_type=matcher.answer_type)
+        return CheckTimeout(f"{matcher.answer_type} check did not finish in {self._wait:g}s")
+
+    async def check(self, matcher: AnswerMatcher, answer: str) -> bool:
+        if not matcher.heavy:
+            return matcher.matches(answer)
+        key = (matcher.answer_type, matcher.source, answer.strip())
+        verdict = self._cached(key)
+        if verdict is not None:
+            return verdict
+
+        started = time.perf_counter()
+        future = self._submit(matcher, [key[2]])
+        try:
+            (verdict,) = await asyncio.wait_for(asyncio.wrap_future(future), self._wait)
+        except (asyncio.TimeoutError, CheckTimeout, BrokenExecutor):
+            raise self._timed_out(matcher, future) from None
+        check_seconds.observe(time.perf_counter() - started, answer_type=matcher.answer_type)
+        self._remember(key, verdict)
+        return verdict
+
+    def check_sync(self, matcher: AnswerMatcher, answer: str) -> bool:
+        """check() for worker threads (sync endpoints, scripts)."""
+        return self.check_many(matcher, [answer], strict=True)[0]  # type: ignore[return-value]
+
+    def check_many(
+        self, matcher: AnswerMatcher, answers: Iterable[str], *, strict: bool = False
+    ) -> list[Optional[bool]]:
+        """
+        Verdicts in input order; each distinct answer is checked once. Heavy checks are spread
+        over the pool in batches; an answer whose batch timed out gets None (or, with strict,
+        raises CheckTimeout).
+        """
+        return self.check_pairs([(matcher, answer) for answer in answers], strict=strict)
+
+    def check_pairs(
+        self, pairs: Iterable[tuple[AnswerMatcher, str]], *, strict: bool = False
+    ) -> list[Optional[bool]]:
+        """
+        check_many() for answers to different tasks: the heavy checks of every matcher are
+        submitted before any of them is waited for, so they run side by side in the pool.
+        """
+        pairs = list(pairs)
+        result: list[Optional[bool]] = [None] * len(pairs)
+        light: dict[tuple[int, str], bool] = {}
+        # Heavy answers not in the cache, by matcher: (matcher, answer -> positions in pairs).
+        pending: dict[tuple[str, str], tuple[AnswerMatcher, dict[str, list[int]]]] = {}
+        for i, (matcher, answer) in enumerate(pairs):
+            if not matcher.heavy:
+                verdict = light.get((id(matcher), answer))
+                if verdict is None:
+                    verdict = light[id(matcher), answer] = matcher.matches(answer)
+                result[i] = verdict
+                continue
+            answer = answer.strip()
+            verdict = self._cached((matcher.answer_type, matcher.source, answer))
+            if verdict is not None:
+                result[i] = verdict
+                continue
+            _, positions = pending.setdefault((matcher.answer_type, matcher.source), (matcher, {}))
+            positions.setdefault(answer, []).append(i)
+
+        futures = []
+        for matcher, positions in pending.values():
+            answers = list(positions)
+            for start in range(0, len(answers), BATCH_SIZE):
+                batch = answers[start : start + BATCH_SIZE]
+                futures.append((matcher, positions, batch, time.perf_counter(), self._submit(matcher, batch)))
+        for matcher, positions, batch, started, future in futures:
+            try:
+                # Earlier batches were collected already, so this one has (had) a free worker.
+                batch_verdicts = future.result(timeout=self._wait)
+            except (FutureTimeoutError, CheckTimeout, BrokenExecutor):
+                error = self._timed_out(matcher, future)
+                if strict:
+                    raise error from None
+                continue
+            check_seconds.observe(time.perf_counter() - started, answer_type=matcher.answer_type)
+            for answer, verdict in zip(batch, batch_verdicts):
+                self._remember((matcher.answer_type, matcher.source, answer), verdict)
+                for i in positions[answer]:
+                    result[i] = verdict
+        return result
+
+
+def _create_pool() -> CheckerPool:
+    settings = get_settings()
+    return CheckerPool(
+        workers=settings.checker_workers,
+        timeout=settings.checker_timeout_seconds,
+        wait=settings.checker_wait_seconds,
+        cache_size=settings.checker_cache_size,
+    )
+
+
+checker_pool = _create_pool()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.match import Match
+from app.models.user import User
+
+
+@dataclass
+class ReplayStats:
+    matches: int = 0
+    chunks: int = 0
+    elapsed_s: float = 0.0
+
+
+@dataclass
+class ReplayResult:
+    """Final ratings indexed by user id (users without matches keep the initial rating)."""
+
+    ratings: np.ndarray
+    stats: ReplayStats = field(default_factory=ReplayStats)
+
+    def rating_of(self, user_id: int, initial: int) -> int:
+        if user_id < len(self.ratings):
+            return int(self.ratings[user_id])
+        return initial
+
+
+@dataclass
+class ChunkTrajectory:
+    match_ids: list[str]
+    player1_before: np.ndarray
+    player2_before: np.ndarray
+    player1_after: np.ndarray
+    player2_after: np.ndarray
+
+
+def _layers(player1: np.ndarray, player2: np.ndarray) -> np.ndarray:
+    """
+    Dependency layer of each match: 1 + the latest layer either player appeared in.
+
+    Matches inside one layer share no player, so each layer can be updated with vector ops
+    while the result stays identical to replaying the matches one by one.
+    """
+    n = len(player1)
+    ids, inverse = np.unique(np.concatenate((player1, player2)), return_inverse=True)
+    last = [-1] * len(ids)
+    layers: list[int] = []
+    for a, b in zip(inverse[:n].tolist(), inverse[n:].tolist()):
+        layer = last[a] if last[a] > last[b] else last[b]
+        layer += 1
+        last[a] = layer
+        last[b] = layer
+        layers.append(layer)
+    return np.asarray(layers, dtype=np.int64)
+
+
+def ensure_capacity(ratings: np.ndarray, max_user_id: int, initial: int) -> np.ndarray:
+    if max_user_id < len(ratings):
+        return ratings
+    grown = np.full(max(max_user_id + 1, len(ratings) * 2), float(initial))
+    grown[: len(ratings)] = ratings
+    return grown
+
+
+def replay_chunk(
+    ratings: np.ndarray,
+    player1: np.ndarray,
+    player2: np.ndarray,
+    score_a: np.ndarray,
+    *,
+    k: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Apply a chunk of matches (in chronological order) to `ratings` in place.
+
+    Returns per-match (player1_before, player2_before, player1_after, player2_after).
+    Same formula and rounding as app.services.elo.update_elo.
+    """
+    n = len(player1)
+    before_a = np.empty(n)
+    before_b = np.empty(n)
+    after_a = np.empty(n)
+    after_b = np.empty(n)
+    if n == 0:
+        return before_a, before_b, after_a, after_b
+
+    layers = _layers(player1, player2)
+    order = np.argsort(layers, kind="stable")
+    counts = np.bincount(layers)
+    ends = np.cumsum(counts)
+    for start, end in zip((ends - counts).tolist(), ends.tolist()):
+        idx = order[start:end]
+        ia = player1[idx]
+        ib = player2[idx]
+        ra = ratings[ia]
+        rb = ratings[ib]
+        s = score_a[idx]
+        exp_a = 1.0 / (1.0 + np.power(10.0, (rb - ra) / 400.0))
+        na = np.rint(ra + k * (s - exp_a))
+        nb = np.rint(rb + k * ((1.0 - s) - (1.0 - exp_a)))
+        ratings[ia] = na
+        ratings[ib] = nb
+        before_a[idx] = ra
+        before_b[idx] = rb
+        after_a[idx] = na
+        after_b[idx] = nb
+    return before_a, before_b, after_a, after_b
+
+
+def stream_finished_matches(db: Session, *, chunk_size: int) -> Iterator[list]:
+    """Finished matches in ended_at order, fetched through a server-side cursor in chunks."""
+    stmt = (
+        select(Match.id, Match.player1_id, Match.player2_id, Match.player1_score, Match.player2_score)
+        .where(Match.status == "finished")
+        .order_by(Match.ended_at, Match.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in db.execute(stmt).partitions(chunk_size):
+        yield partition
+
+
+def replay_ratings(
+    db: Session,
+    *,
+    k: int,
+    initial: int,
+    chunk_size: int = 100_000,
+    on_chunk: Optional[Callable[[ChunkTrajectory], None]] = None,
+) -> ReplayResult:
+    started = time.perf_counter()
+    max_user_id = db.scalar(select(User.id).order_by(User.id.desc()).limit(1)) or 0
+    ratings = np.full(max_user_id + 1, float(initial))
+    stats = ReplayStats()
+
+    for rows in stream_finished_matches(db, chunk_size=chunk_size):
+        player1 = np.fromiter((r.player1_id for r in rows), dtype=np.int64, count=len(rows))
+        player2 = np.fromiter((r.player2_id for r in rows), dtype=np.int64, count=len(rows))
+        p1_score = np.fromiter((r.player1_score for r in rows), dtype=np.int64, count=len(rows))
+        p2_score = np.fromiter((r.player2_score for r in rows), dtype=np.int64, count=len(rows))
+        score_a = np.where(p1_score > p2_score, 1.0, np.where(p1_score < p2_score, 0.0, 0.5))
+
+        ratings = ensure_capacity(ratings, int(max(player1.max(), player2.max())), initial)
+        before_a, before_b, after_a, after_b = replay_chunk(ratings, player1, player2, score_a, k=k)
+
+        stats.matches += len(rows)
+        stats.chunks += 1
+        if on_chunk is not None:
+            on_chunk(
+                ChunkTrajectory(
+                    match_ids=[r.id for r in rows],
+                    player1_before=before_a,
+                    player2_before=before_b,
+                    player1_after=after_a,
+                    player2_after=after_b,
+                )
+            )
+
+    stats.elapsed_s = time.perf_counter() - started
+    return ReplayResult(ratings=ratings, stats=stats)
+
+
+def rating_diffs(db: Session, result: ReplayResult, *, initial: int) -> list[tuple[int, int, int]]:
+    """(user_id, current rating, replayed rating) for every user whose rating would change."""
+    diffs = []
+    for row in db.execute(select(User.id, User.rating).order_by(User.id)):
+        new = result.rating_of(int(row.id), initial)
+        if new != int(row.rating):
+            diffs.append((int(row.id), int(row.rating), new))
+    return diffs
+
+
+def write_match_trajectory(db: Session, chunk: ChunkTrajectory) -> None:
+    db.execute(
+        update(Match),
+        [
+            {
+                "id": match_id,
+                "player1_rating_before": int(b1),
+                "player2_rating_before": int(b2),
+                "player1_rating_after": int(a1),
+                "player2_rating_after": int(a2),
+            }
+            for match_id, b1, b2, a1, a2 in zip(
+                chunk.match_ids,
+                chunk.player1_before.tolist(),
+                chunk.player2_before.tolist(),
+                chunk.player1_after.tolist(),
+                chunk.player2_after.tolist(),
+            )
+        ],
+    )
+
+
+def write_user_ratings(db: Session, diffs: list[tuple[int, int, int]], *, chunk_size: int = 10_000) -> None:
+    for start in range(0, len(diffs), chunk_size):
+        batch = diffs[start : start + chunk_size]
+        db.execute(update(User), [{"id": user_id, "rating": new} for user_id, _, new in batch])
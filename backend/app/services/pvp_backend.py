@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import Settings
+from app.services.pvp_codec import Frame
+from app.services.pvp_queue import MatchmakingQueue, QueueEntry
+
+EnvelopeHandler = Callable[[dict], Awaitable[None]]
+
+
+class PvpStateBackend(ABC):
+    """
+    Shared PvP state: the matchmaking queue, which worker owns each live match, which worker
+    holds each player's websocket, and message routing between workers.
+
+    A match is driven by the worker that paired it (MatchState stays in that process).
+    Frames for a player connected elsewhere are routed to the worker holding the socket,
+    and messages from such a player are forwarded to the match owner. Envelopes:
+    - {"kind": "frame", "user_id", "type", "text"}: send an encoded frame to a locally connected player;
+    - {"kind": "message", "user_id", "message"}: handle an inbound message for a local match;
+    - {"kind": "disconnect", "user_id"}: the player's socket went away on another worker.
+    """
+
+    worker_id: str
+
+    @abstractmethod
+    async def start(self, on_envelope: EnvelopeHandler) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    @abstractmethod
+    async def bind_user(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def unbind_user(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def send_remote(self, user_id: int, frame: Frame) -> bool:
+        """Route a frame to the worker holding the user's socket; False if nobody else has it."""
+
+    @abstractmethod
+    async def queue_add(self, entry: QueueEntry) -> bool:
+        ...
+
+    @abstractmethod
+    async def queue_remove(self, user_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def queue_remove_many(self, user_ids: list[int]) -> int:
+        """Drop several players from the queue in one operation; returns how many were queued."""
+
+    @abstractmethod
+    async def queue_size(self) -> int:
+        ...
+
+    @abstractmethod
+    async def queue_pop_pairs(
+        self,
+        *,
+        now: float,
+        base_diff: int,
+        growth_per_second: float,
+        max_diff: int,
+        mode: str = "greedy",
+    ) -> list[tuple[QueueEntry, QueueEntry]]:
+        ...
+
+    @abstractmethod
+    async def bind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        ...
+
+    @abstractmethod
+    async def unbind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        ...
+
+    @abstractmethod
+    async def match_owner(self, user_id: int) -> Optional[tuple[str, str]]:
+        """(worker_id, match_id) of the user's live match on another worker, if any."""
+
+    @abstractmethod
+    async def forward(self, worker_id: str, envelope: dict) -> None:
+        ...
+
+
+class InMemoryBackend(PvpStateBackend):
+    """Single-process backend: everything is local, nothing is ever routed."""
+
+    def __init__(self) -> None:
+        self.worker_id = "local"
+        self._queue = MatchmakingQueue()
+        self._queue_lock = asyncio.Lock()
+
+    async def start(self, on_envelope: EnvelopeHandler) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    async def bind_user(self, user_id: int) -> None:
+        return None
+
+    async def unbind_user(self, user_id: int) -> None:
+        return None
+
+    async def send_remote(self, user_id: int, frame: Frame) -> bool:
+        return False
+
+    async def queue_add(self, entry: QueueEntry) -> bool:
+        async with self._queue_lock:
+            return self._queue.add(entry)
+
+    async def queue_remove(self, user_id: int) -> bool:
+        async with self._queue_lock:
+            return self._queue.remove(user_id) is not None
+
+    async def queue_remove_many(self, user_ids: list[int]) -> int:
+        async with self._queue_lock:
+            return sum(1 for user_id in user_ids if self._queue.remove(user_id) is not None)
+
+    async def queue_size(self) -> int:
+        return len(self._queue)
+
+    async def queue_pop_pairs(
+        self,
+        *,
+        now: float,
+        base_diff: int,
+        growth_per_second: float,
+        max_diff: int,
+        mode: str = "greedy",
+    ) -> list[tuple[QueueEntry, QueueEntry]]:
+        async with self._queue_lock:
+            if len(self._queue) < 2:
+                return []
+            return self._queue.pop_pairs(
+                now=now, base_diff=base_diff, growth_per_second=growth_per_second, max_diff=max_diff, mode=mode
+            )
+
+    async def bind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        return None
+
+    async def unbind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        return None
+
+    async def match_owner(self, user_id: int) -> Optional[tuple[str, str]]:
+        return None
+
+    async def forward(self, worker_id: str, envelope: dict) -> None:
+        return None
+
+
+# KEYS[1] = hash, ARGV[1] = field, ARGV[2] = expected value
+_HDEL_IF_EQUAL = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# KEYS[1] = queue, KEYS[2] = queue:joined, ARGV = user ids, two per pair.
+# Each pair is popped only if both players are still queued, so a player who left after the
+# pairing snapshot is never matched; the other one stays in the queue. Returns a 0/1 flag per pair.
+_POP_PAIRS = """
+local popped = {}
+for i = 1, #ARGV, 2 do
+    local a, b = ARGV[i], ARGV[i + 1]
+    if redis.call('ZSCORE', KEYS[1], a) and redis.call('ZSCORE', KEYS[1], b) then
+        redis.call('ZREM', KEYS[1], a, b)
+        redis.call('HDEL', KEYS[2], a, b)
+        popped[#popped + 1] = 1
+    else
+        popped[#popped + 1] = 0
+    end
+end
+return popped
+"""
+
+# KEYS[1] = lock key, ARGV[1] = owner token
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend(PvpStateBackend):
+    """
+    Redis-backed state shared by all workers and hosts.
+
+    Keys (all under `prefix`):
+    - connections: hash user_id -> worker_id holding the socket;
+    - queue: sorted set user_id scored by rating, queue:joined: hash user_id -> joined_at;
+    - user_match: hash user_id -> "worker_id:match_id";
+    - matchmaking:lock: short-lived lock so one worker pairs the queue per tick (joins and leaves
+      do not take it; pairs are popped atomically and only if both players are still queued);
+    - worker:<id>: pub/sub channel each worker listens on.
+    """
+
+    _LOCK_TTL_MS = 5000
+
+    def __init__(self, *, url: str, prefix: str = "pvp:") -> None:
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("APP_PVP_STATE_BACKEND=redis requires the 'redis' package") from exc
+
+        self.worker_id = uuid.uuid4().hex
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}{name}"
+
+    def _channel(self, worker_id: str) -> str:
+        return self._key(f"worker:{worker_id}")
+
+    async def start(self, on_envelope: EnvelopeHandler) -> None:
+        if self._reader is not None:
+            return
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel(self.worker_id))
+        self._reader = asyncio.create_task(self._read_loop(on_envelope))
+
+    async def _read_loop(self, on_envelope: EnvelopeHandler) -> None:
+        async for message in self._pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                await on_envelope(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe()
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self._redis.aclose()
+
+    async def bind_user(self, user_id: int) -> None:
+        await self._redis.hset(self._key("connections"), str(user_id), self.worker_id)
+
+    async def unbind_user(self, user_id: int) -> None:
+        await self._redis.eval(_HDEL_IF_EQUAL, 1, self._key("connections"), str(user_id), self.worker_id)
+
+    async def send_remote(self, user_id: int, frame: Frame) -> bool:
+        worker_id = await self._redis.hget(self._key("connections"), str(user_id))
+        if worker_id is None or worker_id == self.worker_id:
+            return False
+        await self.forward(worker_id, {"kind": "frame", "user_id": user_id, "type": frame.type, "text": frame.text})
+        return True
+
+    async def queue_add(self, entry: QueueEntry) -> bool:
+        added = await self._redis.zadd(self._key("queue"), {str(entry.user_id): entry.rating}, nx=True)
+        if not added:
+            return False
+        await self._redis.hset(self._key("queue:joined"), str(entry.user_id), repr(entry.joined_at))
+        return True
+
+    async def queue_remove(self, user_id: int) -> bool:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._key("queue"), str(user_id))
+            pipe.hdel(self._key("queue:joined"), str(user_id))
+            removed, _ = await pipe.execute()
+        return bool(removed)
+
+    async def queue_remove_many(self, user_ids: list[int]) -> int:
+        if not user_ids:
+            return 0
+        members = [str(user_id) for user_id in user_ids]
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._key("queue"), *members)
+            pipe.hdel(self._key("queue:joined"), *members)
+            removed, _ = await pipe.execute()
+        return int(removed)
+
+    async def queue_size(self) -> int:
+        return int(await self._redis.zcard(self._key("queue")))
+
+    async def queue_pop_pairs(
+        self,
+        *,
+        now: float,
+        base_diff: int,
+        growth_per_second: float,
+        max_diff: int,
+        mode: str = "greedy",
+    ) -> list[tuple[QueueEntry, QueueEntry]]:
+        token = uuid.uuid4().hex
+        lock_key = self._key("matchmaking:lock")
+        if not await self._redis.set(lock_key, token, nx=True, px=self._LOCK_TTL_MS):
+            # Another worker is pairing this tick.
+            return []
+        try:
+            ratings = await self._redis.zrange(self._key("queue"), 0, -1, withscores=True)
+            if len(ratings) < 2:
+                return []
+            joined = await self._redis.hgetall(self._key("queue:joined"))
+
+            entries = [
+                QueueEntry(user_id=int(user_id), rating=int(rating), joined_at=float(joined.get(user_id, now)))
+                for user_id, rating in ratings
+            ]
+            queue = MatchmakingQueue()
+            # The sorted set is in rating order; the queue serves players in join order.
+            for entry in sorted(entries, key=lambda entry: entry.joined_at):
+                queue.add(entry)
+            pairs = queue.pop_pairs(
+                now=now, base_diff=base_diff, growth_per_second=growth_per_second, max_diff=max_diff, mode=mode
+            )
+            if not pairs:
+                return []
+            # queue_remove() does not take the lock: leave/disconnect may have run since the snapshot.
+            members = [str(entry.user_id) for pair in pairs for entry in pair]
+            popped = await self._redis.eval(_POP_PAIRS, 2, self._key("queue"), self._key("queue:joined"), *members)
+            return [pair for pair, ok in zip(pairs, popped) if int(ok)]
+        finally:
+            try:
+                await self._redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except Exception:
+                # The lock expires on its own; the popped pairs must not be lost.
+                pass
+
+    async def bind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        owner = f"{self.worker_id}:{match_id}"
+        await self._redis.hset(self._key("user_match"), mapping={str(u): owner for u in user_ids})
+
+    async def unbind_match(self, match_id: str, user_ids: tuple[int, int]) -> None:
+        owner = f"{self.worker_id}:{match_id}"
+        for user_id in user_ids:
+            await self._redis.eval(_HDEL_IF_EQUAL, 1, self._key("user_match"), str(user_id), owner)
+
+    async def match_owner(self, user_id: int) -> Optional[tuple[str, str]]:
+        owner = await self._redis.hget(self._key("user_match"), str(user_id))
+        if owner is None:
+            return None
+        worker_id, _, match_id = owner.partition(":")
+        if worker_id == self.worker_id:
+            return None
+        return worker_id, match_id
+
+    async def forward(self, worker_id: str, envelope: dict) -> None:
+        await self._redis.publish(self._channel(worker_id), json.dumps(envelope, ensure_ascii=False))
+
+
+def create_backend(settings: Settings) -> PvpStateBackend:
+    kind = (settings.pvp_state_backend or "memory").strip().lower()
+    if kind == "memory":
+        return InMemoryBackend()
+    if kind == "redis":
+        return RedisBackend(url=settings.pvp_redis_url)
+    raise ValueError(f"Unknown PvP state backend: {settings.pvp_state_backend}")
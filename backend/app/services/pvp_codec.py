@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Optional
+
+from app.core.config import get_settings
+
+
+class JsonCodec:
+    """stdlib json, compact and UTF-8 friendly (same output as Starlette's send_json)."""
+
+    name = "json"
+
+    def dumps(self, payload: Any) -> str:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, payload: Any) -> str:
+        return self._orjson.dumps(payload).decode("utf-8")
+
+    def loads(self, data: str | bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+def get_codec(name: str = "auto") -> JsonCodec | OrjsonCodec:
+    """Codec by name: json, orjson, or auto (orjson when installed, stdlib json otherwise)."""
+    name = (name or "auto").strip().lower()
+    if name == "json":
+        return JsonCodec()
+    if name in ("auto", "orjson"):
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            if name == "orjson":
+                raise
+    return JsonCodec()
+
+
+codec = get_codec(get_settings().pvp_json_codec)
+
+# Websocket subprotocol a client offers to receive and send MessagePack frames instead of JSON.
+MSGPACK_SUBPROTOCOL = "olymp.pvp.msgpack"
+
+
+class MsgpackCodec:
+    """
+    MessagePack for binary PvP clients, backed by the msgpack package.
+
+    The unpacker bounds nesting depth and container sizes, so hostile frames fail with ValueError.
+    """
+
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def dumps(self, payload: Any) -> bytes:
+        return self._msgpack.packb(payload, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+    def map_header(self, n: int) -> bytes:
+        return self._msgpack.Packer().pack_map_header(n)
+
+
+def _load_msgpack_codec() -> Optional[MsgpackCodec]:
+    try:
+        return MsgpackCodec()
+    except ImportError:
+        return None
+
+
+# None without the msgpack package: the subprotocol is then not accepted and clients stay on JSON.
+msgpack_codec = _load_msgpack_codec()
+
+
+def _splice_msgpack_map(base: bytes, fields: dict) -> bytes:
+    """Append fields to an encoded map by rewriting its header; the body is not re-encoded."""
+    b = base[0]
+    if 0x80 <= b <= 0x8F:
+        count, offset = b & 0x0F, 1
+    elif b == 0xDE:
+        count, offset = struct.unpack(">H", base[1:3])[0], 3
+    elif b == 0xDF:
+        count, offset = struct.unpack(">I", base[1:5])[0], 5
+    else:
+        raise ValueError("not a MessagePack map")
+    extra = b"".join(msgpack_codec.dumps(key) + msgpack_codec.dumps(value) for key, value in fields.items())
+    return msgpack_codec.map_header(count + len(fields)) + base[offset:] + extra
+
+
+class Frame:
+    """
+    An outbound PvP message encoded at most once per wire format, however many recipients it has.
+
+    .text is the JSON encoding and .binary the MessagePack one; each is produced on first use.
+    with_fields() derives a per-recipient frame by splicing extra top-level fields into the
+    already encoded parent, so a bulky shared part (e.g. the task statement) is not re-encoded.
+    """
+
+    __slots__ = ("type", "payload", "_text", "_binary", "_parent", "_fields")
+
+    def __init__(self, payload: Optional[dict] = None, *, type: Optional[str] = None, text: Optional[str] = None):
+        self.payload = payload
+        self.type = type if type is not None else str((payload or {}).get("type", ""))
+        self._text = text
+        self._binary: Optional[bytes] = None
+        self._parent: Optional[Frame] = None
+        self._fields: dict = {}
+
+    @classmethod
+    def from_text(cls, text: str, *, type: str) -> "Frame":
+        return cls(None, type=type, text=text)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if self._parent is not None:
+                base = self._parent.text
+                extra = codec.dumps(self._fields)
+                self._text = extra if base == "{}" else f"{base[:-1]},{extra[1:]}"
+            else:
+                self._text = codec.dumps(self.payload)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            if self._parent is not None:
+                self._binary = _splice_msgpack_map(self._parent.binary, self._fields)
+            else:
+                # Frames routed from another worker arrive as JSON text only.
+                payload = self.payload if self.payload is not None else codec.loads(self.text)
+                self._binary = msgpack_codec.dumps(payload)
+        return self._binary
+
+    def with_fields(self, **fields: Any) -> "Frame":
+        if not fields:
+            return self
+        frame = Frame(None, type=self.type)
+        frame._parent = self
+        frame._fields = fields
+        return frame
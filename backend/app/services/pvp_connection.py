@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+from app.services import pvp_metrics
+from app.services.pvp_codec import Frame
+
+logger = logging.getLogger(__name__)
+
+# Frames that are safe to drop under backpressure: later frames supersede them.
+STALE_FRAME_TYPES = frozenset({"round_end", "connected", "queue_joined", "queue_left"})
+
+# Close code for clients that cannot keep up with their outbound queue.
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+# Close code for clients that stopped answering heartbeats.
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 4009
+
+# Task hashes remembered per connection for clients that cache task bodies.
+TASK_CACHE_LIMIT = 2048
+
+
+class OutboundConnection:
+    """
+    A player's websocket with a bounded outbound queue drained by its own writer task.
+
+    enqueue() never blocks, so fan-out to one slow or stalled client does not delay the
+    opponent or the coroutine advancing the round. When the queue is full the policy applies:
+    - "coalesce": drop the oldest stale frame (see STALE_FRAME_TYPES); disconnect if there is none;
+    - "disconnect": close the socket right away.
+
+    `binary` connections negotiated MessagePack and get Frame.binary instead of Frame.text.
+    task_hashes is None until the client announces a task cache (task_cache message); after that
+    it holds the tasks the client has, so task frames can carry just the id and hash.
+    """
+
+    def __init__(
+        self,
+        *,
+        user_id: int,
+        websocket: WebSocket,
+        max_size: int,
+        policy: str,
+        on_error: Callable[["OutboundConnection"], Awaitable[None]],
+        binary: bool = False,
+    ) -> None:
+        self.user_id = user_id
+        self.websocket = websocket
+        self.binary = binary
+        self.task_hashes: Optional[set[str]] = None
+        # time.monotonic() of the last inbound message (any message counts, pong included).
+        self.last_seen = time.monotonic()
+        # Set on the first pong; clients that never answer pings are not subject to the heartbeat timeout.
+        self.answers_pings = False
+        self._max_size = max_size
+        self._policy = policy
+        self._on_error = on_error
+        # (frame, enqueued at) so the writer can report send latency.
+        self._frames: deque[tuple[Frame, float]] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        # Drops a slow consumer; referenced here, the event loop keeps only weak references to tasks.
+        self._closer: Optional[asyncio.Task] = None
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def stats(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+    def enable_task_cache(self, hashes: list[str]) -> None:
+        if self.task_hashes is None:
+            self.task_hashes = set()
+        for content_hash in hashes[: TASK_CACHE_LIMIT - len(self.task_hashes)]:
+            self.task_hashes.add(str(content_hash))
+
+    def has_task(self, content_hash: str) -> bool:
+        return self.task_hashes is not None and content_hash in self.task_hashes
+
+    def remember_task(self, content_hash: str) -> None:
+        if self.task_hashes is not None and len(self.task_hashes) < TASK_CACHE_LIMIT:
+            self.task_hashes.add(content_hash)
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        self._closed = True
+        self._frames.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+    def enqueue(self, frame: Frame) -> bool:
+        if self._closed:
+            pvp_metrics.send_failures.inc(reason="closed")
+            return False
+        if len(self._frames) >= self._max_size and not self._make_room():
+            self._closed = True
+            pvp_metrics.send_failures.inc(reason="slow_consumer")
+            self._closer = asyncio.create_task(self._drop_slow_consumer())
+            self._closer.add_done_callback(self._closer_done)
+            return False
+        self._frames.append((frame, time.perf_counter()))
+        self.max_depth = max(self.max_depth, len(self._frames))
+        self._ready.set()
+        return True
+
+    def _make_room(self) -> bool:
+        if self._policy != "coalesce":
+            return False
+        for idx, (frame, _) in enumerate(self._frames):
+            if frame.type in STALE_FRAME_TYPES:
+                del self._frames[idx]
+                self.dropped += 1
+                pvp_metrics.send_dropped.inc()
+                return True
+        return False
+
+    def _closer_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("dropping slow consumer %s failed", self.user_id, exc_info=task.exception())
+
+    async def _drop_slow_consumer(self) -> None:
+        try:
+            await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+        await self._on_error(self)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            while self._frames:
+                frame, enqueued_at = self._frames.popleft()
+                try:
+                    if self.binary:
+                        await self.websocket.send_bytes(frame.binary)
+                    else:
+                        await self.websocket.send_text(frame.text)
+                except Exception:
+                    self._closed = True
+                    pvp_metrics.send_failures.inc(reason="error")
+                    await self._on_error(self)
+                    return
+                self.sent += 1
+                pvp_metrics.send_seconds.observe(time.perf_counter() - enqueued_at)
+            self._ready.clear()
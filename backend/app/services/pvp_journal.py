@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from app.services import pvp_store
+
+
+class AnswerJournal:
+    """
+    Write-behind buffer for PvP answers and score updates.
+
+    Answers and the latest score per match are kept in memory and flushed in bulk every
+    `flush_interval` seconds or once `max_events` answers are buffered. Callers force a flush
+    (e.g. before finishing or canceling a match) with flush(); close() drains everything.
+    """
+
+    def __init__(
+        self,
+        *,
+        run_db: Callable[..., Awaitable[None]],
+        flush_interval: float,
+        max_events: int,
+    ) -> None:
+        self._run_db = run_db
+        self._flush_interval = flush_interval
+        self._max_events = max_events
+        self._answers: list[dict] = []
+        self._scores: dict[str, tuple[int, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    async def record(
+        self,
+        *,
+        match_id: str,
+        user_id: int,
+        answer: str,
+        is_correct: bool,
+        scores: tuple[int, int],
+    ) -> None:
+        self._answers.append(
+            {
+                "match_id": match_id,
+                "user_id": user_id,
+                "answer": answer,
+                "is_correct": is_correct,
+                "created_at": datetime.now(timezone.utc),
+            }
+        )
+        self._scores[match_id] = scores
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self._answers) >= self._max_events:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            answers, self._answers = self._answers, []
+            scores, self._scores = self._scores, {}
+            if not answers and not scores:
+                return
+            try:
+                await self._run_db(pvp_store.write_answers_batch, answers=answers, scores=scores)
+            except Exception:
+                # Put the batch back in front of anything recorded meanwhile; newer scores win.
+                self._answers[:0] = answers
+                self._scores = {**scores, **self._scores}
+                raise
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
@@ -1,29 +1,39 @@
 ﻿from __future__ import annotations
 
 import asyncio
+import functools
+import logging
 import time
-import uuid
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Optional
+from collections.abc import AsyncIterator, Coroutine
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TypeVar
 
 from fastapi import WebSocket
-from sqlalchemy import func, select
 
-from app.core.config import get_settings
-from app.core.db import SessionLocal
-from app.models.match import Match, MatchAnswer
-from app.models.task import Task
-from app.models.user import User
-from app.services.checker import check_answer
-from app.services.elo import update_elo
+from app.core.config import Settings, get_settings
+from app.services import pvp_metrics, pvp_store
+from app.services.pvp_backend import PvpStateBackend, create_backend
+from app.services.pvp_codec import Frame
+from app.services.pvp_connection import HEARTBEAT_TIMEOUT_CLOSE_CODE, OutboundConnection
+from app.services.checker import AnswerMatcher, CheckTimeout, task_matcher
+from app.services.checker_pool import checker_pool
+from app.services.pvp_journal import AnswerJournal
+from app.services.pvp_queue import QueueEntry
+from app.services.pvp_store import MatchResult, NewMatch
+from app.services.task_pool import TaskSnapshot, task_pool
+from app.services.rating_settlement import RatingSettler
+from app.services.timer_wheel import TimerWheel
 
+T = TypeVar("T")
 
-@dataclass
-class QueueEntry:
-    user_id: int
-    rating: int
-    joined_at: float
+logger = logging.getLogger(__name__)
+
+# Delays before each retry of a failed match settlement; after the last one the match is canceled.
+SETTLE_RETRY_DELAYS = (1.0, 5.0, 30.0)
+# How long shutdown waits for routed messages and closes still in flight before canceling them.
+BACKGROUND_DRAIN_SECONDS = 5.0
 
 
 @dataclass
@@ -41,43 +51,279 @@ class MatchState:
     max_rounds: int
     used_task_ids: set[int]
     task_id: int
-    correct_answer: str
-    answer_type: str
+    matcher: AnswerMatcher
     round_active: bool
-    timeout_task: Optional[asyncio.Task] = None
+    # Next round's task, selected in the background while the current round is played.
+    prefetch: Optional[asyncio.Task] = field(default=None, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
 
 
 class PvpManager:
+    """
+    Locking layout:
+    - each MatchState has its own lock, so answers in unrelated matches never wait on each other;
+    - the matchmaking queue lives in the state backend, which guards it separately;
+    - _connections, _matches and _user_matches are plain dicts mutated without awaits in between,
+      so reads (e.g. in _safe_send) are lock-free.
+
+    Sends never await the socket: each connection has a bounded outbound queue drained by its
+    own writer task (OutboundConnection), with pvp_send_queue_policy for slow consumers.
+    Outbound messages are Frames, encoded once per wire format (JSON, or MessagePack for clients
+    that negotiated it) and shared by every recipient. Clients that announce a task cache get
+    task frames as {id, hash} when they already hold that task body.
+
+    The queue, match ownership and cross-worker routing go through a PvpStateBackend
+    (in-memory by default, Redis for several workers/hosts). Matches owned by this worker
+    live in _matches; frames and messages for players on other workers are routed by the backend.
+
+    Deadlines are armed on a single TimerWheel instead of one sleeping asyncio.Task each:
+    match timeouts under ("match", match_id) and the heartbeat sweep under ("heartbeat",).
+    Every pvp_heartbeat_interval_seconds the sweep sends one shared ping frame to all
+    connections and reaps, in one batch, those silent for pvp_heartbeat_timeout_seconds
+    (any inbound message, pong included, counts). Only clients that have answered at least one
+    ping are reaped; older clients that do not know pong are left to uvicorn's protocol-level
+    websocket pings. The matchmaking tick reaps first too, so half-open connections are purged
+    from the queue before they can be paired. A timer callback
+    that raises is logged and counted in pvp_timer_errors_total; the heartbeat sweep re-arms
+    itself before doing any work, so a failed sweep does not stop the pings.
+
+    All database work goes through _run_db, a bounded executor dedicated to PvP, so a slow
+    commit delays only the coroutine that waits for it and never the event loop.
+    With pvp_write_behind enabled, answers and score updates are buffered in an AnswerJournal
+    and written in bulk; the journal is flushed before a match is finished or canceled.
+    Finished matches go through a RatingSettler, which settles ratings for everything that
+    finished within pvp_rating_settle_window_ms in one transaction. A settlement that fails is
+    retried on the timer wheel under ("settle", match_id) and, failing that, the match is canceled.
+
+    Queue, matchmaking, match lock, DB and send timings are recorded in pvp_metrics.
+    """
+
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
-        self._connections: dict[int, WebSocket] = {}
-        self._queue: list[QueueEntry] = []
+        settings = get_settings()
+        self._backend: PvpStateBackend = create_backend(settings)
+        self._started = False
+        self._connections: dict[int, OutboundConnection] = {}
+        self._send_queue_size = settings.pvp_send_queue_size
+        self._send_queue_policy = settings.pvp_send_queue_policy
+        self._matchmaker_task: Optional[asyncio.Task] = None
+        self._background: set[asyncio.Task] = set()
         self._matches: dict[str, MatchState] = {}
+        self._user_matches: dict[int, str] = {}
+        self._timers = TimerWheel(
+            tick=settings.pvp_timer_tick_ms / 1000.0,
+            on_error=lambda key, exc: pvp_metrics.timer_errors.inc(timer=str(key[0])),
+        )
+        self._db_executor = ThreadPoolExecutor(max_workers=settings.pvp_db_workers, thread_name_prefix="pvp-db")
+        self._journal: Optional[AnswerJournal] = None
+        if settings.pvp_write_behind:
+            self._journal = AnswerJournal(
+                run_db=self._run_db,
+                flush_interval=settings.pvp_write_behind_flush_ms / 1000.0,
+                max_events=settings.pvp_write_behind_max_events,
+            )
+        self._settler = RatingSettler(
+            run_db=self._run_db,
+            window=settings.pvp_rating_settle_window_ms / 1000.0,
+            max_batch=settings.pvp_rating_settle_max_batch,
+        )
+        self._heartbeat_interval = settings.pvp_heartbeat_interval_seconds
+        self._heartbeat_timeout = settings.pvp_heartbeat_timeout_seconds
+        pvp_metrics.active_matches.set_function(lambda: len(self._matches))
+        pvp_metrics.active_connections.set_function(lambda: len(self._connections))
+
+    async def _run_db(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        op = getattr(fn, "__name__", "db")
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._db_executor, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            pvp_metrics.db_errors.inc(op=op)
+            raise
+        finally:
+            pvp_metrics.db_seconds.observe(time.perf_counter() - started, op=op)
+
+    @asynccontextmanager
+    async def _match_lock(self, state: MatchState, op: str) -> AsyncIterator[None]:
+        requested = time.perf_counter()
+        async with state.lock:
+            acquired = time.perf_counter()
+            pvp_metrics.lock_wait_seconds.observe(acquired - requested, op=op)
+            try:
+                yield
+            finally:
+                pvp_metrics.lock_hold_seconds.observe(time.perf_counter() - acquired, op=op)
 
-    async def connect(self, *, user_id: int, websocket: WebSocket) -> None:
-        async with self._lock:
-            old = self._connections.get(user_id)
-            self._connections[user_id] = websocket
+    async def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        await self._backend.start(self._on_envelope)
+        self._timers.start()
+        if self._heartbeat_interval > 0:
+            self._timers.arm(("heartbeat",), self._heartbeat_interval, self._heartbeat)
+        self._ensure_matchmaker()
+
+    async def shutdown(self) -> None:
+        """Stop background work and drain pending writes; called from the app lifespan."""
+        if self._matchmaker_task is not None:
+            self._matchmaker_task.cancel()
+            self._matchmaker_task = None
+        self._timers.stop()
+        await self._drain_background()
+        if self._journal is not None:
+            await self._journal.close()
+        await self._settler.close()
+        await self._backend.close()
+        self._db_executor.shutdown(wait=True)
+
+    async def _on_envelope(self, envelope: dict) -> None:
+        kind = envelope.get("kind")
+        user_id = int(envelope.get("user_id", 0))
+        if kind == "frame":
+            frame = Frame.from_text(str(envelope.get("text", "")), type=str(envelope.get("type", "")))
+            self._send_local(user_id, frame)
+        elif kind == "message":
+            # Inbound handling may wait on the DB; keep the routing reader free.
+            self._spawn(self.handle_message(user_id=user_id, message=envelope.get("message") or {}), "routed message")
+        elif kind == "disconnect":
+            match_id = self._user_matches.get(user_id)
+            if match_id is not None:
+                self._spawn(self._cancel_match(match_id=match_id, reason="disconnect"), "routed disconnect")
+
+    def _spawn(self, coro: Coroutine[Any, Any, Any], what: str) -> asyncio.Task:
+        """
+        Run coro in the background, keeping a reference until it ends and logging it if it fails.
+        """
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(lambda done: self._background_done(done, what))
+        return task
 
-        if old is not None and old is not websocket:
-            try:
-                await old.close(code=4000)
-            except Exception:
-                pass
+    def _background_done(self, task: asyncio.Task, what: str) -> None:
+        self._background.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            logger.error("PvP background task failed: %s", what, exc_info=exc)
+
+    async def _drain_background(self) -> None:
+        """
+        Let in-flight background tasks finish for up to BACKGROUND_DRAIN_SECONDS, then cancel the rest.
+        """
+        if not self._background:
+            return
+        _, pending = await asyncio.wait(set(self._background), timeout=BACKGROUND_DRAIN_SECONDS)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def connect(self, *, user_id: int, websocket: WebSocket, binary: bool = False) -> None:
+        await self.start()
+        conn = OutboundConnection(
+            user_id=user_id,
+            websocket=websocket,
+            max_size=self._send_queue_size,
+            policy=self._send_queue_policy,
+            on_error=self._on_send_error,
+            binary=binary,
+        )
+        conn.start()
+        old = self._connections.get(user_id)
+        self._connections[user_id] = conn
+        await self._backend.bind_user(user_id)
+
+        if old is not None and old.websocket is not websocket:
+            old.stop()
+            await self._close_quietly(old.websocket, 4000)
 
         await self._safe_send(user_id, {"type": "connected"})
 
-    async def disconnect(self, *, user_id: int) -> None:
-        async with self._lock:
-            self._connections.pop(user_id, None)
-            self._queue = [q for q in self._queue if q.user_id != user_id]
-            affected = [m for m in self._matches.values() if user_id in (m.player1_id, m.player2_id)]
+    async def disconnect(self, *, user_id: int, websocket: Optional[WebSocket] = None) -> None:
+        """
+        Drop the user's connection, queue entry and live match.
+
+        With `websocket`, only if that socket is still the user's current one: a socket that
+        was replaced by a reconnect (or already reaped) must not tear down its successor.
+        """
+        conn = self._connections.get(user_id)
+        if websocket is not None and (conn is None or conn.websocket is not websocket):
+            return
+        self._connections.pop(user_id, None)
+        if conn is not None:
+            conn.stop()
+        await self._backend.queue_remove(user_id)
+        await self._release_user(user_id)
+
+    async def _release_user(self, user_id: int) -> None:
+        await self._backend.unbind_user(user_id)
+
+        match_id = self._user_matches.get(user_id)
+        if match_id is not None:
+            await self._cancel_match(match_id=match_id, reason="disconnect")
+            return
+
+        owner = await self._backend.match_owner(user_id)
+        if owner is not None:
+            await self._backend.forward(owner[0], {"kind": "disconnect", "user_id": user_id})
 
-        for match in affected:
-            await self._cancel_match(match_id=match.match_id, reason="disconnect")
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int) -> None:
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _heartbeat(self) -> None:
+        self._timers.arm(("heartbeat",), self._heartbeat_interval, self._heartbeat)
+        await self._reap_idle()
+        # One frame for every connection: encoded once per wire format.
+        ping = Frame({"type": "ping"})
+        for conn in list(self._connections.values()):
+            conn.enqueue(ping)
+
+    async def _reap_idle(self) -> None:
+        """
+        Close every connection silent for longer than the heartbeat timeout, as one batch.
+
+        Only connections that have answered a ping are reaped: older clients do not know pong,
+        and a player idling in the queue would otherwise be dropped after the timeout.
+        """
+        if self._heartbeat_timeout <= 0:
+            return
+        cutoff = time.monotonic() - self._heartbeat_timeout
+        idle = [conn for conn in self._connections.values() if conn.answers_pings and conn.last_seen < cutoff]
+        if not idle:
+            return
+
+        user_ids = [conn.user_id for conn in idle]
+        for conn in idle:
+            del self._connections[conn.user_id]
+            conn.stop()
+            # A close can wait on a dead peer; do not hold the heartbeat tick for it.
+            self._spawn(self._close_quietly(conn.websocket, HEARTBEAT_TIMEOUT_CLOSE_CODE), "idle close")
+        pvp_metrics.heartbeat_reaped.inc(len(idle))
+
+        await self._backend.queue_remove_many(user_ids)
+        for user_id in user_ids:
+            await self._release_user(user_id)
+
+    async def handle_message(self, *, user_id: int, message: Any) -> None:
+        conn = self._connections.get(user_id)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+        # Frames that failed to decode arrive as None; anything but an object is rejected the same way.
+        if not isinstance(message, dict):
+            await self._safe_send(user_id, {"type": "error", "message": "bad_message"})
+            return
 
-    async def handle_message(self, *, user_id: int, message: dict) -> None:
         msg_type = str(message.get("type", "")).strip()
+        if msg_type == "pong":
+            if conn is not None:
+                conn.answers_pings = True
+            return
 
         if msg_type == "queue_join":
             await self._queue_join(user_id=user_id)
@@ -89,119 +335,128 @@ class PvpManager:
 
         if msg_type == "answer_submit":
             match_id = str(message.get("match_id", "")).strip()
+            if match_id not in self._matches:
+                owner = await self._backend.match_owner(user_id)
+                if owner is not None and owner[1] == match_id:
+                    envelope = {"kind": "message", "user_id": user_id, "message": message}
+                    await self._backend.forward(owner[0], envelope)
+                    return
             answer = str(message.get("answer", ""))
             task_id = message.get("task_id")
             await self._answer_submit(user_id=user_id, match_id=match_id, answer=answer, task_id=task_id)
             return
 
+        if msg_type == "task_cache":
+            hashes = message.get("hashes") or []
+            conn = self._connections.get(user_id)
+            if conn is not None and isinstance(hashes, list):
+                conn.enable_task_cache(hashes)
+            return
+
+        if msg_type == "task_fetch":
+            await self._task_fetch(user_id=user_id, task_id=message.get("task_id"))
+            return
+
         await self._safe_send(user_id, {"type": "error", "message": "unknown_message_type"})
 
+    async def _task_fetch(self, *, user_id: int, task_id: Any) -> None:
+        # A client with a task cache got only {id, hash} but no longer has the body.
+        try:
+            task = await self._run_db(pvp_store.load_task, int(task_id))
+        except (TypeError, ValueError):
+            task = None
+        if task is None:
+            await self._safe_send(user_id, {"type": "error", "message": "task_not_found"})
+            return
+        conn = self._connections.get(user_id)
+        if conn is not None:
+            conn.remember_task(task.content_hash)
+        await self._safe_send(user_id, {"type": "task", "task": {**task.payload, "hash": task.content_hash}})
+
     async def _queue_join(self, *, user_id: int) -> None:
-        with SessionLocal() as db:
-            user = db.get(User, user_id)
-            if user is None:
-                await self._safe_send(user_id, {"type": "error", "message": "user_not_found"})
-                return
-            rating = int(user.rating or get_settings().pvp_initial_rating)
+        rating = await self._run_db(pvp_store.load_rating, user_id)
+        if rating is None:
+            await self._safe_send(user_id, {"type": "error", "message": "user_not_found"})
+            return
 
-        async with self._lock:
-            if any(q.user_id == user_id for q in self._queue):
-                return
-            self._queue.append(QueueEntry(user_id=user_id, rating=rating, joined_at=time.time()))
+        if not await self._backend.queue_add(QueueEntry(user_id=user_id, rating=rating, joined_at=time.time())):
+            return
 
+        self._ensure_matchmaker()
         await self._safe_send(user_id, {"type": "queue_joined"})
-        await self._try_matchmake()
+        if get_settings().pvp_matchmaking_mode != "batch":
+            # Batch mode pairs the whole queue on the next tick instead of on every join.
+            await self._try_matchmake()
 
     async def _queue_leave(self, *, user_id: int) -> None:
-        async with self._lock:
-            before = len(self._queue)
-            self._queue = [q for q in self._queue if q.user_id != user_id]
-            removed = before - len(self._queue)
+        removed = 1 if await self._backend.queue_remove(user_id) else 0
 
         await self._safe_send(user_id, {"type": "queue_left", "removed": removed})
 
-    async def _try_matchmake(self) -> None:
-        settings = get_settings()
+    def _ensure_matchmaker(self) -> None:
+        if self._matchmaker_task is None or self._matchmaker_task.done():
+            self._matchmaker_task = asyncio.create_task(self._matchmaking_loop())
 
+    async def _matchmaking_loop(self) -> None:
+        # Periodic tick: search windows widen over time, so players that could not be
+        # paired on join may become eligible later without any new queue events.
+        interval = get_settings().pvp_matchmaking_tick_seconds
         while True:
-            async with self._lock:
-                if len(self._queue) < 2:
-                    return
-
-                self._queue.sort(key=lambda q: q.joined_at)
-                a = self._queue[0]
-
-                opponent_index = None
-                for idx in range(1, len(self._queue)):
-                    b = self._queue[idx]
-                    if abs(a.rating - b.rating) <= settings.pvp_matchmaking_max_diff:
-                        opponent_index = idx
-                        break
-
-                if opponent_index is None:
-                    return
-
-                b = self._queue.pop(opponent_index)
-                self._queue.pop(0)
-
-            await self._start_match(a.user_id, b.user_id)
-
-    def _task_payload(self, task: Task) -> dict:
-        return {
-            "id": task.id,
-            "title": task.title,
-            "statement": task.statement,
-            "subject": task.subject,
-            "topic": task.topic,
-            "difficulty": task.difficulty,
-            "answer_type": task.answer_type,
-            "hints": task.hints,
-        }
-
-    def _pick_task(self, db, used_ids: set[int]) -> Optional[Task]:
-        stmt = select(Task)
-        if used_ids:
-            stmt = stmt.where(Task.id.notin_(used_ids))
-        stmt = stmt.order_by(func.rand()).limit(1)
-        task = db.execute(stmt).scalar_one_or_none()
-        if task is None:
-            task = db.execute(select(Task).order_by(func.rand()).limit(1)).scalar_one_or_none()
-        return task
+            await asyncio.sleep(interval)
+            try:
+                # Purge half-open connections first so they are never paired.
+                await self._reap_idle()
+                await self._try_matchmake()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pvp_metrics.matchmaking_errors.inc()
+                continue
 
-    async def _start_match(self, user_a: int, user_b: int) -> None:
+    async def _try_matchmake(self) -> None:
         settings = get_settings()
+        pvp_metrics.matchmaking_ticks.inc()
+        with pvp_metrics.matchmaking_tick_seconds.time():
+            await self._matchmake(settings)
+        pvp_metrics.queue_size.set(await self._backend.queue_size())
+
+    async def _matchmake(self, settings: Settings) -> None:
+        now = time.time()
+        pairs = await self._backend.queue_pop_pairs(
+            now=now,
+            base_diff=settings.pvp_matchmaking_max_diff,
+            growth_per_second=settings.pvp_matchmaking_window_growth_per_second,
+            max_diff=settings.pvp_matchmaking_window_max,
+            mode=settings.pvp_matchmaking_mode,
+        )
+        if not pairs:
+            return
+        pvp_metrics.matchmaking_pairs.inc(len(pairs))
+        for pair in pairs:
+            for entry in pair:
+                pvp_metrics.queue_wait_seconds.observe(max(0.0, now - entry.joined_at))
+        await self._start_matches([(a.user_id, b.user_id) for a, b in pairs])
+
+    async def _start_matches(self, pairs: list[tuple[int, int]]) -> None:
+        created = await self._run_db(pvp_store.create_matches, pairs)
+        await asyncio.gather(
+            *(self._open_match(user_a, user_b, new_match) for (user_a, user_b), new_match in zip(pairs, created))
+        )
 
-        with SessionLocal() as db:
-            player1 = db.get(User, user_a)
-            player2 = db.get(User, user_b)
-            if player1 is None or player2 is None:
-                return
-
-            task = self._pick_task(db, set())
-            if task is None:
-                await self._safe_send(user_a, {"type": "error", "message": "no_tasks"})
-                await self._safe_send(user_b, {"type": "error", "message": "no_tasks"})
-                return
+    async def _open_match(self, user_a: int, user_b: int, created: Optional[NewMatch]) -> None:
+        settings = get_settings()
 
-            match_id = str(uuid.uuid4())
-            rating_a = int(player1.rating or settings.pvp_initial_rating)
-            rating_b = int(player2.rating or settings.pvp_initial_rating)
-
-            match = Match(
-                id=match_id,
-                status="active",
-                task_id=task.id,
-                player1_id=player1.id,
-                player2_id=player2.id,
-                player1_rating_before=rating_a,
-                player2_rating_before=rating_b,
-                player1_score=0,
-                player2_score=0,
-            )
-            db.add(match)
-            db.commit()
+        if created is None:
+            return
+        task = created.task
+        if task is None:
+            await self._safe_send(user_a, {"type": "error", "message": "no_tasks"})
+            await self._safe_send(user_b, {"type": "error", "message": "no_tasks"})
+            return
 
-            task_payload = self._task_payload(task)
+        match_id = created.match_id
+        rating_a = created.player1_rating
+        rating_b = created.player2_rating
 
         state = MatchState(
             match_id=match_id,
@@ -217,69 +472,90 @@ class PvpManager:
             max_rounds=settings.pvp_max_rounds,
             used_task_ids={task.id},
             task_id=task.id,
-            correct_answer=str(task.correct_answer),
-            answer_type=str(task.answer_type),
+            matcher=task_matcher(task),
             round_active=True,
         )
 
-        async with self._lock:
-            self._matches[match_id] = state
-
-        state.timeout_task = asyncio.create_task(self._match_timeout(match_id, settings.pvp_match_timeout_seconds))
+        self._matches[match_id] = state
+        self._user_matches[user_a] = match_id
+        self._user_matches[user_b] = match_id
+        await self._backend.bind_match(match_id, (user_a, user_b))
+        pvp_metrics.matches_started.inc()
+        self._start_prefetch(state)
+
+        self._timers.arm(
+            ("match", match_id),
+            settings.pvp_match_timeout_seconds,
+            functools.partial(self._finish_match, match_id),
+        )
 
-        payload = {
-            "type": "match_found",
-            "match_id": match_id,
-            "round": state.round_index,
-            "target_score": state.target_score,
-            "task": task_payload,
-        }
-        await self._safe_send(user_a, {**payload, "opponent_user_id": user_b})
-        await self._safe_send(user_b, {**payload, "opponent_user_id": user_a})
+        full, slim = self._task_frames(
+            {
+                "type": "match_found",
+                "match_id": match_id,
+                "round": state.round_index,
+                "target_score": state.target_score,
+            },
+            task,
+        )
+        await self._send_task(
+            user_a, full.with_fields(opponent_user_id=user_b), slim.with_fields(opponent_user_id=user_b), task
+        )
+        await self._send_task(
+            user_b, full.with_fields(opponent_user_id=user_a), slim.with_fields(opponent_user_id=user_a), task
+        )
 
-    async def _match_timeout(self, match_id: str, seconds: int) -> None:
-        try:
-            await asyncio.sleep(seconds)
-            await self._finish_match(match_id)
-        except asyncio.CancelledError:
+    async def _answer_submit(self, *, user_id: int, match_id: str, answer: str, task_id) -> None:
+        state = self._matches.get(match_id)
+        if state is None:
+            return
+        if user_id not in (state.player1_id, state.player2_id):
             return
 
-    async def _answer_submit(self, *, user_id: int, match_id: str, answer: str, task_id) -> None:
-        async with self._lock:
-            state = self._matches.get(match_id)
-            if state is None:
-                return
-            if user_id not in (state.player1_id, state.player2_id):
-                return
+        async with self._match_lock(state, "answer_submit"):
             if not state.round_active:
-                await self._safe_send(user_id, {"type": "round_closed"})
-                return
-            if task_id is not None and int(task_id) != state.task_id:
-                await self._safe_send(user_id, {"type": "wrong_task"})
-                return
+                rejected = "round_closed"
+            elif task_id is not None and str(task_id) != str(state.task_id):
+                rejected = "wrong_task"
+            else:
+                rejected = None
+
+            if rejected is None:
+                # Heavy answer types are checked in the process pool; only this match waits.
+                try:
+                    is_correct = await checker_pool.check(state.matcher, answer)
+                except CheckTimeout:
+                    rejected = "check_timeout"
+
+            if rejected is None:
+                state.round_active = False
+                scored_user_id = None
+                if is_correct:
+                    if user_id == state.player1_id:
+                        state.player1_score += 1
+                    else:
+                        state.player2_score += 1
+                    scored_user_id = user_id
+
+                scores = (state.player1_score, state.player2_score)
+
+        if rejected is not None:
+            await self._safe_send(user_id, {"type": rejected})
+            return
 
-            is_correct = check_answer(
-                answer=answer, correct_answer=state.correct_answer, answer_type=state.answer_type
+        if self._journal is not None:
+            await self._journal.record(
+                match_id=match_id, user_id=user_id, answer=answer, is_correct=is_correct, scores=scores
+            )
+        else:
+            await self._run_db(
+                pvp_store.record_answer,
+                match_id=match_id,
+                user_id=user_id,
+                answer=answer,
+                is_correct=is_correct,
+                scores=scores,
             )
-
-            state.round_active = False
-            scored_user_id = None
-            if is_correct:
-                if user_id == state.player1_id:
-                    state.player1_score += 1
-                else:
-                    state.player2_score += 1
-                scored_user_id = user_id
-
-            scores = (state.player1_score, state.player2_score)
-
-        with SessionLocal() as db:
-            db.add(MatchAnswer(match_id=match_id, user_id=user_id, answer=answer, is_correct=is_correct))
-            match = db.get(Match, match_id)
-            if match is not None:
-                match.player1_score = scores[0]
-                match.player2_score = scores[1]
-                db.commit()
 
         await self._safe_send(
             user_id,
@@ -306,10 +582,10 @@ class PvpManager:
         await self._advance_round_or_finish(match_id)
 
     async def _advance_round_or_finish(self, match_id: str) -> None:
-        async with self._lock:
-            state = self._matches.get(match_id)
-            if state is None:
-                return
+        state = self._matches.get(match_id)
+        if state is None:
+            return
+        async with self._match_lock(state, "advance_round"):
             if state.player1_score >= state.target_score or state.player2_score >= state.target_score:
                 should_finish = True
             elif state.round_index >= state.max_rounds:
@@ -323,85 +599,100 @@ class PvpManager:
             await self._next_round(match_id)
 
     async def _next_round(self, match_id: str) -> None:
-        with SessionLocal() as db:
-            task = None
-            async with self._lock:
-                state = self._matches.get(match_id)
-                if state is None:
-                    return
-                used_ids = set(state.used_task_ids)
-            task = self._pick_task(db, used_ids)
-            if task is None:
-                await self._finish_match(match_id)
-                return
-            task_payload = self._task_payload(task)
+        state = self._matches.get(match_id)
+        if state is None:
+            return
+
+        async with self._match_lock(state, "next_round"):
+            used_ids = set(state.used_task_ids)
+            pending, state.prefetch = state.prefetch, None
+
+        task = await self._take_prefetched(pending)
+        if task is None or task.id in used_ids or not task_pool.is_fresh(task):
+            task = await self._run_db(pvp_store.next_task, used_ids)
+        if task is None:
+            await self._finish_match(match_id)
+            return
 
-        async with self._lock:
-            state = self._matches.get(match_id)
-            if state is None:
+        matcher = task_matcher(task)
+        async with self._match_lock(state, "next_round"):
+            if self._matches.get(match_id) is not state:
                 return
             state.round_index += 1
             state.task_id = task.id
-            state.correct_answer = str(task.correct_answer)
-            state.answer_type = str(task.answer_type)
+            state.matcher = matcher
             state.used_task_ids.add(task.id)
             state.round_active = True
             round_index = state.round_index
+            self._start_prefetch(state)
 
-        await self._broadcast(
-            match_id,
+        full, slim = self._task_frames(
             {
                 "type": "next_task",
                 "match_id": match_id,
                 "round": round_index,
-                "task": task_payload,
             },
+            task,
         )
+        await self._send_task(state.player1_id, full, slim, task)
+        await self._send_task(state.player2_id, full, slim, task)
 
-    async def _finish_match(self, match_id: str) -> None:
-        settings = get_settings()
+    def _start_prefetch(self, state: MatchState) -> None:
+        if state.round_index >= state.max_rounds:
+            return
+        state.prefetch = asyncio.create_task(self._run_db(pvp_store.next_task, set(state.used_task_ids)))
 
-        async with self._lock:
-            state = self._matches.pop(match_id, None)
-            if state is None:
-                return
-            current = asyncio.current_task()
-            if state.timeout_task and state.timeout_task is not current:
-                state.timeout_task.cancel()
-            a = state.player1_id
-            b = state.player2_id
-
-        if state.player1_score > state.player2_score:
-            score_a = 1.0
-        elif state.player1_score < state.player2_score:
-            score_a = 0.0
-        else:
-            score_a = 0.5
+    async def _take_prefetched(self, pending: Optional[asyncio.Task]) -> Optional[TaskSnapshot]:
+        if pending is None:
+            return None
+        try:
+            return await pending
+        except Exception:
+            return None
 
-        new_a, new_b = update_elo(
-            rating_a=state.player1_rating_before,
-            rating_b=state.player2_rating_before,
-            score_a=score_a,
-            k=settings.pvp_rating_k,
+    async def _finish_match(self, match_id: str) -> None:
+        state = self._pop_match(match_id)
+        if state is None:
+            return
+        self._timers.cancel(("match", match_id))
+        await self._backend.unbind_match(match_id, (state.player1_id, state.player2_id))
+        await self._settle(state)
+
+    async def _settle(self, state: MatchState, attempt: int = 0) -> None:
+        """
+        Write a finished match and its ratings. On failure the settlement is retried on the
+        timer wheel after each of SETTLE_RETRY_DELAYS; if the last retry fails too, the match
+        is canceled, so it never stays "active" in the database.
+        """
+        match_id = state.match_id
+        a = state.player1_id
+        b = state.player2_id
+        result = MatchResult(
+            match_id=match_id,
+            player1_id=a,
+            player2_id=b,
+            player1_rating_before=state.player1_rating_before,
+            player2_rating_before=state.player2_rating_before,
+            player1_score=state.player1_score,
+            player2_score=state.player2_score,
         )
+        score_a = result.score_a
 
-        with SessionLocal() as db:
-            match = db.get(Match, match_id)
-            if match is not None and match.status == "active":
-                match.status = "finished"
-                match.player1_score = state.player1_score
-                match.player2_score = state.player2_score
-                match.player1_rating_after = new_a
-                match.player2_rating_after = new_b
-                match.ended_at = datetime.now(timezone.utc)
-
-            user_a = db.get(User, a)
-            user_b = db.get(User, b)
-            if user_a is not None:
-                user_a.rating = new_a
-            if user_b is not None:
-                user_b.rating = new_b
-            db.commit()
+        try:
+            if self._journal is not None:
+                await self._journal.flush()
+            new_a, new_b = await self._settler.submit(result)
+        except Exception:
+            pvp_metrics.settle_errors.inc()
+            if attempt < len(SETTLE_RETRY_DELAYS):
+                delay = SETTLE_RETRY_DELAYS[attempt]
+                logger.warning("settling match %s failed, retrying in %gs", match_id, delay, exc_info=True)
+                self._timers.arm(("settle", match_id), delay, functools.partial(self._settle, state, attempt + 1))
+            else:
+                logger.error("settling match %s failed, canceling it", match_id, exc_info=True)
+                await self._close_canceled(state, reason="settle_failed")
+            return
+        pvp_metrics.matches_finished.inc()
 
         await self._safe_send(
             a,
@@ -425,46 +716,86 @@ class PvpManager:
         )
 
     async def _cancel_match(self, *, match_id: str, reason: str) -> None:
-        async with self._lock:
-            state = self._matches.pop(match_id, None)
-            if state and state.timeout_task:
-                state.timeout_task.cancel()
-
+        state = self._pop_match(match_id)
         if state is None:
             return
+        self._timers.cancel(("match", match_id))
+        await self._backend.unbind_match(match_id, (state.player1_id, state.player2_id))
 
-        with SessionLocal() as db:
-            match = db.get(Match, match_id)
-            if match is not None and match.status == "active":
-                match.status = "canceled"
-                match.canceled_reason = reason
-                match.ended_at = datetime.now(timezone.utc)
-                db.commit()
+        if self._journal is not None:
+            try:
+                await self._journal.flush()
+            except Exception:
+                # The journal keeps the batch and its flush loop writes it later.
+                logger.warning("flushing answers of match %s failed", match_id, exc_info=True)
+        await self._close_canceled(state, reason=reason)
 
-        await self._safe_send(state.player1_id, {"type": "match_canceled", "match_id": match_id, "reason": reason})
-        await self._safe_send(state.player2_id, {"type": "match_canceled", "match_id": match_id, "reason": reason})
+    async def _close_canceled(self, state: MatchState, *, reason: str) -> None:
+        try:
+            await self._run_db(pvp_store.cancel_match, match_id=state.match_id, reason=reason)
+        except Exception:
+            logger.error("canceling match %s failed", state.match_id, exc_info=True)
+        pvp_metrics.matches_canceled.inc(reason=reason)
 
-    async def _broadcast(self, match_id: str, payload: dict) -> None:
-        async with self._lock:
-            state = self._matches.get(match_id)
-            if state is None:
-                return
-            a = state.player1_id
-            b = state.player2_id
+        frame = Frame({"type": "match_canceled", "match_id": state.match_id, "reason": reason})
+        await self._safe_send(state.player1_id, frame)
+        await self._safe_send(state.player2_id, frame)
 
-        await self._safe_send(a, payload)
-        await self._safe_send(b, payload)
+    def _pop_match(self, match_id: str) -> Optional[MatchState]:
+        state = self._matches.pop(match_id, None)
+        if state is None:
+            return None
+        if state.prefetch is not None:
+            state.prefetch.cancel()
+            state.prefetch = None
+        for user_id in (state.player1_id, state.player2_id):
+            if self._user_matches.get(user_id) == match_id:
+                del self._user_matches[user_id]
+        return state
 
-    async def _safe_send(self, user_id: int, payload: dict) -> None:
-        async with self._lock:
-            ws = self._connections.get(user_id)
+    async def _broadcast(self, match_id: str, payload: dict) -> None:
+        state = self._matches.get(match_id)
+        if state is None:
+            return
 
-        if ws is None:
+        frame = Frame(payload)
+        await self._safe_send(state.player1_id, frame)
+        await self._safe_send(state.player2_id, frame)
+
+    @staticmethod
+    def _task_frames(fields: dict, task: TaskSnapshot) -> tuple[Frame, Frame]:
+        """(full, slim) variants of a task frame; each is encoded only if some recipient needs it."""
+        full = Frame({**fields, "task": {**task.payload, "hash": task.content_hash}})
+        slim = Frame({**fields, "task": {"id": task.id, "hash": task.content_hash}})
+        return full, slim
+
+    async def _send_task(self, user_id: int, full: Frame, slim: Frame, task: TaskSnapshot) -> None:
+        conn = self._connections.get(user_id)
+        if conn is not None and conn.has_task(task.content_hash):
+            await self._safe_send(user_id, slim)
             return
-        try:
-            await ws.send_json(payload)
-        except Exception:
-            await self.disconnect(user_id=user_id)
+        if conn is not None:
+            conn.remember_task(task.content_hash)
+        await self._safe_send(user_id, full)
+
+    async def _safe_send(self, user_id: int, payload: dict | Frame) -> None:
+        frame = payload if isinstance(payload, Frame) else Frame(payload)
+        if not self._send_local(user_id, frame) and not await self._backend.send_remote(user_id, frame):
+            pvp_metrics.send_failures.inc(reason="no_connection")
+
+    def _send_local(self, user_id: int, frame: Frame) -> bool:
+        conn = self._connections.get(user_id)
+        if conn is None:
+            return False
+        conn.enqueue(frame)
+        return True
+
+    async def _on_send_error(self, conn: OutboundConnection) -> None:
+        if self._connections.get(conn.user_id) is conn:
+            await self.disconnect(user_id=conn.user_id)
+
+    def connection_stats(self) -> list[dict]:
+        return [conn.stats() for conn in list(self._connections.values())]
 
 
 pvp_manager = PvpManager()
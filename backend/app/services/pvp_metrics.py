@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from app.services.metrics import registry
+
+queue_size = registry.gauge("pvp_queue_size", "Players waiting in the matchmaking queue (sampled every tick).")
+queue_wait_seconds = registry.histogram(
+    "pvp_queue_wait_seconds",
+    "Time from queue_join to being paired.",
+    buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+matchmaking_ticks = registry.counter("pvp_matchmaking_ticks_total", "Matchmaking attempts (joins and ticks).")
+matchmaking_pairs = registry.counter("pvp_matchmaking_pairs_total", "Pairs produced by matchmaking.")
+matchmaking_errors = registry.counter("pvp_matchmaking_errors_total", "Matchmaking ticks that raised.")
+matchmaking_tick_seconds = registry.histogram(
+    "pvp_matchmaking_tick_seconds", "Time to pair the queue and open the resulting matches."
+)
+
+lock_wait_seconds = registry.histogram(
+    "pvp_lock_wait_seconds", "Time spent waiting for a match lock.", labelnames=("op",)
+)
+lock_hold_seconds = registry.histogram("pvp_lock_hold_seconds", "Time a match lock was held.", labelnames=("op",))
+
+db_seconds = registry.histogram(
+    "pvp_db_seconds", "Time of PvP database calls, including executor queueing.", labelnames=("op",)
+)
+db_errors = registry.counter("pvp_db_errors_total", "PvP database calls that raised.", labelnames=("op",))
+
+send_seconds = registry.histogram(
+    "pvp_send_seconds", "Time from enqueueing an outbound frame to the websocket write completing."
+)
+send_failures = registry.counter(
+    "pvp_send_failures_total",
+    "Outbound frames that were not delivered (no_connection, closed, slow_consumer, error).",
+    labelnames=("reason",),
+)
+send_dropped = registry.counter("pvp_send_dropped_total", "Stale frames coalesced away under backpressure.")
+
+matches_started = registry.counter("pvp_matches_started_total", "Matches opened on this worker.")
+matches_finished = registry.counter("pvp_matches_finished_total", "Matches finished and rated.")
+settle_errors = registry.counter(
+    "pvp_settle_errors_total", "Attempts to settle a finished match that raised (retried, then canceled)."
+)
+matches_canceled = registry.counter("pvp_matches_canceled_total", "Matches canceled.", labelnames=("reason",))
+
+active_matches = registry.gauge("pvp_active_matches", "Live matches owned by this worker.")
+active_connections = registry.gauge("pvp_active_connections", "PvP websockets connected to this worker.")
+timer_errors = registry.counter(
+    "pvp_timer_errors_total", "Timer callbacks (match timeouts, heartbeat sweeps) that raised.", labelnames=("timer",)
+)
+heartbeat_reaped = registry.counter(
+    "pvp_heartbeat_reaped_total", "Connections closed for missing heartbeats (including their queue entries)."
+)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+
+@dataclass
+class QueueEntry:
+    user_id: int
+    rating: int
+    joined_at: float
+
+
+def search_window(entry: QueueEntry, *, now: float, base: int, growth_per_second: float, cap: int) -> int:
+    """Allowed rating difference for an entry; widens the longer the player waits."""
+    waited = max(0.0, now - entry.joined_at)
+    return min(cap, base + int(waited * growth_per_second))
+
+
+def batch_pairs(
+    entries: list[QueueEntry],
+    *,
+    now: float,
+    base_diff: int,
+    growth_per_second: float,
+    max_diff: int,
+    lookback: int = 3,
+) -> list[tuple[QueueEntry, QueueEntry]]:
+    """
+    Near-optimal pairing of a whole queue snapshot; `entries` must be sorted by rating.
+
+    Minimizes the sum of rating differences of the pairs plus, for every player left in the
+    queue, their uncapped search window (base + waited * growth): leaving a long waiter unpaired
+    costs more than leaving a newcomer. A pair is allowed when the difference fits the search
+    window of the player who has waited longer, the same rule as greedy mode: every window widens
+    with waiting time at the same rate, so that is also the wider of the two windows.
+
+    On a rating line the cheapest pairs are close neighbours, so a DP over the sorted entries
+    that pairs each player with one of the previous `lookback` players is O(n * lookback) and
+    near-optimal (exact unless the search windows force pairs that cross).
+    """
+    n = len(entries)
+    if n < 2:
+        return []
+    ratings = [entry.rating for entry in entries]
+    windows = [
+        search_window(entry, now=now, base=base_diff, growth_per_second=growth_per_second, cap=max_diff)
+        for entry in entries
+    ]
+    skip = [base_diff + max(0.0, now - entry.joined_at) * growth_per_second for entry in entries]
+    skip_prefix = [0.0] * (n + 1)
+    for i, cost in enumerate(skip):
+        skip_prefix[i + 1] = skip_prefix[i] + cost
+
+    # best[k]: lowest cost for the first k entries; choice[k]: partner of entry k - 1, or -1 if it waits.
+    best = [0.0] * (n + 1)
+    choice = [-1] * (n + 1)
+    for k in range(1, n + 1):
+        i = k - 1
+        best[k] = best[i] + skip[i]
+        choice[k] = -1
+        for j in range(i - 1, max(-1, i - 1 - lookback), -1):
+            diff = ratings[i] - ratings[j]
+            # The longer waiter's window, i.e. the wider one.
+            if diff > max(windows[i], windows[j]):
+                if diff > max_diff:
+                    break
+                continue
+            cost = best[j] + diff + skip_prefix[i] - skip_prefix[j + 1]
+            if cost < best[k]:
+                best[k] = cost
+                choice[k] = j
+
+    pairs: list[tuple[QueueEntry, QueueEntry]] = []
+    k = n
+    while k > 0:
+        j = choice[k]
+        if j < 0:
+            k -= 1
+            continue
+        a, b = entries[j], entries[k - 1]
+        # The player who has waited longer goes first, as in greedy mode.
+        pairs.append((a, b) if a.joined_at <= b.joined_at else (b, a))
+        k = j
+    pairs.reverse()
+    return pairs
+
+
+class MatchmakingQueue:
+    """
+    Matchmaking queue indexed by rating.
+
+    - _entries keeps join order (dict insertion order), so the oldest players are served first;
+    - _buckets maps each rating to the players queued with exactly that rating, also in join
+      order;
+    - _ratings is the sorted list of ratings that have a bucket. nearest() bisects it for the
+      player's rating and looks at the neighbouring buckets only: O(log r) for r distinct
+      ratings, whatever the rating gap. add() and remove() are dict operations, plus a list
+      insert or delete (a memmove of r pointers) when a rating gets its first player or loses
+      its last one.
+
+    Entries are expected to be added in join order (the backends do), which makes the first
+    player of a bucket the one waiting longest.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, QueueEntry] = {}
+        self._buckets: dict[int, dict[int, QueueEntry]] = {}
+        self._ratings: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        return iter(list(self._entries.values()))
+
+    def add(self, entry: QueueEntry) -> bool:
+        if entry.user_id in self._entries:
+            return False
+        self._entries[entry.user_id] = entry
+        bucket = self._buckets.get(entry.rating)
+        if bucket is None:
+            bucket = self._buckets[entry.rating] = {}
+            insort(self._ratings, entry.rating)
+        bucket[entry.user_id] = entry
+        return True
+
+    def remove(self, user_id: int) -> Optional[QueueEntry]:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return None
+        bucket = self._buckets[entry.rating]
+        del bucket[user_id]
+        if not bucket:
+            del self._buckets[entry.rating]
+            del self._ratings[bisect_left(self._ratings, entry.rating)]
+        return entry
+
+    def _oldest(self, rating: int, user_id: int) -> Optional[QueueEntry]:
+        for candidate in self._buckets.get(rating, {}).values():
+            if candidate.user_id != user_id:
+                return candidate
+        return None
+
+    def nearest(self, entry: QueueEntry, *, limit: Optional[int] = None) -> Optional[QueueEntry]:
+        """
+        Queued player with the closest rating to `entry`, at most `limit` points away
+        (unbounded by default); ties go to the one waiting longer.
+        """
+        ratings = self._ratings
+        # ratings[above] is the first rating >= entry.rating, ratings[below] the last one under it.
+        above = bisect_left(ratings, entry.rating)
+        below = above - 1
+        upper = None
+        # Only the player's own bucket can hold nobody else; step past it if so.
+        while above < len(ratings) and upper is None:
+            upper = self._oldest(ratings[above], entry.user_id)
+            above += 1
+        lower = self._oldest(ratings[below], entry.user_id) if below >= 0 else None
+
+        if upper is not None and lower is not None:
+            upper_diff, lower_diff = upper.rating - entry.rating, entry.rating - lower.rating
+            if upper_diff != lower_diff:
+                best = upper if upper_diff < lower_diff else lower
+            else:
+                best = lower if lower.joined_at <= upper.joined_at else upper
+        else:
+            best = upper or lower
+        if best is None or (limit is not None and abs(best.rating - entry.rating) > limit):
+            return None
+        return best
+
+    def sorted_entries(self) -> list[QueueEntry]:
+        """All entries by rating, then join order: O(n), the ratings are kept sorted."""
+        return [entry for rating in self._ratings for entry in self._buckets[rating].values()]
+
+    def pop_pairs(
+        self,
+        *,
+        now: float,
+        base_diff: int,
+        growth_per_second: float,
+        max_diff: int,
+        mode: str = "greedy",
+    ) -> list[tuple[QueueEntry, QueueEntry]]:
+        """
+        Pair every eligible player in one pass.
+
+        - "greedy": oldest first, each with the nearest rating; a pair is accepted when the
+          rating difference fits the search window of the player who has waited longer;
+        - "batch": global min-cost pairing of the whole queue, see batch_pairs().
+        """
+        if mode == "batch":
+            pairs = batch_pairs(
+                self.sorted_entries(),
+                now=now,
+                base_diff=base_diff,
+                growth_per_second=growth_per_second,
+                max_diff=max_diff,
+            )
+            for pair in pairs:
+                for entry in pair:
+                    self.remove(entry.user_id)
+            return pairs
+
+        pairs: list[tuple[QueueEntry, QueueEntry]] = []
+        for entry in list(self._entries.values()):
+            if len(self._entries) < 2:
+                break
+            if entry.user_id not in self._entries:
+                continue
+            window = search_window(entry, now=now, base=base_diff, growth_per_second=growth_per_second, cap=max_diff)
+            opponent = self.nearest(entry, limit=window)
+            if opponent is None:
+                continue
+            self.remove(entry.user_id)
+            self.remove(opponent.user_id)
+            pairs.append((entry, opponent))
+        return pairs
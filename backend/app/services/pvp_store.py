@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.models.match import Match, MatchAnswer
+from app.models.user import User
+from app.services.elo import update_elo
+from app.services.task_pool import TaskSnapshot, task_pool
+
+# Synchronous PvP data access. Every function opens its own session and commits at most once,
+# so PvpManager can run them on its dedicated executor without touching the event loop.
+
+
+@dataclass(frozen=True)
+class NewMatch:
+    match_id: str
+    player1_rating: int
+    player2_rating: int
+    task: Optional[TaskSnapshot]
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    match_id: str
+    player1_id: int
+    player2_id: int
+    player1_rating_before: int
+    player2_rating_before: int
+    player1_score: int
+    player2_score: int
+
+    @property
+    def score_a(self) -> float:
+        if self.player1_score > self.player2_score:
+            return 1.0
+        if self.player1_score < self.player2_score:
+            return 0.0
+        return 0.5
+
+
+def pick_task(db: Session, used_ids: set[int]) -> Optional[TaskSnapshot]:
+    task_pool.ensure_loaded(db)
+    while True:
+        task_id = task_pool.sample(exclude=used_ids)
+        if task_id is None and used_ids:
+            task_id = task_pool.sample()
+        if task_id is None:
+            return None
+        task = task_pool.get(db, task_id)
+        if task is not None:
+            return task
+
+
+def load_rating(user_id: int) -> Optional[int]:
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        if user is None:
+            return None
+        return int(user.rating or get_settings().pvp_initial_rating)
+
+
+def next_task(used_ids: set[int]) -> Optional[TaskSnapshot]:
+    with SessionLocal() as db:
+        return pick_task(db, used_ids)
+
+
+def load_task(task_id: int) -> Optional[TaskSnapshot]:
+    with SessionLocal() as db:
+        return task_pool.get(db, task_id)
+
+
+def create_matches(pairs: list[tuple[int, int]]) -> list[Optional[NewMatch]]:
+    """
+    Creates the matches of one matchmaking tick with one user SELECT and one commit.
+
+    Per pair: None if a player is gone; NewMatch.task is None if there are no tasks.
+    """
+    settings = get_settings()
+    created: list[Optional[NewMatch]] = []
+
+    with SessionLocal() as db:
+        user_ids = {user_id for pair in pairs for user_id in pair}
+        ratings = {
+            int(row.id): int(row.rating or settings.pvp_initial_rating)
+            for row in db.execute(select(User.id, User.rating).where(User.id.in_(user_ids)))
+        }
+
+        for user_a, user_b in pairs:
+            if user_a not in ratings or user_b not in ratings:
+                created.append(None)
+                continue
+
+            rating_a = ratings[user_a]
+            rating_b = ratings[user_b]
+            match_id = str(uuid.uuid4())
+
+            task = pick_task(db, set())
+            if task is not None:
+                db.add(
+                    Match(
+                        id=match_id,
+                        status="active",
+                        task_id=task.id,
+                        player1_id=user_a,
+                        player2_id=user_b,
+                        player1_rating_before=rating_a,
+                        player2_rating_before=rating_b,
+                        player1_score=0,
+                        player2_score=0,
+                    )
+                )
+            created.append(NewMatch(match_id=match_id, player1_rating=rating_a, player2_rating=rating_b, task=task))
+
+        db.commit()
+
+    return created
+
+
+def record_answer(*, match_id: str, user_id: int, answer: str, is_correct: bool, scores: tuple[int, int]) -> None:
+    with SessionLocal() as db:
+        db.add(MatchAnswer(match_id=match_id, user_id=user_id, answer=answer, is_correct=is_correct))
+        match = db.get(Match, match_id)
+        if match is not None:
+            match.player1_score = scores[0]
+            match.player2_score = scores[1]
+            db.commit()
+
+
+def write_answers_batch(*, answers: list[dict], scores: dict[str, tuple[int, int]]) -> None:
+    """Write-behind flush: one multi-row INSERT for answers and one UPDATE per match, one commit."""
+    if not answers and not scores:
+        return
+    with SessionLocal() as db:
+        if answers:
+            db.execute(insert(MatchAnswer), answers)
+        if scores:
+            db.execute(
+                update(Match),
+                [
+                    {"id": match_id, "player1_score": p1, "player2_score": p2}
+                    for match_id, (p1, p2) in scores.items()
+                ],
+            )
+        db.commit()
+
+
+def settle_matches(results: list[MatchResult]) -> list[tuple[int, int]]:
+    """
+    Finalize a batch of finished matches in one transaction; returns ratings after, per result.
+
+    Elo deltas come from the ratings at match start (what the players were shown) and are applied
+    on top of the current users.rating in order, so a player finishing twice in one batch gets
+    both deltas. Writes are set-based: one UPDATE for users and one for matches.
+    """
+    if not results:
+        return []
+    k = get_settings().pvp_rating_k
+    user_ids = sorted({uid for r in results for uid in (r.player1_id, r.player2_id)})
+    now = datetime.now(timezone.utc)
+
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(User.id, User.rating).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+        ).all()
+        current = {int(row.id): int(row.rating) for row in rows}
+
+        ratings_after: list[tuple[int, int]] = []
+        for r in results:
+            new_a, new_b = update_elo(
+                rating_a=r.player1_rating_before, rating_b=r.player2_rating_before, score_a=r.score_a, k=k
+            )
+            after_a = current.get(r.player1_id, r.player1_rating_before) + (new_a - r.player1_rating_before)
+            after_b = current.get(r.player2_id, r.player2_rating_before) + (new_b - r.player2_rating_before)
+            if r.player1_id in current:
+                current[r.player1_id] = after_a
+            if r.player2_id in current:
+                current[r.player2_id] = after_b
+            ratings_after.append((after_a, after_b))
+
+        if current:
+            db.execute(
+                update(User)
+                .where(User.id.in_(list(current)))
+                .values(rating=case(current, value=User.id))
+                .execution_options(synchronize_session=False)
+            )
+
+        match_ids = [r.match_id for r in results]
+        db.execute(
+            update(Match)
+            .where(Match.id.in_(match_ids), Match.status == "active")
+            .values(
+                status="finished",
+                player1_score=case({r.match_id: r.player1_score for r in results}, value=Match.id),
+                player2_score=case({r.match_id: r.player2_score for r in results}, value=Match.id),
+                player1_rating_after=case(
+                    {r.match_id: after[0] for r, after in zip(results, ratings_after)}, value=Match.id
+                ),
+                player2_rating_after=case(
+                    {r.match_id: after[1] for r, after in zip(results, ratings_after)}, value=Match.id
+                ),
+                ended_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    return ratings_after
+
+
+def cancel_match(*, match_id: str, reason: str) -> None:
+    with SessionLocal() as db:
+        match = db.get(Match, match_id)
+        if match is not None and match.status == "active":
+            match.status = "canceled"
+            match.canceled_reason = reason
+            match.ended_at = datetime.now(timezone.utc)
+            db.commit()
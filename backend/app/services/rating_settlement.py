@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from app.services import pvp_store
+from app.services.pvp_store import MatchResult
+
+
+class RatingSettler:
+    """
+    Collects finished matches for up to `window` seconds (or `max_batch` results) and settles
+    them with pvp_store.settle_matches in a single transaction.
+
+    submit() resolves to the (player1, player2) ratings after the match once its batch commits,
+    so a wave of simultaneous timeouts becomes one transaction instead of one per match.
+    """
+
+    def __init__(
+        self,
+        *,
+        run_db: Callable[..., Awaitable[list[tuple[int, int]]]],
+        window: float,
+        max_batch: int,
+    ) -> None:
+        self._run_db = run_db
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: list[tuple[MatchResult, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    async def submit(self, result: MatchResult) -> tuple[int, int]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((result, future))
+        if len(self._pending) >= self._max_batch:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._window)
+        await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            ratings = await self._run_db(pvp_store.settle_matches, [result for result, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), after in zip(batch, ratings):
+            if not future.done():
+                future.set_result(after)
+
+    async def close(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
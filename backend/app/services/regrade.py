@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.submission import Submission
+from app.models.task import Task
+from app.services.checker import compile_matcher
+from app.services.checker_pool import checker_pool
+
+
+@dataclass
+class RegradeStats:
+    task_id: int
+    total: int = 0
+    scanned: int = 0
+    became_correct: int = 0
+    became_incorrect: int = 0
+    timeouts: int = 0
+    chunks: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def changed(self) -> int:
+        return self.became_correct + self.became_incorrect
+
+
+def stream_submissions(db: Session, task_id: int, *, chunk_size: int) -> Iterator[list]:
+    """A task's submissions in id order, fetched through a server-side cursor in chunks."""
+    stmt = (
+        select(Submission.id, Submission.answer, Submission.is_correct)
+        .where(Submission.task_id == task_id)
+        .order_by(Submission.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in db.execute(stmt).partitions(chunk_size):
+        yield partition
+
+
+def write_verdicts(db: Session, ids: list[int], *, is_correct: bool, chunk_size: int = 10_000) -> None:
+    for start in range(0, len(ids), chunk_size):
+        batch = ids[start : start + chunk_size]
+        db.execute(
+            update(Submission).where(Submission.id.in_(batch)).values(is_correct=is_correct),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def regrade_task(
+    read_db: Session,
+    write_db: Optional[Session],
+    task_id: int,
+    *,
+    chunk_size: int = 50_000,
+    on_progress: Optional[Callable[[RegradeStats], None]] = None,
+) -> Optional[RegradeStats]:
+    """
+    Re-check every submission of a task against its current answer key.
+
+    Only submissions whose verdict changes are written, as two bulk UPDATEs per chunk, and
+    committed chunk by chunk on write_db (None for a dry run). Submissions are streamed on
+    read_db, so the two must be separate sessions. Returns None if the task does not exist.
+    """
+    started = time.perf_counter()
+    key = read_db.execute(select(Task.correct_answer, Task.answer_type).where(Task.id == task_id)).first()
+    if key is None:
+        return None
+
+    matcher = compile_matcher(correct_answer=key.correct_answer, answer_type=key.answer_type)
+    stats = RegradeStats(task_id=task_id)
+    stats.total = read_db.scalar(select(func.count(Submission.id)).where(Submission.task_id == task_id)) or 0
+
+    for rows in stream_submissions(read_db, task_id, chunk_size=chunk_size):
+        verdicts = checker_pool.check_many(matcher, [r.answer for r in rows])
+        now_correct = [r.id for r, ok in zip(rows, verdicts) if ok is True and not r.is_correct]
+        now_incorrect = [r.id for r, ok in zip(rows, verdicts) if ok is False and r.is_correct]
+        # Heavy checks the pool could not finish keep their stored verdict.
+        stats.timeouts += sum(ok is None for ok in verdicts)
+
+        if write_db is not None and (now_correct or now_incorrect):
+            write_verdicts(write_db, now_correct, is_correct=True)
+            write_verdicts(write_db, now_incorrect, is_correct=False)
+            write_db.commit()
+
+        stats.scanned += len(rows)
+        stats.became_correct += len(now_correct)
+        stats.became_incorrect += len(now_incorrect)
+        stats.chunks += 1
+        stats.elapsed_s = time.perf_counter() - started
+        if on_progress is not None:
+            on_progress(stats)
+
+    stats.elapsed_s = time.perf_counter() - started
+    return stats
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.core.config import Settings, get_settings
+from app.services.metrics import registry
+
+cache_hits = registry.counter(
+    "task_cache_hits_total",
+    "Task reads answered from the cache, by layer (local LRU or the shared Redis store).",
+    labelnames=("layer",),
+)
+cache_misses = registry.counter("task_cache_misses_total", "Task reads rendered from the database.")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A rendered JSON body with its strong ETag and extra headers (e.g. X-Next-Cursor)."""
+
+    body: bytes
+    etag: str
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def render(cls, body: bytes, headers: Optional[dict[str, str]] = None) -> CachedResponse:
+        return cls(body=body, etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"', headers=headers or {})
+
+
+class RedisTaskStore:
+    """
+    Shared layer of the task cache: the generation counter and rendered responses in Redis.
+
+    Keys (all under `prefix`): generation (INCR on every admin write) and
+    <generation>:<key> -> JSON {etag, headers, body}, expiring after the TTL, so responses of
+    older generations disappear on their own.
+    """
+
+    def __init__(self, *, url: str, prefix: str = "tasks:") -> None:
+        try:
+            import redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("APP_TASK_CACHE_BACKEND=redis requires the 'redis' package") from exc
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self.errors: tuple[type[Exception], ...] = (redis.RedisError,)
+
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}{name}"
+
+    def generation(self) -> int:
+        return int(self._redis.get(self._key("generation")) or 0)
+
+    def bump(self) -> int:
+        return int(self._redis.incr(self._key("generation")))
+
+    def get(self, generation: int, key: str) -> Optional[CachedResponse]:
+        raw = self._redis.get(self._key(f"{generation}:{key}"))
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedResponse(body=data["body"].encode("utf-8"), etag=data["etag"], headers=data["headers"])
+
+    def put(self, generation: int, key: str, entry: CachedResponse, ttl: float) -> None:
+        raw = json.dumps(
+            {"etag": entry.etag, "headers": entry.headers, "body": entry.body.decode("utf-8")}, ensure_ascii=False
+        )
+        self._redis.set(self._key(f"{generation}:{key}"), raw, px=max(1, int(ttl * 1000)))
+
+
+class TaskCache:
+    """
+    Read-through cache of rendered task responses (GET /api/tasks and GET /api/tasks/{id}).
+
+    Entries are bounded by an LRU size and a TTL and stamped with the generation they were
+    rendered in. Admin writes call invalidate(), which bumps the generation, so every older
+    entry misses; an entry rendered while a write was committing is stamped with the old
+    generation and never served. With a shared store the generation and rendered bodies are
+    shared by all workers; a worker re-reads the shared generation at most every
+    generation_poll seconds, so a write on another worker shows up there within that time.
+    If the shared store fails, the cache carries on with the local layer only.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int,
+        ttl: float,
+        shared: Optional[RedisTaskStore] = None,
+        generation_poll: float = 1.0,
+    ) -> None:
+        self._size = size
+        self._ttl = ttl
+        self._shared = shared
+        self._generation_poll = generation_poll
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[int, float, CachedResponse]] = OrderedDict()
+        self._generation = 0
+        self._generation_checked = float("-inf")
+
+    @property
+    def generation(self) -> int:
+        if self._shared is not None and time.monotonic() - self._generation_checked >= self._generation_poll:
+            try:
+                generation = self._shared.generation()
+            except self._shared.errors:
+                return self._generation
+            with self._lock:
+                self._generation = max(self._generation, generation)
+                self._generation_checked = time.monotonic()
+        return self._generation
+
+    def invalidate(self) -> None:
+        """Called after every admin write to tasks: all cached responses become stale."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        if self._shared is not None:
+            try:
+                generation = self._shared.bump()
+            except self._shared.errors:
+                return
+            with self._lock:
+                self._generation = max(self._generation, generation)
+
+    def _get_local(self, key: str, generation: int) -> Optional[CachedResponse]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            entry_generation, expires_at, entry = cached
+            if entry_generation != generation or expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_local(self, key: str, generation: int, entry: CachedResponse) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (generation, time.monotonic() + self._ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key: str, render: Callable[[], CachedResponse]) -> CachedResponse:
+        if self._size <= 0:
+            return render()
+        generation = self.generation
+        entry = self._get_local(key, generation)
+        if entry is not None:
+            cache_hits.inc(layer="local")
+            return entry
+
+        if self._shared is not None:
+            try:
+                entry = self._shared.get(generation, key)
+            except self._shared.errors:
+                entry = None
+            if entry is not None:
+                cache_hits.inc(layer="shared")
+                self._put_local(key, generation, entry)
+                return entry
+
+        cache_misses.inc()
+        entry = render()
+        self._put_local(key, generation, entry)
+        if self._shared is not None:
+            try:
+                self._shared.put(generation, key, entry, self._ttl)
+            except self._shared.errors:
+                pass
+        return entry
+
+
+def create_task_cache(settings: Settings) -> TaskCache:
+    kind = (settings.task_cache_backend or "memory").strip().lower()
+    shared = None
+    if kind == "redis":
+        shared = RedisTaskStore(url=settings.task_cache_redis_url)
+    elif kind != "memory":
+        raise ValueError(f"Unknown task cache backend: {settings.task_cache_backend}")
+    return TaskCache(size=settings.task_cache_size, ttl=settings.task_cache_ttl_seconds, shared=shared)
+
+
+task_cache = create_task_cache(get_settings())
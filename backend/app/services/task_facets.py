@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.task import Task
+from app.models.task_facet import TaskFacetCount
+
+FacetKey = tuple[str, str, int]
+
+
+def facet_key(task) -> FacetKey:
+    """(subject, topic, difficulty) of a Task row or an item about to become one."""
+    return str(task.subject), str(task.topic), int(task.difficulty)
+
+
+def count_keys(tasks: Iterable) -> Counter[FacetKey]:
+    return Counter(facet_key(task) for task in tasks)
+
+
+def adjust_facet_counts(db: Session, deltas: Mapping[FacetKey, int]) -> None:
+    """
+    Add deltas to task_facet_counts in the caller's transaction, so the counts commit (or roll
+    back) together with the task rows. One upsert per distinct key.
+    """
+    dialect = db.get_bind().dialect.name
+    for (subject, topic, difficulty), delta in deltas.items():
+        if not delta:
+            continue
+        values = {"subject": subject, "topic": topic, "difficulty": difficulty, "task_count": delta}
+        if dialect == "mysql":
+            stmt = mysql_insert(TaskFacetCount).values(**values)
+            db.execute(stmt.on_duplicate_key_update(task_count=TaskFacetCount.task_count + delta))
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(TaskFacetCount).values(**values)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["subject", "topic", "difficulty"],
+                    set_={"task_count": TaskFacetCount.task_count + delta},
+                )
+            )
+        else:
+            updated = db.execute(
+                update(TaskFacetCount)
+                .where(
+                    TaskFacetCount.subject == subject,
+                    TaskFacetCount.topic == topic,
+                    TaskFacetCount.difficulty == difficulty,
+                )
+                .values(task_count=TaskFacetCount.task_count + delta)
+            )
+            if updated.rowcount == 0:
+                db.execute(insert(TaskFacetCount).values(**values))
+
+
+def rebuild_facet_counts(db: Session) -> int:
+    """Recount task_facet_counts from tasks (one GROUP BY); returns the number of keys. Caller commits."""
+    db.execute(delete(TaskFacetCount))
+    grouped = select(Task.subject, Task.topic, Task.difficulty, func.count(Task.id)).group_by(
+        Task.subject, Task.topic, Task.difficulty
+    )
+    db.execute(
+        insert(TaskFacetCount).from_select(["subject", "topic", "difficulty", "task_count"], grouped)
+    )
+    return db.scalar(select(func.count()).select_from(TaskFacetCount)) or 0
+
+
+def ensure_facet_counts(db: Session) -> None:
+    """Fill task_facet_counts on first start (new table, or tasks loaded by SQL)."""
+    if db.execute(select(TaskFacetCount.subject).limit(1)).first() is None:
+        if db.execute(select(Task.id).limit(1)).first() is not None:
+            rebuild_facet_counts(db)
+            db.commit()
+
+
+def _facet(counts: Counter, *, by_count: bool = True) -> list[dict]:
+    items = sorted(counts.items(), key=(lambda kv: (-kv[1], kv[0])) if by_count else (lambda kv: kv[0]))
+    return [{"value": value, "count": count} for value, count in items]
+
+
+def facet_counts(
+    db: Session,
+    *,
+    subject: Optional[str] = None,
+    topic: Optional[str] = None,
+    difficulty_min: Optional[int] = None,
+    difficulty_max: Optional[int] = None,
+) -> dict:
+    """
+    Task counts per subject, topic and difficulty under the given filters, read from the
+    aggregate (one row per key in use) instead of the tasks table. Each facet ignores its own
+    filter, so it lists the values a user can switch to, e.g. every subject with its count
+    for the chosen topic.
+    """
+    rows = db.execute(
+        select(TaskFacetCount.subject, TaskFacetCount.topic, TaskFacetCount.difficulty, TaskFacetCount.task_count)
+        .where(TaskFacetCount.task_count > 0)
+    ).all()
+
+    def in_range(difficulty: int) -> bool:
+        return (difficulty_min is None or difficulty >= difficulty_min) and (
+            difficulty_max is None or difficulty <= difficulty_max
+        )
+
+    total = 0
+    subjects: Counter[str] = Counter()
+    topics: Counter[str] = Counter()
+    difficulties: Counter[int] = Counter()
+    for row_subject, row_topic, row_difficulty, count in rows:
+        subject_ok = not subject or row_subject == subject
+        topic_ok = not topic or row_topic == topic
+        difficulty_ok = in_range(row_difficulty)
+        if topic_ok and difficulty_ok:
+            subjects[row_subject] += count
+        if subject_ok and difficulty_ok:
+            topics[row_topic] += count
+        if subject_ok and topic_ok:
+            difficulties[row_difficulty] += count
+            if difficulty_ok:
+                total += count
+    return {
+        "total": total,
+        "subject": _facet(subjects),
+        "topic": _facet(topics),
+        "difficulty": _facet(difficulties, by_count=False),
+    }
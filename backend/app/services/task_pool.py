@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.task import Task
+from app.services.task_cache import task_cache
+
+
+@dataclass(frozen=True)
+class TaskSnapshot:
+    id: int
+    payload: dict
+    correct_answer: str
+    answer_type: str
+    revision: int = 0
+    content_hash: str = ""
+    updated_at: Optional[datetime] = None
+
+
+def task_payload(task: Task) -> dict:
+    return {
+        "id": task.id,
+        "title": task.title,
+        "statement": task.statement,
+        "subject": task.subject,
+        "topic": task.topic,
+        "difficulty": task.difficulty,
+        "answer_type": task.answer_type,
+        "hints": task.hints,
+    }
+
+
+def payload_hash(payload: dict) -> str:
+    """Stable hash of a task payload; PvP clients use it as a cache key for task bodies."""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_from_task(task: Task, *, revision: int = 0) -> TaskSnapshot:
+    payload = task_payload(task)
+    return TaskSnapshot(
+        id=task.id,
+        payload=payload,
+        correct_answer=str(task.correct_answer),
+        answer_type=str(task.answer_type),
+        revision=revision,
+        content_hash=payload_hash(payload),
+        updated_at=task.updated_at,
+    )
+
+
+class _IdSet:
+    """Set of ids with O(1) add, remove and uniform random choice."""
+
+    def __init__(self) -> None:
+        self._items: list[int] = []
+        self._pos: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, item: int) -> None:
+        if item in self._pos:
+            return
+        self._pos[item] = len(self._items)
+        self._items.append(item)
+
+    def discard(self, item: int) -> None:
+        pos = self._pos.pop(item, None)
+        if pos is None:
+            return
+        last = self._items.pop()
+        if last != item:
+            self._items[pos] = last
+            self._pos[last] = pos
+
+    def choice(self, rng: random.Random) -> int:
+        return self._items[rng.randrange(len(self._items))]
+
+
+class TaskPool:
+    """
+    In-memory pool of task ids used for PvP task selection.
+
+    Ids are indexed by subject and difficulty; task bodies are fetched by primary key and kept
+    in a small LRU payload cache. Admin writes keep the pool in sync via upsert()/discard().
+
+    Writes served by other workers do not reach this pool, so a cached snapshot is rechecked
+    before use once it is older than `max_age` seconds, or after `generation()` (the task cache
+    generation, bumped by admin writes) changed: one query compares the key, answer type and
+    updated_at of the stale snapshots and reloads those that differ.
+    """
+
+    # Rejection sampling is O(1) while the excluded set is small compared to the candidates
+    # (PvP excludes at most pvp_max_rounds ids); past this many misses we fall back to a scan.
+    _SAMPLE_ATTEMPTS = 16
+
+    def __init__(
+        self, *, cache_size: int = 512, max_age: float = 5.0, generation: Optional[Callable[[], int]] = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._all = _IdSet()
+        self._by_subject: dict[str, _IdSet] = {}
+        self._by_difficulty: dict[int, _IdSet] = {}
+        self._meta: dict[int, tuple[str, int]] = {}
+        # Bumped on every admin write to a task; snapshots taken before that are stale.
+        self._revisions: dict[int, int] = {}
+        # task id -> (snapshot, time.monotonic() of its last check, generation at that check).
+        self._cache: OrderedDict[int, tuple[TaskSnapshot, float, int]] = OrderedDict()
+        self._cache_size = cache_size
+        self._max_age = max_age
+        self._generation = generation or (lambda: 0)
+        self._rng = random.Random()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def load(self, db: Session) -> None:
+        rows = db.execute(select(Task.id, Task.subject, Task.difficulty)).all()
+        with self._lock:
+            self._all = _IdSet()
+            self._by_subject = {}
+            self._by_difficulty = {}
+            self._meta = {}
+            self._cache.clear()
+            for row in rows:
+                self._index(int(row.id), str(row.subject), int(row.difficulty))
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self.load(db)
+
+    def _index(self, task_id: int, subject: str, difficulty: int) -> None:
+        self._meta[task_id] = (subject, difficulty)
+        self._all.add(task_id)
+        self._by_subject.setdefault(subject, _IdSet()).add(task_id)
+        self._by_difficulty.setdefault(difficulty, _IdSet()).add(task_id)
+
+    def _unindex(self, task_id: int) -> None:
+        meta = self._meta.pop(task_id, None)
+        if meta is None:
+            return
+        subject, difficulty = meta
+        self._all.discard(task_id)
+        self._by_subject[subject].discard(task_id)
+        self._by_difficulty[difficulty].discard(task_id)
+
+    def upsert(self, task: Task) -> None:
+        with self._lock:
+            self._revisions[task.id] = self._revisions.get(task.id, 0) + 1
+            self._cache.pop(task.id, None)
+            if not self._loaded:
+                return
+            self._unindex(task.id)
+            self._index(int(task.id), str(task.subject), int(task.difficulty))
+
+    def discard(self, task_id: int) -> None:
+        with self._lock:
+            self._revisions[task_id] = self._revisions.get(task_id, 0) + 1
+            self._cache.pop(task_id, None)
+            self._unindex(task_id)
+
+    def sample(
+        self,
+        *,
+        exclude: Optional[set[int]] = None,
+        subject: Optional[str] = None,
+        difficulty: Optional[int] = None,
+    ) -> Optional[int]:
+        exclude = exclude or set()
+        with self._lock:
+            candidates = self._all
+            if subject is not None:
+                candidates = self._by_subject.get(subject) or _IdSet()
+            if difficulty is not None:
+                by_difficulty = self._by_difficulty.get(difficulty) or _IdSet()
+                if subject is None or len(by_difficulty) < len(candidates):
+                    candidates = by_difficulty
+
+            if len(candidates) == 0:
+                return None
+
+            for _ in range(self._SAMPLE_ATTEMPTS):
+                task_id = candidates.choice(self._rng)
+                if task_id not in exclude and self._matches(task_id, subject, difficulty):
+                    return task_id
+
+            remaining = [
+                task_id
+                for task_id in candidates
+                if task_id not in exclude and self._matches(task_id, subject, difficulty)
+            ]
+            if not remaining:
+                return None
+            return self._rng.choice(remaining)
+
+    def _matches(self, task_id: int, subject: Optional[str], difficulty: Optional[int]) -> bool:
+        task_subject, task_difficulty = self._meta[task_id]
+        if subject is not None and task_subject != subject:
+            return False
+        if difficulty is not None and task_difficulty != difficulty:
+            return False
+        return True
+
+    def is_fresh(self, snapshot: TaskSnapshot) -> bool:
+        """False if the task was edited or removed after the snapshot was taken."""
+        with self._lock:
+            return snapshot.id in self._meta and self._revisions.get(snapshot.id, 0) == snapshot.revision
+
+    def get(self, db: Session, task_id: int) -> Optional[TaskSnapshot]:
+        return self.get_many(db, [task_id]).get(task_id)
+
+    def get_many(self, db: Session, task_ids: list[int]) -> dict[int, TaskSnapshot]:
+        """
+        Snapshots by id, missing ids left out: cached ones as they are while recently checked,
+        stale ones rechecked in one query, the rest (and changed ones) loaded in another.
+        """
+        found: dict[int, TaskSnapshot] = {}
+        stale: dict[int, TaskSnapshot] = {}
+        revisions: dict[int, int] = {}
+        generation = self._generation()
+        now = time.monotonic()
+        with self._lock:
+            for task_id in dict.fromkeys(task_ids):
+                entry = self._cache.get(task_id)
+                if entry is None:
+                    revisions[task_id] = self._revisions.get(task_id, 0)
+                    continue
+                self._cache.move_to_end(task_id)
+                snapshot, checked_at, checked_generation = entry
+                if checked_generation == generation and now - checked_at < self._max_age:
+                    found[task_id] = snapshot
+                else:
+                    stale[task_id] = snapshot
+                    revisions[task_id] = snapshot.revision
+
+        if stale:
+            rows = db.execute(
+                select(Task.id, Task.correct_answer, Task.answer_type, Task.updated_at).where(Task.id.in_(list(stale)))
+            )
+            for row in rows:
+                snapshot = stale[row.id]
+                if (str(row.correct_answer), str(row.answer_type), row.updated_at) == (
+                    snapshot.correct_answer,
+                    snapshot.answer_type,
+                    snapshot.updated_at,
+                ):
+                    found[row.id] = snapshot
+                    del revisions[row.id]
+                    with self._lock:
+                        if row.id in self._cache:
+                            self._cache[row.id] = (snapshot, now, generation)
+
+        missing = [task_id for task_id in revisions if task_id not in found]
+        if missing:
+            for task in db.execute(select(Task).where(Task.id.in_(missing))).scalars():
+                found[task.id] = snapshot_from_task(task, revision=revisions[task.id])
+        for task_id in revisions.keys() - found.keys():
+            self.discard(task_id)
+        with self._lock:
+            for task_id, revision in revisions.items():
+                snapshot = found.get(task_id)
+                if snapshot is None:
+                    continue
+                if self._revisions.get(task_id, 0) == revision:
+                    self._cache[task_id] = (snapshot, now, generation)
+                    self._cache.move_to_end(task_id)
+                else:
+                    self._cache.pop(task_id, None)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+
+task_pool = TaskPool(max_age=get_settings().task_pool_recheck_seconds, generation=lambda: task_cache.generation)
@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.task import Task
+
+# --- Russian Snowball stemmer --------------------------------------------------------------
+
+_VOWELS = frozenset("аеиоуыэюя")
+
+
+def _by_length(*suffixes: str) -> tuple[str, ...]:
+    return tuple(sorted(suffixes, key=len, reverse=True))
+
+
+_PERFECTIVE_GERUND_1 = _by_length("в", "вши", "вшись")
+_PERFECTIVE_GERUND_2 = _by_length("ив", "ивши", "ившись", "ыв", "ывши", "ывшись")
+_ADJECTIVE = _by_length(
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)  # fmt: skip
+_PARTICIPLE_1 = _by_length("ем", "нн", "вш", "ющ", "щ")
+_PARTICIPLE_2 = _by_length("ивш", "ывш", "ующ")
+_REFLEXIVE = _by_length("ся", "сь")
+_VERB_1 = _by_length("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно")
+_VERB_2 = _by_length(
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен",
+    "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю",
+)  # fmt: skip
+_NOUN = _by_length(
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й",
+    "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+)  # fmt: skip
+_DERIVATIONAL = _by_length("ост", "ость")
+_SUPERLATIVE = _by_length("ейш", "ейше")
+
+
+def _region_after_vc(word: str, start: int) -> int:
+    # First position after a non-vowel that follows a vowel, searching from `start`.
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word: str, region: int, suffixes: tuple[str, ...], preceded_by: str = "") -> Optional[str]:
+    # Longest suffix within word[region:]; with `preceded_by`, only after one of those letters (also in region).
+    for suffix in suffixes:
+        start = len(word) - len(suffix)
+        if start < region or not word.endswith(suffix):
+            continue
+        if preceded_by:
+            if start - 1 < region or word[start - 1] not in preceded_by:
+                continue
+        return word[:start]
+    return None
+
+
+def _strip_grouped(word: str, region: int, group1: tuple[str, ...], group2: tuple[str, ...]) -> Optional[str]:
+    # Snowball picks the longest suffix over both groups; group 1 endings need a preceding а or я.
+    one = _strip(word, region, group1, preceded_by="ая")
+    two = _strip(word, region, group2)
+    if one is None:
+        return two
+    if two is None:
+        return one
+    return min(one, two, key=len)
+
+
+@functools.lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    """Snowball stemmer for Russian; other words are returned as is."""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    if rv >= len(word):
+        return word
+    r2 = _region_after_vc(word, _region_after_vc(word, 0))
+
+    # Step 1
+    stripped = _strip_grouped(word, rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stripped = _strip(word, rv, _ADJECTIVE)
+        if stripped is not None:
+            word = _strip_grouped(stripped, rv, _PARTICIPLE_1, _PARTICIPLE_2) or stripped
+        else:
+            stripped = _strip_grouped(word, rv, _VERB_1, _VERB_2)
+            if stripped is None:
+                stripped = _strip(word, rv, _NOUN)
+            if stripped is not None:
+                word = stripped
+
+    # Step 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Step 3
+    word = _strip(word, r2, _DERIVATIONAL) or word
+
+    # Step 4
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        return word[:-1]
+    stripped = _strip(word, rv, _SUPERLATIVE)
+    if stripped is not None:
+        word = stripped
+        return word[:-1] if word.endswith("нн") and len(word) - 2 >= rv else word
+    if word.endswith("ь") and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+_WORD = re.compile(r"\w+")
+
+
+def words(text: str) -> list[str]:
+    """Lowercased words of a text (ё folded into е)."""
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+def terms(text: str) -> list[str]:
+    return [stem(word) for word in words(text)]
+
+
+# --- Inverted index -----------------------------------------------------------------------
+
+
+_Filter = Callable[[list[tuple[int, int]]], list[tuple[int, int]]]
+
+
+class _Postings:
+    """Task ids containing a term (ascending) and the term's weighted frequency in each."""
+
+    __slots__ = ("ids", "tfs")
+
+    def __init__(self) -> None:
+        self.ids = array("i")
+        self.tfs = array("H")
+
+    def add(self, task_id: int, tf: int) -> None:
+        if not self.ids or self.ids[-1] < task_id:
+            self.ids.append(task_id)
+            self.tfs.append(tf)
+            return
+        pos = bisect.bisect_left(self.ids, task_id)
+        self.ids.insert(pos, task_id)
+        self.tfs.insert(pos, tf)
+
+    def remove(self, task_id: int) -> None:
+        pos = bisect.bisect_left(self.ids, task_id)
+        if pos < len(self.ids) and self.ids[pos] == task_id:
+            del self.ids[pos]
+            del self.tfs[pos]
+
+    def tf(self, task_id: int) -> int:
+        pos = bisect.bisect_left(self.ids, task_id)
+        if pos < len(self.ids) and self.ids[pos] == task_id:
+            return self.tfs[pos]
+        return 0
+
+    def pairs(self, keep: Optional[_Filter]) -> list[tuple[int, int]]:
+        """(task id, tf) of every task in the list that `keep` lets through."""
+        pairs = list(zip(self.ids, self.tfs))
+        return pairs if keep is None else keep(pairs)
+
+    def intersect(self, task_ids: list[int]) -> list[tuple[int, int]]:
+        """(task id, tf) for those of the ascending `task_ids` that are in the list."""
+        ids, tfs = self.ids, self.tfs
+        if not task_ids:
+            return []
+        start = bisect.bisect_left(ids, task_ids[0])
+        end = bisect.bisect_right(ids, task_ids[-1], start)
+        # Building the dict costs ~1/10 of a binary search per entry.
+        if end - start <= 10 * len(task_ids):
+            tf_of = dict(zip(ids[start:end], tfs[start:end]))
+            return [(task_id, tf_of[task_id]) for task_id in task_ids if task_id in tf_of]
+
+        # Much longer than the candidates: skip ahead by binary search, each from where the last one stopped.
+        found: list[tuple[int, int]] = []
+        pos = start
+        for task_id in task_ids:
+            pos = bisect.bisect_left(ids, task_id, pos, end)
+            if pos == end:
+                break
+            if ids[pos] == task_id:
+                found.append((task_id, tfs[pos]))
+        return found
+
+
+class TaskSearchIndex:
+    """
+    In-process inverted index over task titles and statements, ranked with BM25.
+
+    Words are lowercased and stemmed (Russian Snowball), so "треугольника" finds "треугольники";
+    a query matches tasks containing every word, and its last word also matches as a prefix while
+    the user is still typing it. Title words weigh TITLE_WEIGHT times more than statement words.
+    Admin writes keep the index in sync via upsert()/discard(), like TaskPool. Writes served by
+    other workers (and scripts that write to the database) are picked up by sync(), which re-reads
+    the tasks updated since the last load or catch-up.
+
+    Every task containing the query's rarest word is a candidate; the posting lists of the other
+    words are intersected with the candidates rarest first, so the work is bounded by the rarest
+    word's document frequency rather than the index size, and only the ranked output is capped.
+    """
+
+    TITLE_WEIGHT = 3
+    # A catch-up also re-reads tasks updated this long before the newest one already seen: a
+    # transaction that commits late still carries its own, earlier updated_at.
+    SYNC_OVERLAP = timedelta(minutes=1)
+    MAX_PREFIX_TERMS = 16
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._generation: Optional[int] = None
+        self._synced_at = float("-inf")
+        self._watermark: Optional[datetime] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._term_ids: dict[str, int] = {}
+        self._postings: list[_Postings] = []
+        self._vocabulary: list[str] = []  # sorted, for prefix lookups
+        self._doc_terms: dict[int, array] = {}
+        # By task id; subject/topic as label ids, length 0 = not indexed.
+        self._lengths = array("I")
+        self._subjects = array("I")
+        self._topics = array("I")
+        self._difficulties = array("H")
+        self._label_ids: dict[str, int] = {}
+        self._total_length = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def load(self, db: Session, *, chunk_size: int = 10_000) -> None:
+        stmt = (
+            select(Task.id, Task.title, Task.statement, Task.subject, Task.topic, Task.difficulty)
+            .order_by(Task.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        with self._lock:
+            self._reset()
+            # Read before the rows, so writes that race with the load are caught up with later.
+            self._watermark = db.scalar(select(func.max(Task.updated_at)))
+            self._synced_at = time.monotonic()
+            for row in db.execute(stmt):
+                self._index(row.id, row.title, row.statement, row.subject, row.topic, row.difficulty)
+            self._vocabulary = sorted(self._term_ids)
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self.load(db)
+
+    def sync(self, db: Session, *, generation: int, max_age: float) -> None:
+        """
+        Load the index, or catch up with tasks written elsewhere: after the task cache generation
+        changed (an admin write on any worker, with a shared cache) or max_age seconds after the
+        last catch-up. One thread catches up at a time; the others keep searching meanwhile.
+        """
+        if not self._loaded:
+            with self._sync_lock:
+                if not self._loaded:
+                    self._generation = generation
+                    self.load(db)
+            return
+        if generation == self._generation and time.monotonic() - self._synced_at < max_age:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._generation = generation
+            self._synced_at = time.monotonic()
+            self._catch_up(db)
+        finally:
+            self._sync_lock.release()
+
+    def _catch_up(self, db: Session) -> None:
+        stmt = select(Task.id, Task.title, Task.statement, Task.subject, Task.topic, Task.difficulty, Task.updated_at)
+        if self._watermark is not None:
+            stmt = stmt.where(Task.updated_at >= self._watermark - self.SYNC_OVERLAP)
+        for row in db.execute(stmt.order_by(Task.id)):
+            self.upsert(row)
+            if self._watermark is None or row.updated_at > self._watermark:
+                self._watermark = row.updated_at
+
+    def upsert(self, task: Task) -> None:
+        with self._lock:
+            if not self._loaded:
+                return
+            self._unindex(task.id)
+            self._index(task.id, task.title, task.statement, task.subject, task.topic, task.difficulty)
+
+    def discard(self, task_id: int) -> None:
+        with self._lock:
+            self._unindex(task_id)
+
+    def _label(self, value: str) -> int:
+        return self._label_ids.setdefault(value, len(self._label_ids) + 1)
+
+    def _index(self, task_id: int, title: str, statement: str, subject: str, topic: str, difficulty: int) -> None:
+        counts: dict[str, int] = {}
+        for term in terms(title):
+            counts[term] = counts.get(term, 0) + self.TITLE_WEIGHT
+        for term in terms(statement):
+            counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return
+
+        term_ids = array("I")
+        for term, tf in counts.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings)
+                self._postings.append(_Postings())
+                if self._loaded:
+                    bisect.insort(self._vocabulary, term)
+            self._postings[term_id].add(task_id, min(tf, 0xFFFF))
+            term_ids.append(term_id)
+        self._doc_terms[task_id] = term_ids
+
+        if task_id >= len(self._lengths):
+            grow = task_id + 1 - len(self._lengths)
+            for column in (self._lengths, self._subjects, self._topics, self._difficulties):
+                column.extend(array(column.typecode, [0]) * grow)
+        length = max(1, sum(counts.values()))
+        self._lengths[task_id] = length
+        self._subjects[task_id] = self._label(subject)
+        self._topics[task_id] = self._label(topic)
+        self._difficulties[task_id] = difficulty
+        self._total_length += length
+
+    def _unindex(self, task_id: int) -> None:
+        term_ids = self._doc_terms.pop(task_id, None)
+        if term_ids is None:
+            return
+        for term_id in term_ids:
+            self._postings[term_id].remove(task_id)
+        self._total_length -= self._lengths[task_id]
+        self._lengths[task_id] = 0
+
+    def _query_groups(self, query: str) -> list[list[_Postings]]:
+        # One group per query word: its stem, plus (for the word being typed) vocabulary prefixes.
+        query_words = list(dict.fromkeys(words(query)))
+        typing = bool(query) and query[-1].isalnum()
+        groups = []
+        for i, word in enumerate(query_words):
+            candidates = {stem(word)}
+            if typing and i == len(query_words) - 1 and len(word) >= 2:
+                pos = bisect.bisect_left(self._vocabulary, word)
+                for term in self._vocabulary[pos : pos + self.MAX_PREFIX_TERMS]:
+                    if not term.startswith(word):
+                        break
+                    candidates.add(term)
+            group = [self._postings[self._term_ids[term]] for term in candidates if term in self._term_ids]
+            if not group:
+                return []
+            groups.append(group)
+        return groups
+
+    def search(
+        self,
+        query: str,
+        *,
+        subject: Optional[str] = None,
+        topic: Optional[str] = None,
+        difficulty_min: Optional[int] = None,
+        difficulty_max: Optional[int] = None,
+        limit: int = 1000,
+    ) -> list[int]:
+        """Ids of matching tasks, best first (ties: newest first)."""
+        with self._lock:
+            groups = self._query_groups(query)
+            docs = len(self._doc_terms)
+            if not groups or not docs:
+                return []
+            keep = self._filter(subject, topic, difficulty_min, difficulty_max)
+            lengths = self._lengths
+            k1, b = self.K1, self.B
+            # BM25 length normalization k1 * (1 - b + b * length / average length), split in two terms.
+            norm_base, norm_per_length = k1 * (1.0 - b), k1 * b * docs / self._total_length
+
+            def weighted(postings: _Postings, pairs: list[tuple[int, int]]) -> dict[int, float]:
+                df = len(postings.ids)
+                idf = (k1 + 1.0) * math.log(1.0 + (docs - df + 0.5) / (df + 0.5))
+                return {
+                    task_id: idf * tf / (tf + norm_base + norm_per_length * lengths[task_id]) for task_id, tf in pairs
+                }
+
+            def merge(into: dict[int, float], base: dict[int, float], partial: dict[int, float]) -> None:
+                for task_id, score in partial.items():
+                    into[task_id] = into.get(task_id, base.get(task_id, 0.0)) + score
+
+            # Candidates: every task with the rarest word that passes the filters.
+            groups.sort(key=lambda group: sum(len(p.ids) for p in group))
+            scores: dict[int, float] = {}
+            for postings in groups[0]:
+                partial = weighted(postings, postings.pairs(keep))
+                if scores:
+                    merge(scores, {}, partial)
+                else:
+                    scores = partial
+
+            # Every other word must be there too: the candidates shrink with each group.
+            for group in groups[1:]:
+                candidates = sorted(scores)
+                matched: dict[int, float] = {}
+                for postings in group:
+                    merge(matched, scores, weighted(postings, postings.intersect(candidates)))
+                scores = matched
+
+        return [task_id for _, task_id in heapq.nlargest(limit, zip(scores.values(), scores.keys()))]
+
+    def _filter(
+        self,
+        subject: Optional[str],
+        topic: Optional[str],
+        difficulty_min: Optional[int],
+        difficulty_max: Optional[int],
+    ) -> Optional[_Filter]:
+        # One comprehension per filter over a chunk of (task id, tf) pairs: much cheaper than a call per task.
+        if subject is None and topic is None and difficulty_min is None and difficulty_max is None:
+            return None
+        subject_id = self._label_ids.get(subject, -1) if subject is not None else None
+        topic_id = self._label_ids.get(topic, -1) if topic is not None else None
+        low = difficulty_min if difficulty_min is not None else 0
+        high = difficulty_max if difficulty_max is not None else 0xFFFF
+        subjects, topics, difficulties = self._subjects, self._topics, self._difficulties
+
+        def keep(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+            if subject_id is not None:
+                pairs = [pair for pair in pairs if subjects[pair[0]] == subject_id]
+            if topic_id is not None:
+                pairs = [pair for pair in pairs if topics[pair[0]] == topic_id]
+            if difficulty_min is not None or difficulty_max is not None:
+                pairs = [pair for pair in pairs if low <= difficulties[pair[0]] <= high]
+            return pairs
+
+        return keep
+
+
+task_search = TaskSearchIndex()
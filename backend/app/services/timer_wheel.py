@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+TimerCallback = Callable[[], Awaitable[None]]
+ErrorHandler = Callable[[Hashable, BaseException], None]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Timer:
+    key: Hashable
+    slot: int
+    rounds: int
+    callback: TimerCallback
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: one background loop serves every deadline.
+
+    Timers are keyed (e.g. ("match", match_id), ("round", match_id), ("idle", user_id));
+    arming an existing key re-arms it. arm() and cancel() are O(1): a timer lives in the slot
+    it expires in, with the number of full wheel turns left. Resolution is `tick` seconds.
+    Callbacks run as separate tasks so a slow one never delays the wheel; the wheel keeps a
+    reference to each until it is done, and a callback that raises is logged and reported to
+    `on_error` with its key.
+    """
+
+    def __init__(self, *, tick: float = 0.1, slots: int = 512, on_error: Optional[ErrorHandler] = None) -> None:
+        self._tick = tick
+        self._slots: list[dict[Hashable, _Timer]] = [{} for _ in range(slots)]
+        self._timers: dict[Hashable, _Timer] = {}
+        self._cursor = 0
+        self._runner: Optional[asyncio.Task] = None
+        self._callbacks: set[asyncio.Task] = set()
+        self._on_error = on_error
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+    def arm(self, key: Hashable, delay: float, callback: TimerCallback) -> None:
+        self.cancel(key)
+        ticks = max(1, int(round(delay / self._tick)))
+        slot = (self._cursor + ticks) % len(self._slots)
+        timer = _Timer(key=key, slot=slot, rounds=(ticks - 1) // len(self._slots), callback=callback)
+        self._slots[slot][key] = timer
+        self._timers[key] = timer
+        self.start()
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        self._slots[timer.slot].pop(key, None)
+        return True
+
+    def _advance(self) -> None:
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        bucket = self._slots[self._cursor]
+        if not bucket:
+            return
+        due: list[_Timer] = []
+        for timer in list(bucket.values()):
+            if timer.rounds > 0:
+                timer.rounds -= 1
+                continue
+            del bucket[timer.key]
+            del self._timers[timer.key]
+            due.append(timer)
+        for timer in due:
+            task = asyncio.create_task(timer.callback())
+            self._callbacks.add(task)
+            task.add_done_callback(functools.partial(self._callback_done, timer.key))
+
+    def _callback_done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._callbacks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is None:
+            return
+        logger.error("timer %r callback failed", key, exc_info=exc)
+        if self._on_error is not None:
+            self._on_error(key, exc)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self._tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            # Catch up on ticks missed while the loop was busy.
+            while next_tick <= loop.time():
+                self._advance()
+                next_tick += self._tick
@@ -260,6 +260,7 @@ function bindPvp() {
     ws = new WebSocket(`${location.origin.replace("http", "ws")}/api/pvp/ws?token=${encodeURIComponent(token)}`);
     ws.onmessage = (ev) => {
       const msg = JSON.parse(ev.data);
+      if (msg.type === "ping") { ws.send(JSON.stringify({ type: "pong" })); return; }
       if (msg.type === "connected") setStatus("Подключено");
       if (msg.type === "queue_joined") setStatus("В очереди");
       if (msg.type === "queue_left") setStatus("Не в очереди");
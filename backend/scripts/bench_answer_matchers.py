@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from app.services.checker import MatcherCache, answer_types, check_answer, compile_matcher
+from app.services.checker_pool import CheckerPool
+
+
+def _cases(answer_type: str, n: int, rng: random.Random) -> list[tuple[int, str, str]]:
+    """(task id, correct answer, submitted answer); about half of the answers are correct."""
+    cases = []
+    for task_id in range(1, n + 1):
+        if answer_type == "int":
+            key = str(rng.randint(-10**6, 10**6))
+            answer = f" {key} " if rng.random() < 0.5 else str(rng.randint(-10**6, 10**6))
+        elif answer_type == "float":
+            value = rng.uniform(-1000.0, 1000.0)
+            key = f"{value:.4f}".replace(".", ",")
+            answer = f"{value:.4f}" if rng.random() < 0.5 else f"{value + 0.5:.4f}"
+        elif answer_type == "fraction":
+            num, den = rng.randint(1, 999), rng.randint(2, 999)
+            key = f"{num}/{den}"
+            answer = f"{num * 3} / {den * 3}" if rng.random() < 0.5 else f"{num + 1}/{den}"
+        elif answer_type == "set":
+            items = rng.sample(range(100), 6)
+            key = "; ".join(map(str, items))
+            shuffled = rng.sample(items, len(items))
+            answer = ", ".join(map(str, shuffled if rng.random() < 0.5 else shuffled[1:]))
+        elif answer_type == "numbers":
+            values = [rng.uniform(-100.0, 100.0) for _ in range(4)]
+            key = "; ".join(f"{v:.3f}".replace(".", ",") for v in values)
+            answer = ", ".join(f"{v:.3f}" for v in (values if rng.random() < 0.5 else values[::-1]))
+        elif answer_type == "expr":
+            a, b = rng.randint(1, 9), rng.randint(1, 9)
+            key = f"(x + {a})^2 * (y - {b}) / 2"
+            correct = f"(x^2 + {2 * a}x + {a * a})(y - {b}) / 2"
+            answer = correct if rng.random() < 0.5 else f"(x^2 + {2 * a}x)(y - {b}) / 2"
+        else:
+            key = "  Теорема   Пифагора о прямоугольном треугольнике "
+            answer = "теорема пифагора о прямоугольном   треугольнике" if rng.random() < 0.5 else "теорема Фалеса"
+        cases.append((task_id, key, answer))
+    return cases
+
+
+def _bench_pool(answer_type: str, cases: list[tuple[int, str, str]], workers: int, checks: int) -> None:
+    pool = CheckerPool(workers=workers, timeout=2.0, wait=30.0, cache_size=checks)
+    matcher = compile_matcher(correct_answer=cases[0][1], answer_type=answer_type)
+    # Distinct answers, so nothing is served from the verdict cache; the first batch warms the pool.
+    answers = [f"{cases[0][2]} + {i} - {i}" for i in range(checks)]
+    pool.check_many(matcher, answers[:workers])
+
+    probes = answers[workers : workers + 200]
+    bulk = answers[workers + 200 :]
+
+    async def latencies() -> tuple[list[float], float]:
+        result = []
+        for answer in probes:
+            started = time.perf_counter()
+            await pool.check(matcher, answer)
+            result.append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        for answer in probes:
+            await pool.check(matcher, answer)
+        return result, (time.perf_counter() - started) / max(len(probes), 1) * 1e6
+
+    single, hit_us = asyncio.run(latencies())
+    parts = [f"pool of {workers}:"]
+    if single:
+        parts.append(f"single check p50 {statistics.median(single):.2f}ms (event loop free meanwhile),")
+    if bulk:
+        started = time.perf_counter()
+        pool.check_many(matcher, bulk)
+        parts.append(f"bulk {len(bulk) / (time.perf_counter() - started):,.0f} checks/s,")
+    if single:
+        parts.append(f"cached verdict {hit_us:.0f}us")
+    pool.shutdown()
+    print(f"{'':>8}  " + " ".join(parts).rstrip(","))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="check_answer vs cached compiled matchers, per answer type")
+    parser.add_argument("--tasks", type=int, default=200, help="distinct answer keys, cycled through")
+    parser.add_argument("--checks", type=int, default=500_000)
+    parser.add_argument("--heavy-checks", type=int, default=5_000, help="checks for heavy types (expr)")
+    parser.add_argument("--workers", type=int, default=2, help="process pool size for heavy types")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    updated_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for answer_type in answer_types():
+        cases = _cases(answer_type, args.tasks, random.Random(args.seed))
+        heavy = compile_matcher(correct_answer=cases[0][1], answer_type=answer_type).heavy
+        checks = args.heavy_checks if heavy else args.checks
+        stream = [cases[i % len(cases)] for i in range(checks)]
+
+        started = time.perf_counter()
+        expected = [check_answer(answer=a, correct_answer=key, answer_type=answer_type) for _, key, a in stream]
+        uncached_s = time.perf_counter() - started
+
+        cache = MatcherCache(max_size=args.tasks)
+        started = time.perf_counter()
+        got = [
+            cache.get(task_id, updated_at=updated_at, correct_answer=key, answer_type=answer_type).matches(a)
+            for task_id, key, a in stream
+        ]
+        cached_s = time.perf_counter() - started
+
+        # PvP keeps the round's matcher on the match state, so only matches() is on the hot path.
+        matchers = [cache.get(t, updated_at=updated_at, correct_answer=k, answer_type=answer_type) for t, k, _ in cases]
+        started = time.perf_counter()
+        held = [matchers[i % len(cases)].matches(stream[i][2]) for i in range(checks)]
+        held_s = time.perf_counter() - started
+
+        mismatches = sum(a != b for a, b in zip(expected, got)) + sum(a != b for a, b in zip(expected, held))
+        ns = 1e9 / checks
+        print(
+            f"{answer_type:>8}: check_answer {uncached_s * ns:6.0f}ns, cache lookup + match "
+            f"{cached_s * ns:6.0f}ns, held matcher {held_s * ns:6.0f}ns "
+            f"({uncached_s / held_s:.1f}x), mismatches={mismatches}"
+        )
+        if heavy:
+            _bench_pool(answer_type, cases, args.workers, args.heavy_checks)
+
+
+if __name__ == "__main__":
+    main()
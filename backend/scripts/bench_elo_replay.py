@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.elo import update_elo
+from app.services.elo_replay import replay_chunk
+
+
+def _synthetic_history(matches: int, users: int, seed: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    player1 = rng.integers(1, users + 1, size=matches)
+    offset = rng.integers(1, users, size=matches)
+    player2 = (player1 - 1 + offset) % users + 1
+    score_a = rng.choice(np.array([0.0, 0.5, 1.0]), size=matches, p=[0.45, 0.1, 0.45])
+    return player1, player2, score_a
+
+
+def _scalar(player1, player2, score_a, *, users: int, initial: int, k: int) -> list[int]:
+    ratings = [initial] * (users + 1)
+    for a, b, s in zip(player1.tolist(), player2.tolist(), score_a.tolist()):
+        ratings[a], ratings[b] = update_elo(rating_a=ratings[a], rating_b=ratings[b], score_a=s, k=k)
+    return ratings
+
+
+def _vectorized(player1, player2, score_a, *, users: int, initial: int, k: int, chunk_size: int) -> np.ndarray:
+    ratings = np.full(users + 1, float(initial))
+    for start in range(0, len(player1), chunk_size):
+        end = start + chunk_size
+        replay_chunk(ratings, player1[start:end], player2[start:end], score_a[start:end], k=k)
+    return ratings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scalar update_elo loop vs vectorized replay")
+    parser.add_argument("--matches", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=32)
+    parser.add_argument("--initial", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    player1, player2, score_a = _synthetic_history(args.matches, args.users, args.seed)
+    common = {"users": args.users, "initial": args.initial, "k": args.k}
+
+    started = time.perf_counter()
+    scalar = _scalar(player1, player2, score_a, **common)
+    scalar_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectorized = _vectorized(player1, player2, score_a, chunk_size=args.chunk_size, **common)
+    vectorized_s = time.perf_counter() - started
+
+    mismatches = int(np.count_nonzero(np.asarray(scalar, dtype=np.float64) != vectorized))
+    print(f"{'scalar update_elo':>20}: {scalar_s:6.2f}s ({args.matches / scalar_s:,.0f} matches/s)")
+    print(f"{'vectorized':>20}: {vectorized_s:6.2f}s ({args.matches / vectorized_s:,.0f} matches/s)")
+    print(f"{'users mismatched':>20}: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
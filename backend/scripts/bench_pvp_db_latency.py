@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+class _BenchSocket:
+    def __init__(self) -> None:
+        self.answered_at: float | None = None
+        self.answered = asyncio.Event()
+        self.frames: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        payload = json.loads(text)
+        self.frames.append(payload)
+        if payload.get("type") == "answer_result" and self.answered_at is None:
+            self.answered_at = time.perf_counter()
+            self.answered.set()
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+async def _answer_round(manager, sockets, matches, *, slow_match_id: str | None) -> list[float]:
+    async def one(match_id: str, user_id: int) -> float | None:
+        state = manager._matches.get(match_id)
+        if state is None:
+            return None
+        ws = sockets[user_id]
+        ws.answered_at = None
+        ws.answered.clear()
+        started = time.perf_counter()
+        await manager.handle_message(
+            user_id=user_id,
+            message={"type": "answer_submit", "match_id": match_id, "answer": "-", "task_id": state.task_id},
+        )
+        if match_id == slow_match_id:
+            return None
+        # Frames are written by the connection's writer task, so wait for delivery.
+        try:
+            await asyncio.wait_for(ws.answered.wait(), timeout=10.0)
+        except asyncio.TimeoutError:
+            return None
+        return (ws.answered_at - started) * 1000.0
+
+    results = await asyncio.gather(*(one(match_id, user_id) for match_id, user_id in matches))
+    return [r for r in results if r is not None]
+
+
+async def _run(args) -> None:
+    from sqlalchemy import event
+
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task, User
+    from app.services.pvp_manager import PvpManager
+
+    Base.metadata.create_all(bind=engine)
+    players = args.matches * 2
+    with SessionLocal() as db:
+        for i in range(1, players + 1):
+            db.add(User(id=i, email=f"bench{i}@example.com", username=f"bench{i}", password_hash="-", rating=1000))
+        for i in range(args.matches + 20):
+            db.add(
+                Task(
+                    title=f"bench {i}",
+                    statement="-",
+                    subject="bench",
+                    topic="bench",
+                    difficulty=1,
+                    answer_type="int",
+                    correct_answer=str(i),
+                )
+            )
+        db.commit()
+
+    manager = PvpManager()
+    sockets = {i: _BenchSocket() for i in range(1, players + 1)}
+    for user_id, ws in sockets.items():
+        await manager.connect(user_id=user_id, websocket=ws)
+    await manager._start_matches([(i, i + 1) for i in range(1, players + 1, 2)])
+
+    matches = [(state.match_id, state.player1_id) for state in manager._matches.values()]
+    slow_match_id = matches[0][0]
+    slowdown = {"seconds": 0.0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _slow_down(conn, cursor, statement, parameters, context, executemany):
+        # Delay only the slow match's answer insert (before sqlite takes its write lock).
+        if slowdown["seconds"] and statement.lstrip().upper().startswith("INSERT INTO MATCH_ANSWERS"):
+            if slow_match_id in (parameters or ()):
+                time.sleep(slowdown["seconds"])
+
+    baseline = await _answer_round(manager, sockets, matches, slow_match_id=None)
+    slowdown["seconds"] = args.delay_ms / 1000.0
+    delayed = await _answer_round(manager, sockets, matches, slow_match_id=slow_match_id)
+
+    for label, values in (("no delay", baseline), (f"one match delayed {args.delay_ms:.0f}ms", delayed)):
+        print(
+            f"{label:>28}: n={len(values)} p50={statistics.median(values):.1f}ms "
+            f"p95={_percentile(values, 95):.1f}ms max={max(values):.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PvP answer round-trip latency while one match's DB write is slow")
+    parser.add_argument("--matches", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=2000.0)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["APP_DATABASE_URL"] = args.database_url
+
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from app.services import pvp_codec
+from app.services.pvp_codec import Frame, JsonCodec, get_codec
+
+
+def _next_task_payload(round_index: int) -> dict:
+    return {
+        "type": "next_task",
+        "match_id": "00000000-0000-0000-0000-000000000000",
+        "round": round_index,
+        "task": {
+            "id": 1000 + round_index,
+            "title": "Количество игр в круговом турнире",
+            "statement": "В турнире участвуют 12 команд, каждая играет с каждой один раз. Сколько всего игр? " * 8,
+            "subject": "Математика",
+            "topic": "Комбинаторика",
+            "difficulty": 2,
+            "answer_type": "int",
+            "hints": ["Каждая игра задаётся парой команд.", "Используйте число сочетаний из n по 2."],
+        },
+    }
+
+
+def _per_recipient(payloads: list[dict], recipients: int) -> int:
+    # Old path: ws.send_json(payload) encodes the same dict once per recipient.
+    sent = 0
+    for payload in payloads:
+        for _ in range(recipients):
+            json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            sent += 1
+    return sent
+
+
+def _encode_once(payloads: list[dict], recipients: int) -> int:
+    sent = 0
+    for payload in payloads:
+        frame = Frame(payload)
+        for _ in range(recipients):
+            frame.text
+            sent += 1
+    return sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Frames per second for next_task broadcasts")
+    parser.add_argument("--broadcasts", type=int, default=50000)
+    parser.add_argument("--recipients", type=int, default=2)
+    args = parser.parse_args()
+
+    payloads = [_next_task_payload(i % 10) for i in range(args.broadcasts)]
+
+    runs = [("send_json per recipient (json)", _per_recipient, JsonCodec())]
+    runs.append(("encode once (json)", _encode_once, JsonCodec()))
+    fast = get_codec("auto")
+    if fast.name != "json":
+        runs.append((f"encode once ({fast.name})", _encode_once, fast))
+
+    for label, fn, run_codec in runs:
+        pvp_codec.codec = run_codec
+        started = time.perf_counter()
+        frames = fn(payloads, args.recipients)
+        elapsed = time.perf_counter() - started
+        print(f"{label:>32}: {frames / elapsed:,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
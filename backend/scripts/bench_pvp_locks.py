@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import nullcontext
+
+
+class _BenchSocket:
+    def __init__(self) -> None:
+        self.answered_at: float | None = None
+        self.answered = asyncio.Event()
+
+    async def send_text(self, text: str) -> None:
+        if json.loads(text).get("type") == "answer_result" and self.answered_at is None:
+            self.answered_at = time.perf_counter()
+            self.answered.set()
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def _fill(players: int, tasks: int, answer_type: str) -> None:
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task, User
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        for i in range(1, players + 1):
+            db.add(User(id=i, email=f"bench{i}@example.com", username=f"bench{i}", password_hash="-", rating=1000))
+        for i in range(tasks):
+            db.add(
+                Task(
+                    title=f"bench {i}",
+                    statement="-",
+                    subject="bench",
+                    topic="bench",
+                    difficulty=1,
+                    answer_type=answer_type,
+                    correct_answer=f"x*{i}+1" if answer_type == "expr" else str(i),
+                )
+            )
+        db.commit()
+
+
+async def _run(args, *, global_lock: bool) -> tuple[float, list[float]]:
+    from app.services.pvp_manager import PvpManager
+
+    players = args.matches * 2
+    manager = PvpManager()
+    sockets = {i: _BenchSocket() for i in range(1, players + 1)}
+    for user_id, ws in sockets.items():
+        await manager.connect(user_id=user_id, websocket=ws)
+    await manager._start_matches([(i, i + 1) for i in range(1, players + 1, 2)])
+    states = list(manager._matches.values())
+    # The layout before per-match locks: one manager-wide lock around every handler, so a submission
+    # waits for every other match's check, DB write and sends. Otherwise only the match's own lock applies.
+    handler_lock = asyncio.Lock() if global_lock else nullcontext()
+
+    async def answer(index: int, round_index: int) -> float | None:
+        state = states[index]
+        ws = sockets[state.player1_id]
+        ws.answered_at = None
+        ws.answered.clear()
+        # A distinct wrong answer per submission, so the verdict cache never answers for the checker.
+        value = f"x*{round_index}+{index + 2}" if args.answer_type == "expr" else str(-index - 1)
+        started = time.perf_counter()
+        async with handler_lock:
+            await manager._answer_submit(
+                user_id=state.player1_id, match_id=state.match_id, answer=value, task_id=state.task_id
+            )
+        try:
+            await asyncio.wait_for(ws.answered.wait(), timeout=30.0)
+        except asyncio.TimeoutError:
+            return None
+        return (ws.answered_at - started) * 1000.0
+
+    latencies: list[float] = []
+    started = time.perf_counter()
+    for round_index in range(args.rounds):
+        results = await asyncio.gather(*(answer(i, round_index) for i in range(len(states))))
+        latencies.extend(r for r in results if r is not None)
+    elapsed = time.perf_counter() - started
+    await manager.shutdown()
+    return elapsed, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="PvpManager._answer_submit across concurrent matches: per-match locks vs one global lock"
+    )
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--answer-type",
+        choices=("int", "expr"),
+        default="expr",
+        help="expr is checked in the process pool while the match lock is held; int is checked inline",
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="buffer answer writes in the journal instead of one SQLite commit per answer",
+    )
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["APP_DATABASE_URL"] = args.database_url
+    # Matches must outlive the run: no scoring out, no timeouts, no heartbeat reaping.
+    os.environ["APP_PVP_TARGET_SCORE"] = str(args.rounds + 1)
+    os.environ["APP_PVP_MAX_ROUNDS"] = str(args.rounds + 1)
+    os.environ["APP_PVP_MATCH_TIMEOUT_SECONDS"] = "3600"
+    os.environ["APP_PVP_HEARTBEAT_INTERVAL_SECONDS"] = "0"
+    os.environ["APP_PVP_WRITE_BEHIND"] = "true" if args.write_behind else "false"
+
+    from app.services.checker import compile_matcher
+    from app.services.checker_pool import checker_pool
+
+    # Start the worker processes up front, so neither layout pays for spawning them.
+    checker_pool.check_sync(compile_matcher(correct_answer="x", answer_type="expr"), "x")
+    _fill(args.matches * 2, args.rounds + 20, args.answer_type)
+    total = args.matches * args.rounds
+    try:
+        for label, global_lock in (("global lock", True), ("per-match locks", False)):
+            elapsed, latencies = asyncio.run(_run(args, global_lock=global_lock))
+            print(
+                f"{label:>16}: {len(latencies)}/{total} answers in {elapsed:.2f}s -> {total / elapsed:,.0f} answers/s, "
+                f"answer_result p50={statistics.median(latencies):.1f}ms p95={_percentile(latencies, 95):.1f}ms "
+                f"max={max(latencies):.1f}ms"
+            )
+    finally:
+        checker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
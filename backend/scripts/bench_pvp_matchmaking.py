@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.pvp_queue import MatchmakingQueue, QueueEntry
+
+
+def _queue(players: int, max_wait: float, now: float, seed: int) -> MatchmakingQueue:
+    rng = random.Random(seed)
+    queue = MatchmakingQueue()
+    for user_id in range(1, players + 1):
+        rating = int(rng.gauss(1200, 300))
+        queue.add(QueueEntry(user_id=user_id, rating=rating, joined_at=now - rng.uniform(0.0, max_wait)))
+    return queue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="One matchmaking tick over a full queue: greedy vs batch pairing")
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--max-wait", type=float, default=60.0, help="queued players joined up to this many s ago")
+    parser.add_argument("--base-diff", type=int, default=300)
+    parser.add_argument("--growth", type=float, default=10.0)
+    parser.add_argument("--max-diff", type=int, default=1000)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="tick budget the pairing step must fit")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    now = time.time()
+    for mode in ("greedy", "batch"):
+        timings: list[float] = []
+        for _ in range(args.repeat):
+            queue = _queue(args.players, args.max_wait, now, args.seed)
+            started = time.perf_counter()
+            pairs = queue.pop_pairs(
+                now=now, base_diff=args.base_diff, growth_per_second=args.growth, max_diff=args.max_diff, mode=mode
+            )
+            timings.append((time.perf_counter() - started) * 1000.0)
+
+        diffs = [abs(a.rating - b.rating) for a, b in pairs]
+        left = list(queue)
+        longest_left = max((now - entry.joined_at for entry in left), default=0.0)
+        tick_ms = statistics.median(timings)
+        print(
+            f"{mode:>6}: {tick_ms:7.1f}ms/tick ({'within' if tick_ms <= args.budget_ms else 'OVER'} "
+            f"{args.budget_ms:.0f}ms budget), pairs={len(pairs)}, "
+            f"mean diff={statistics.fmean(diffs) if diffs else 0.0:.1f}, max diff={max(diffs, default=0)}, "
+            f"left={len(left)}, longest wait left={longest_left:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
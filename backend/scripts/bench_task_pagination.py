@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Optional
+
+
+def _fill(tasks: int, seed: int) -> None:
+    from sqlalchemy import func, insert, select
+
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count(Task.id))) or 0
+        rng = random.Random(seed)
+        subjects = ["Математика", "Информатика", "Физика", "Химия", "Биология"]
+        batch = []
+        for i in range(existing, tasks):
+            batch.append(
+                {
+                    "title": f"Задача {i}",
+                    "statement": f"Условие задачи {i}",
+                    "subject": rng.choice(subjects),
+                    "topic": f"Тема {rng.randrange(40)}",
+                    "difficulty": 1 + rng.randrange(10),
+                    "answer_type": "int",
+                    "correct_answer": str(i),
+                }
+            )
+            if len(batch) == 50_000:
+                db.execute(insert(Task), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(Task), batch)
+        db.commit()
+
+
+def _page(db, subject: Optional[str], *, limit: int, offset: int = 0, cursor: Optional[str] = None):
+    # The query behind GET /api/tasks, without the response cache in front of it.
+    from app.api.routers.tasks import _list_page
+
+    return _list_page(db, subject, None, None, None, None, limit=limit, offset=offset, cursor=cursor)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GET /api/tasks: OFFSET pages vs keyset (cursor) pages")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--depths", default="0,1000,10000,100000,500000", help="rows skipped before the page")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+    os.environ["APP_DATABASE_URL"] = args.database_url
+
+    from app.api.routers.tasks import _encode_cursor
+    from app.core.db import SessionLocal
+
+    started = time.perf_counter()
+    _fill(args.tasks, args.seed)
+    print(f"table ready: {args.tasks:,} tasks ({time.perf_counter() - started:.1f}s)")
+
+    depths = [int(depth) for depth in args.depths.split(",")]
+    for subject in (None, "Физика"):
+        with SessionLocal() as db:
+            for depth in depths:
+                cursor = None
+                if depth:
+                    # The keyset page at this depth starts right after the row the offset page skips last.
+                    before, _ = _page(db, subject, limit=1, offset=depth - 1)
+                    if not before:
+                        continue
+                    cursor = _encode_cursor(before[0].id, [subject, None, None, None, None])
+
+                offset_ms, keyset_ms = [], []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    by_offset, _ = _page(db, subject, limit=args.limit, offset=depth)
+                    offset_ms.append((time.perf_counter() - t0) * 1000.0)
+                    t0 = time.perf_counter()
+                    by_cursor, _ = _page(db, subject, limit=args.limit, cursor=cursor)
+                    keyset_ms.append((time.perf_counter() - t0) * 1000.0)
+                same = [t.id for t in by_offset] == [t.id for t in by_cursor]
+                print(
+                    f"{subject or 'no filter':>10} depth {depth:>9,}: offset {statistics.median(offset_ms):8.2f}ms, "
+                    f"cursor {statistics.median(keyset_ms):6.2f}ms, same rows={same}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+# Statement vocabulary: inflected forms, so queries exercise stemming ("треугольника" finds "треугольники").
+WORDS = (
+    "найдите вычислите определите докажите сколько какое какая каких число числа чисел простых простые "
+    "натуральных целых делителей делится остаток сумма суммы произведение разность квадрат квадрата куб "
+    "корень уравнение уравнения неравенство решений решение функция функции график графика точка точки "
+    "прямая прямой угол угла углов треугольник треугольника треугольники окружность окружности радиус "
+    "радиуса площадь площади периметр длина длину сторона стороны вершина вершин многоугольник квадрате "
+    "прямоугольник вероятность вероятности монета монету кубик кубика бросают игральный последовательность "
+    "последовательности член членов прогрессия арифметической геометрической массив массива элементы "
+    "элементов сортировка сортировки строка строки символ символов алгоритм алгоритма граф графа вершинами "
+    "ребра ребер путь пути кратчайший дерево дерева скорость скоростью поезд поезда автомобиль время "
+    "расстояние масса массой тело тела сила силы энергия энергии ток тока напряжение сопротивление "
+    "реакция реакции вещество вещества раствор раствора молекула клетка клетки организм ген генов "
+    "задача задачи условие условию ответ ответе равен равна равно больше меньше каждый каждого всех "
+    "двух трех пяти десяти сто тысяча минимальное максимальное наибольшее наименьшее среднее значение"
+).split()
+SUBJECTS = ["Математика", "Информатика", "Физика", "Химия", "Биология"]
+
+
+def _zipf_words(rng: random.Random, count: int) -> str:
+    # Rank-frequency ~ 1/rank (in WORDS order): a few words are in most statements, most are rare.
+    return " ".join(WORDS[min(int(rng.paretovariate(1.0)) - 1, len(WORDS) - 1)] for _ in range(count))
+
+
+def _fill(tasks: int, seed: int) -> None:
+    from sqlalchemy import func, insert, select
+
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count(Task.id))) or 0
+        rng = random.Random(seed)
+        batch = []
+        for i in range(existing, tasks):
+            batch.append(
+                {
+                    "title": " ".join(rng.sample(WORDS, 3)).capitalize(),
+                    "statement": _zipf_words(rng, rng.randint(15, 40)) + f" {i}.",
+                    "subject": rng.choice(SUBJECTS),
+                    "topic": f"Тема {rng.randrange(40)}",
+                    "difficulty": 1 + rng.randrange(10),
+                    "answer_type": "int",
+                    "correct_answer": str(i),
+                }
+            )
+            if len(batch) == 50_000:
+                db.execute(insert(Task), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(Task), batch)
+        db.commit()
+
+
+def _queries(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.sample(WORDS, rng.choice((1, 1, 2, 2, 3)))
+        if rng.random() < 0.3:
+            # Still typing the last word.
+            words[-1] = words[-1][: max(3, len(words[-1]) // 2)]
+        queries.append(" ".join(words))
+    return queries
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GET /api/tasks?q=: in-process search index vs LIKE")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--like-queries", type=int, default=10, help="LIKE scans the table: keep this small")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    os.environ["APP_DATABASE_URL"] = args.database_url
+
+    from sqlalchemy import or_, select
+
+    from app.core.db import SessionLocal
+    from app.models import Task
+    from app.services.task_search import TaskSearchIndex
+
+    started = time.perf_counter()
+    _fill(args.tasks, args.seed)
+    print(f"table ready: {args.tasks:,} tasks ({time.perf_counter() - started:.1f}s)")
+
+    index = TaskSearchIndex()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        index.load(db)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"index built: {len(index):,} tasks in {time.perf_counter() - started:.1f}s, "
+        f"peak RSS +{(rss_after - rss_before) / 1024:,.0f} MiB"
+    )
+
+    queries = _queries(args.queries, args.seed)
+    rng = random.Random(args.seed)
+    for label, filters in (("no filter", {}), ("subject", {"subject": "Физика"})):
+        timings, hits = [], []
+        for query in queries:
+            t0 = time.perf_counter()
+            ids = index.search(query, limit=51, **filters)
+            timings.append((time.perf_counter() - t0) * 1000.0)
+            hits.append(len(ids))
+        print(
+            f"index, {label:>9}: p50 {_percentile(timings, 50):6.2f}ms, p95 {_percentile(timings, 95):6.2f}ms, "
+            f"p99 {_percentile(timings, 99):6.2f}ms, max {max(timings):6.2f}ms, "
+            f"queries with a full page: {sum(h > 50 for h in hits) / len(hits):.0%}"
+        )
+
+    timings = []
+    with SessionLocal() as db:
+        for query in rng.sample(queries, min(args.like_queries, len(queries))):
+            like = f"%{query}%"
+            t0 = time.perf_counter()
+            stmt = select(Task.id).where(or_(Task.title.like(like), Task.statement.like(like)))
+            db.execute(stmt.order_by(Task.id.desc()).limit(51)).all()
+            timings.append((time.perf_counter() - t0) * 1000.0)
+    print(f"LIKE,  no filter: median {statistics.median(timings):8.2f}ms, max {max(timings):8.2f}ms")
+
+    # Admin edits while serving: the index is updated in place.
+    with SessionLocal() as db:
+        tasks = db.scalars(select(Task).order_by(Task.id).limit(200)).all()
+        t0 = time.perf_counter()
+        for task in tasks:
+            index.upsert(task)
+        print(f"upsert of an existing task: {(time.perf_counter() - t0) * 1000.0 / len(tasks):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+
+from app.services.checker import AnswerMatcher
+
+
+class ExactMatcher(AnswerMatcher):
+    """Case-sensitive exact compare: checked as text, "ABC" and "abc" would both pass."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+    def matches(self, answer: str) -> bool:
+        return answer.strip() == self.key.strip()
+
+
+def _heavy_type_outside_checker() -> None:
+    from app.services.checker import compile_matcher, register_answer_type
+    from app.services.checker_pool import checker_pool
+
+    # Registered after the pool's workers could have imported checker.py: they must pick it up by reference.
+    register_answer_type("exact", ExactMatcher, heavy=True)
+    matcher = compile_matcher(correct_answer="abc", answer_type="exact")
+    assert matcher.heavy
+    verdicts = checker_pool.check_many(matcher, ["abc", "ABC", "cba"], strict=True)
+    assert verdicts == [True, False, False], verdicts
+    print("ok: a heavy answer type registered outside checker.py is checked by its own matcher in the pool")
+
+
+def _unimportable_heavy_type() -> None:
+    from app.services.checker import register_answer_type
+
+    try:
+        register_answer_type("exact_lambda", lambda key: ExactMatcher(key), heavy=True)
+    except ValueError:
+        print("ok: a heavy answer type whose compile function cannot be imported is refused")
+    else:
+        raise AssertionError("a lambda was accepted as a heavy compile function")
+
+
+def _unknown_type_in_worker() -> None:
+    from app.services.checker import check_in_worker
+
+    try:
+        check_in_worker("no_such_type", "", "abc", ["abc"], 1.0)
+    except ValueError:
+        print("ok: a worker refuses an answer type it does not know instead of checking it as text")
+    else:
+        raise AssertionError("an unknown answer type was checked")
+
+
+def main() -> None:
+    os.environ.setdefault("APP_DATABASE_URL", "sqlite://")
+    from app.services.checker_pool import checker_pool
+
+    try:
+        _unimportable_heavy_type()
+        _unknown_type_in_worker()
+        _heavy_type_outside_checker()
+    finally:
+        checker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class _CheckSocket:
+    def __init__(self) -> None:
+        self.frames: list[dict] = []
+        self._arrived = asyncio.Event()
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(json.loads(text))
+        self._arrived.set()
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+    async def wait_for(self, frame_type: str, *, after: int = 0, timeout: float = 5.0) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            for frame in self.frames[after:]:
+                if frame.get("type") == frame_type:
+                    return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                seen = [frame.get("type") for frame in self.frames]
+                raise AssertionError(f"no {frame_type!r} frame within {timeout:g}s, got {seen}")
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _fill(players: int, tasks: int) -> None:
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task, User
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        for i in range(1, players + 1):
+            db.add(User(id=i, email=f"check{i}@example.com", username=f"check{i}", password_hash="-", rating=1000))
+        for i in range(1, tasks + 1):
+            db.add(
+                Task(
+                    title=f"check {i}",
+                    statement="-",
+                    subject="check",
+                    topic="check",
+                    difficulty=1,
+                    answer_type="int",
+                    correct_answer=str(i),
+                )
+            )
+        db.commit()
+
+
+async def _pair(workers, sockets, user_a: int, user_b: int) -> dict:
+    (worker_a, ws_a), (worker_b, ws_b) = (workers[user_a], sockets[user_a]), (workers[user_b], sockets[user_b])
+    await worker_a.handle_message(user_id=user_a, message={"type": "queue_join"})
+    await worker_b.handle_message(user_id=user_b, message={"type": "queue_join"})
+    found = await ws_a.wait_for("match_found")
+    await ws_b.wait_for("match_found")
+    return found
+
+
+async def _cross_worker_match(workers, sockets) -> None:
+    from app.core.db import SessionLocal
+    from app.models import Match, Task
+
+    found = await _pair(workers, sockets, 1, 2)
+    match_id = found["match_id"]
+    # Player 2 answers through worker 2; whichever worker owns the match must see it.
+    task = found["task"]
+    for round_index in range(1, 4):
+        with SessionLocal() as db:
+            answer = db.get(Task, task["id"]).correct_answer
+        seen = len(sockets[2].frames)
+        await workers[2].handle_message(
+            user_id=2, message={"type": "answer_submit", "match_id": match_id, "answer": answer, "task_id": task["id"]}
+        )
+        result = await sockets[2].wait_for("answer_result", after=seen)
+        assert result["is_correct"] and result["player2_score"] == round_index, result
+        if round_index < 3:
+            task = (await sockets[2].wait_for("next_task", after=seen))["task"]
+
+    end_a = await sockets[1].wait_for("match_end")
+    end_b = await sockets[2].wait_for("match_end")
+    assert (end_a["result"], end_b["result"]) == ("lose", "win"), (end_a, end_b)
+    with SessionLocal() as db:
+        match = db.get(Match, match_id)
+        assert match.status == "finished" and match.player2_score == 3, (match.status, match.player2_score)
+    print("ok: players on different workers are paired, routed and finished")
+
+
+async def _leave_during_pairing(workers) -> None:
+    from app.services.pvp_queue import QueueEntry
+
+    pairer, leaver = workers[3]._backend, workers[4]._backend
+    await pairer.queue_add(QueueEntry(user_id=3, rating=1000, joined_at=time.time()))
+    await leaver.queue_add(QueueEntry(user_id=4, rating=1000, joined_at=time.time()))
+
+    redis = pairer._redis
+    snapshot = redis.hgetall
+
+    async def hgetall_then_leave(key):
+        # Player 4 leaves on the other worker after the pairer read the queue.
+        await leaver.queue_remove(4)
+        return await snapshot(key)
+
+    redis.hgetall = hgetall_then_leave
+    try:
+        pairs = await pairer.queue_pop_pairs(now=time.time(), base_diff=300, growth_per_second=0, max_diff=300)
+    finally:
+        del redis.hgetall
+    assert pairs == [], pairs
+    assert await pairer.queue_size() == 1, "player 3 must stay queued"
+    await pairer.queue_remove(3)
+    print("ok: a player who leaves after the pairing snapshot is not matched")
+
+
+async def _remote_disconnect(workers, sockets) -> None:
+    found = await _pair(workers, sockets, 5, 6)
+    await workers[6].disconnect(user_id=6)
+    canceled = await sockets[5].wait_for("match_canceled")
+    assert canceled["match_id"] == found["match_id"] and canceled["reason"] == "disconnect", canceled
+    print("ok: a disconnect on one worker cancels the match wherever it runs")
+
+
+async def _run() -> None:
+    from app.services.pvp_manager import PvpManager
+
+    first, second = PvpManager(), PvpManager()
+    # Odd players connect to the first worker, even ones to the second.
+    workers = {user_id: first if user_id % 2 else second for user_id in range(1, 7)}
+    sockets = {user_id: _CheckSocket() for user_id in workers}
+    for user_id, ws in sockets.items():
+        await workers[user_id].connect(user_id=user_id, websocket=ws)
+    try:
+        await _cross_worker_match(workers, sockets)
+        await _leave_during_pairing(workers)
+        await _remote_disconnect(workers, sockets)
+    finally:
+        await first.shutdown()
+        await second.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Two PvpManager workers sharing the Redis state backend")
+    parser.add_argument("--redis-url", default=None, help="defaults to an in-process fakeredis server")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    server = None
+    if args.redis_url is None:
+        try:
+            from fakeredis import TcpFakeServer
+        except ImportError:
+            parser.error("pass --redis-url or install fakeredis for the local stand-in server")
+        server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        args.redis_url = f"redis://{host}:{port}/0"
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check.db')}"
+
+    os.environ["APP_DATABASE_URL"] = args.database_url
+    os.environ["APP_PVP_STATE_BACKEND"] = "redis"
+    os.environ["APP_PVP_REDIS_URL"] = args.redis_url
+    os.environ["APP_PVP_MATCHMAKING_TICK_SECONDS"] = "0.05"
+    os.environ["APP_PVP_TARGET_SCORE"] = "3"
+
+    _fill(players=6, tasks=30)
+    try:
+        asyncio.run(_run())
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
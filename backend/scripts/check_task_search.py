@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+
+# Random tasks: a small vocabulary, so random queries of several words still have matches.
+# It leaves out "треугольник" and "площадь", which only the fixed tasks use.
+WORDS = (
+    "угол угла окружность окружности радиус число числа сумма суммы уравнение корень функция "
+    "график вероятность монета граф вершина вершины путь скорость"
+).split()
+SUBJECTS = ["Математика", "Информатика", "Физика"]
+
+
+def _fill(random_tasks: int, seed: int) -> None:
+    from sqlalchemy import insert
+
+    from app.core.db import SessionLocal, engine
+    from app.models import Base, Task
+
+    def row(title: str, subject: str, difficulty: int = 1) -> dict:
+        return {
+            "title": title,
+            "statement": "-",
+            "subject": subject,
+            "topic": "-",
+            "difficulty": difficulty,
+            "answer_type": "int",
+            "correct_answer": "0",
+        }
+
+    # Task 1 is the only one with both words, and older than every task with either of them.
+    rows = [row("треугольник площадь", "Геометрия")]
+    rows += [row("треугольник", "Алгебра") for _ in range(2, 3000)]
+    rows += [row("площадь", "Алгебра") for _ in range(3000, 6000)]
+    rows += [row("треугольник", "Алгебра") for _ in range(6000, 50_000)]
+    rng = random.Random(seed)
+    for _ in range(random_tasks):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        rows.append(row(title, rng.choice(SUBJECTS), 1 + rng.randrange(5)))
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(Task), rows)
+        db.commit()
+
+
+def _old_match_is_found(index) -> None:
+    assert index.search("треугольник площадь") == [1], index.search("треугольник площадь")
+    assert index.search("треугольник", subject="Геометрия") == [1]
+    assert index.search("площадь треугольника ", subject="Геометрия") == [1]
+    print("ok: an old task is found behind thousands of newer tasks with each of its words")
+
+
+def _matches_brute_force(index, queries: int, seed: int) -> None:
+    from sqlalchemy import select
+
+    from app.core.db import SessionLocal
+    from app.models import Task
+    from app.services.task_search import terms
+
+    with SessionLocal() as db:
+        docs = [
+            (row.id, set(terms(f"{row.title} {row.statement}")), row.subject, row.difficulty)
+            for row in db.execute(select(Task.id, Task.title, Task.statement, Task.subject, Task.difficulty))
+        ]
+
+    rng = random.Random(seed)
+    for _ in range(queries):
+        # A trailing space: the last word is complete, so no prefix matches.
+        query = " ".join(rng.sample(WORDS, rng.randint(1, 3))) + " "
+        filters = {}
+        if rng.random() < 0.5:
+            filters["subject"] = rng.choice(SUBJECTS)
+        if rng.random() < 0.3:
+            filters["difficulty_min"] = filters["difficulty_max"] = 1 + rng.randrange(5)
+        wanted = set(terms(query))
+        expected = {
+            task_id
+            for task_id, doc_terms, subject, difficulty in docs
+            if wanted <= doc_terms
+            and filters.get("subject", subject) == subject
+            and filters.get("difficulty_min", difficulty) <= difficulty <= filters.get("difficulty_max", difficulty)
+        }
+        found = index.search(query, limit=len(docs), **filters)
+        assert len(found) == len(set(found)) and set(found) == expected, (query, filters, len(found), len(expected))
+        assert index.search(query, limit=10, **filters) == found[:10], (query, filters)
+    print(f"ok: {queries} random queries return exactly the tasks that contain every word")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TaskSearchIndex returns every match, not just recent candidates")
+    parser.add_argument("--random-tasks", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["APP_DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check.db')}"
+    _fill(args.random_tasks, args.seed)
+
+    from app.core.db import SessionLocal
+    from app.services.task_search import TaskSearchIndex
+
+    index = TaskSearchIndex()
+    with SessionLocal() as db:
+        index.load(db)
+    _old_match_is_found(index)
+    _matches_brute_force(index, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class LoadStats:
+    queue_wait_ms: list[float] = field(default_factory=list)
+    match_start_ms: list[float] = field(default_factory=list)
+    answer_round_end_ms: list[float] = field(default_factory=list)
+    frames_received: int = 0
+    frames_sent: int = 0
+    matches_found: int = 0
+    matches_ended: int = 0
+    matches_canceled: int = 0
+    disconnects: int = 0
+    errors: int = 0
+
+
+@dataclass
+class LoadOptions:
+    url: str
+    accuracy: float
+    think_min: float
+    think_max: float
+    disconnect_rate: float
+    deadline: float
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+def _raise_fd_limit() -> None:
+    # Every simulated player holds a socket (two when the server runs in-process).
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class _Player:
+    def __init__(
+        self,
+        *,
+        user_id: int,
+        token: str,
+        answers: dict[int, str],
+        opts: LoadOptions,
+        stats: LoadStats,
+        joined: dict[int, float],
+        rng: random.Random,
+    ) -> None:
+        self.user_id = user_id
+        self.token = token
+        self.answers = answers
+        self.opts = opts
+        self.stats = stats
+        self.joined = joined
+        self.rng = rng
+        self._round: Optional[tuple[str, int]] = None
+        self._answered_at: Optional[float] = None
+        self._accepted = False
+
+    async def run(self) -> None:
+        import websockets
+
+        while time.monotonic() < self.opts.deadline:
+            try:
+                async with websockets.connect(f"{self.opts.url}?token={self.token}", max_size=None) as ws:
+                    await self._session(ws)
+            except (OSError, asyncio.TimeoutError, websockets.ConnectionClosedError, websockets.InvalidStatus):
+                self.stats.errors += 1
+            await asyncio.sleep(self.rng.uniform(0.05, 0.5))
+
+    async def _send(self, ws, message: dict) -> None:
+        await ws.send(json.dumps(message))
+        self.stats.frames_sent += 1
+
+    async def _join(self, ws) -> None:
+        self.joined[self.user_id] = time.monotonic()
+        self._round = None
+        await self._send(ws, {"type": "queue_join"})
+
+    async def _session(self, ws) -> None:
+        import websockets
+
+        in_match = False
+        await self._join(ws)
+        while True:
+            if not in_match and time.monotonic() >= self.opts.deadline:
+                await self._send(ws, {"type": "queue_leave"})
+                return
+            try:
+                text = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            except websockets.ConnectionClosed:
+                return
+            now = time.monotonic()
+            self.stats.frames_received += 1
+            message = json.loads(text)
+            msg_type = message.get("type")
+
+            if msg_type == "ping":
+                await self._send(ws, {"type": "pong"})
+            elif msg_type == "match_found":
+                in_match = True
+                self.stats.matches_found += 1
+                joined_at = self.joined.get(self.user_id, now)
+                self.stats.queue_wait_ms.append((now - joined_at) * 1000.0)
+                # The match could start once both players were queued.
+                pairable_at = max(joined_at, self.joined.get(int(message["opponent_user_id"]), joined_at))
+                self.stats.match_start_ms.append((now - pairable_at) * 1000.0)
+                if self.rng.random() < self.opts.disconnect_rate:
+                    asyncio.create_task(self._drop_later(ws))
+                self._new_round(ws, message)
+            elif msg_type == "next_task":
+                self._new_round(ws, message)
+            elif msg_type == "answer_result":
+                self._accepted = True
+            elif msg_type == "round_end":
+                if self._accepted and self._answered_at is not None:
+                    self.stats.answer_round_end_ms.append((now - self._answered_at) * 1000.0)
+                self._answered_at = None
+                self._accepted = False
+            elif msg_type in ("match_end", "match_canceled"):
+                in_match = False
+                if msg_type == "match_end":
+                    self.stats.matches_ended += 1
+                else:
+                    self.stats.matches_canceled += 1
+                if time.monotonic() < self.opts.deadline:
+                    await self._join(ws)
+            elif msg_type == "error":
+                in_match = False
+                await asyncio.sleep(0.5)
+                if time.monotonic() < self.opts.deadline:
+                    await self._join(ws)
+
+    def _new_round(self, ws, message: dict) -> None:
+        task = message["task"]
+        self._round = (message["match_id"], int(message["round"]))
+        self._answered_at = None
+        self._accepted = False
+        asyncio.create_task(self._answer_later(ws, self._round, int(task["id"])))
+
+    async def _answer_later(self, ws, round_key: tuple[str, int], task_id: int) -> None:
+        await asyncio.sleep(self.rng.uniform(self.opts.think_min, self.opts.think_max))
+        if self._round != round_key:
+            return
+        correct = self.rng.random() < self.opts.accuracy
+        answer = self.answers.get(task_id, "") if correct else "-"
+        self._answered_at = time.monotonic()
+        try:
+            await self._send(
+                ws, {"type": "answer_submit", "match_id": round_key[0], "answer": answer, "task_id": task_id}
+            )
+        except Exception:
+            return
+
+    async def _drop_later(self, ws) -> None:
+        await asyncio.sleep(self.rng.uniform(0.0, self.opts.think_max * 2))
+        self.stats.disconnects += 1
+        await ws.close()
+
+
+def _prepare_db(players: int, tasks: int) -> tuple[dict[int, str], dict[int, str]]:
+    """Creates loadtest users and tasks if missing; returns (tokens by user id, answers by task id)."""
+    from sqlalchemy import select
+
+    from app.core.db import SessionLocal, engine
+    from app.core.security import create_access_token, get_password_hash
+    from app.models import Base, Task, User
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = {row.username: row.id for row in db.execute(select(User.id, User.username))}
+        password_hash = get_password_hash("loadtest")
+        for i in range(players):
+            username = f"loadtest_{i}"
+            if username not in existing:
+                db.add(User(email=f"{username}@loadtest.local", username=username, password_hash=password_hash))
+        if db.scalar(select(Task.id).limit(1)) is None:
+            for i in range(tasks):
+                db.add(
+                    Task(
+                        title=f"Нагрузочная задача {i}",
+                        statement=f"Сколько будет {i} + {i}?",
+                        subject="Математика",
+                        topic="Арифметика",
+                        difficulty=1 + i % 5,
+                        answer_type="int",
+                        correct_answer=str(i + i),
+                    )
+                )
+        db.commit()
+
+        user_ids = [
+            row.id
+            for row in db.execute(
+                select(User.id).where(User.username.in_([f"loadtest_{i}" for i in range(players)]))
+            )
+        ]
+        answers = {int(row.id): str(row.correct_answer) for row in db.execute(select(Task.id, Task.correct_answer))}
+    tokens = {int(user_id): create_access_token(user_id=int(user_id)) for user_id in user_ids}
+    return tokens, answers
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+async def _run(args) -> None:
+    import uvicorn
+
+    tokens, answers = _prepare_db(args.players, args.tasks)
+
+    server = None
+    server_task = None
+    url = args.url
+    if url is None:
+        from app.main import app
+
+        port = _free_port()
+        server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", backlog=max(2048, args.players))
+        )
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        url = f"ws://127.0.0.1:{port}"
+
+    stats = LoadStats()
+    started = time.monotonic()
+    opts = LoadOptions(
+        url=f"{url.rstrip('/')}/api/pvp/ws",
+        accuracy=args.accuracy,
+        think_min=args.think_min_ms / 1000.0,
+        think_max=args.think_max_ms / 1000.0,
+        disconnect_rate=args.disconnect_rate,
+        deadline=started + args.duration,
+    )
+    rng = random.Random(args.seed)
+    joined: dict[int, float] = {}
+    players = [
+        _Player(
+            user_id=user_id,
+            token=token,
+            answers=answers,
+            opts=opts,
+            stats=stats,
+            joined=joined,
+            rng=random.Random(rng.random()),
+        )
+        for user_id, token in tokens.items()
+    ]
+
+    async def ramp(player: _Player, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await player.run()
+
+    await asyncio.gather(
+        *(ramp(player, idx * args.ramp_s / max(1, len(players))) for idx, player in enumerate(players))
+    )
+    elapsed = time.monotonic() - started
+
+    if server is not None:
+        server.should_exit = True
+        await server_task
+
+    print(
+        f"players={len(players)} duration={elapsed:.1f}s matches found={stats.matches_found // 2} "
+        f"ended={stats.matches_ended // 2} canceled={stats.matches_canceled // 2} "
+        f"disconnects={stats.disconnects} connection errors={stats.errors}"
+    )
+    for label, values in (
+        ("queue wait", stats.queue_wait_ms),
+        ("match start", stats.match_start_ms),
+        ("answer -> round_end", stats.answer_round_end_ms),
+    ):
+        if not values:
+            print(f"{label:>20}: no samples")
+            continue
+        print(
+            f"{label:>20}: n={len(values)} p50={statistics.median(values):.1f}ms "
+            f"p95={_percentile(values, 95):.1f}ms p99={_percentile(values, 99):.1f}ms max={max(values):.1f}ms"
+        )
+    print(
+        f"{'frames/s':>20}: received {stats.frames_received / elapsed:,.0f}, sent {stats.frames_sent / elapsed:,.0f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test /api/pvp/ws with simulated players")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds; players stop re-queueing after it")
+    parser.add_argument("--ramp-s", type=float, default=5.0, help="spread player connects over this many seconds")
+    parser.add_argument("--accuracy", type=float, default=0.6, help="probability of a correct answer")
+    parser.add_argument("--think-min-ms", type=float, default=200.0)
+    parser.add_argument("--think-max-ms", type=float, default=2000.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.05, help="probability to drop during a match")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks to seed if the database has none")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--url",
+        default=None,
+        help="server to test, e.g. ws://127.0.0.1:8000 (must share the database and APP_JWT_SECRET); "
+        "default: run the app in-process",
+    )
+    parser.add_argument(
+        "--prepare-only",
+        action="store_true",
+        help="only create the loadtest users and tasks; run it before starting the server used with --url",
+    )
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None and args.url is None:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    if args.database_url is not None:
+        os.environ["APP_DATABASE_URL"] = args.database_url
+
+    if args.prepare_only:
+        tokens, answers = _prepare_db(args.players, args.tasks)
+        print(f"loadtest users: {len(tokens)}, tasks: {len(answers)}")
+        return
+
+    _raise_fd_limit()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
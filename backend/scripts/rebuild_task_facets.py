@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from app.core.db import SessionLocal
+from app.services.task_cache import task_cache
+from app.services.task_facets import rebuild_facet_counts
+
+
+def main() -> None:
+    # Needed only if tasks were changed outside the application (SQL, other tools).
+    with SessionLocal() as db:
+        keys = rebuild_facet_counts(db)
+        db.commit()
+    task_cache.invalidate()
+    print(f"facet keys: {keys}")
+
+
+if __name__ == "__main__":
+    main()
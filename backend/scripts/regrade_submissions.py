@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.core.db import SessionLocal
+from app.models.task import Task
+from app.services.regrade import RegradeStats, regrade_task
+
+
+def _progress(stats: RegradeStats) -> None:
+    rate = stats.scanned / stats.elapsed_s if stats.elapsed_s else 0.0
+    print(
+        f"task {stats.task_id}: {stats.scanned:,}/{stats.total:,} submissions checked ({rate:,.0f}/s), "
+        f"{stats.changed:,} corrected",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-check stored submissions against the current answer keys")
+    parser.add_argument("task_ids", nargs="*", type=int, help="tasks to regrade")
+    parser.add_argument(
+        "--updated-since",
+        type=datetime.fromisoformat,
+        help="also regrade every task edited at or after this time, e.g. 2024-05-01T12:00",
+    )
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--dry-run", action="store_true", help="only report how many verdicts would change")
+    args = parser.parse_args()
+
+    # Submissions are streamed on one connection and corrections written on another, so the
+    # server-side cursor stays open while each chunk is committed.
+    with SessionLocal() as read_db, SessionLocal() as write_db:
+        task_ids = list(dict.fromkeys(args.task_ids))
+        if args.updated_since is not None:
+            rows = read_db.execute(select(Task.id).where(Task.updated_at >= args.updated_since).order_by(Task.id))
+            task_ids.extend(task_id for (task_id,) in rows if task_id not in task_ids)
+        if not task_ids:
+            parser.error("give task ids and/or --updated-since")
+
+        changed = 0
+        for task_id in task_ids:
+            stats = regrade_task(
+                read_db,
+                None if args.dry_run else write_db,
+                task_id,
+                chunk_size=args.chunk_size,
+                on_progress=_progress,
+            )
+            read_db.rollback()
+            if stats is None:
+                print(f"task {task_id}: not found", file=sys.stderr)
+                continue
+            changed += stats.changed
+            print(
+                f"task {task_id}: {stats.scanned:,} submissions in {stats.elapsed_s:.2f}s, "
+                f"+{stats.became_correct:,} now correct, -{stats.became_incorrect:,} now incorrect"
+                f"{f', {stats.timeouts:,} check timeouts (unchanged)' if stats.timeouts else ''}"
+                f"{' (dry run)' if args.dry_run else ''}"
+            )
+
+    print(f"tasks: {len(task_ids)}, verdicts changed: {changed:,}{' (dry run)' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.services.elo_replay import (
+    ChunkTrajectory,
+    rating_diffs,
+    replay_ratings,
+    write_match_trajectory,
+    write_user_ratings,
+)
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Recompute PvP ratings by replaying every finished match")
+    parser.add_argument("--k", type=int, default=settings.pvp_rating_k)
+    parser.add_argument("--initial", type=int, default=settings.pvp_initial_rating)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--dry-run", action="store_true", help="only report rating diffs, write nothing")
+    parser.add_argument("--output", help="CSV file for rating diffs (default: stdout on --dry-run)")
+    args = parser.parse_args()
+
+    # Matches are streamed on one connection and trajectories written on another, so the
+    # server-side cursor stays open while each chunk is committed.
+    with SessionLocal() as read_db, SessionLocal() as write_db:
+
+        def on_chunk(chunk: ChunkTrajectory) -> None:
+            write_match_trajectory(write_db, chunk)
+            write_db.commit()
+
+        result = replay_ratings(
+            read_db,
+            k=args.k,
+            initial=args.initial,
+            chunk_size=args.chunk_size,
+            on_chunk=None if args.dry_run else on_chunk,
+        )
+        read_db.rollback()
+        diffs = rating_diffs(read_db, result, initial=args.initial)
+
+        if not args.dry_run:
+            write_user_ratings(write_db, diffs)
+            write_db.commit()
+
+    if args.output or args.dry_run:
+        out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(["user_id", "old_rating", "new_rating", "diff"])
+            for user_id, old, new in diffs:
+                writer.writerow([user_id, old, new, new - old])
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    stats = result.stats
+    rate = stats.matches / stats.elapsed_s if stats.elapsed_s else 0.0
+    print(
+        f"matches replayed: {stats.matches} in {stats.elapsed_s:.2f}s ({rate:,.0f}/s), "
+        f"users changed: {len(diffs)}{' (dry run)' if args.dry_run else ''}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from sqlalchemy import func, select
 
 from app.core.db import SessionLocal
 from app.models.task import Task
+from app.services.task_cache import task_cache
+from app.services.task_facets import adjust_facet_counts, count_keys
 
 
 TASKS: List[Dict[str, Any]] = [
@@ -389,19 +391,25 @@ def _task_key(item: Dict[str, Any]) -> Tuple[str, str]:
 def main() -> None:
     with SessionLocal() as db:
         existing = set(db.execute(select(Task.title, Task.subject)).all())
-        inserted = 0
+        inserted: List[Task] = []
 
         for item in TASKS:
             key = _task_key(item)
             if key in existing:
                 continue
-            db.add(Task(**item))
+            task = Task(**item)
+            db.add(task)
+            inserted.append(task)
             existing.add(key)
-            inserted += 1
 
+        adjust_facet_counts(db, count_keys(inserted))
         db.commit()
+        if inserted:
+            # Reaches running workers only through a shared cache (APP_TASK_CACHE_BACKEND=redis);
+            # per-worker caches pick the new tasks up within APP_TASK_CACHE_TTL_SECONDS.
+            task_cache.invalidate()
         total = db.scalar(select(func.count(Task.id))) or 0
-        print(f"tasks inserted: {inserted}")
+        print(f"tasks inserted: {len(inserted)}")
         print(f"tasks total: {total}")
 
 
@@ -29,9 +29,30 @@ CREATE TABLE IF NOT EXISTS tasks (
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
-  KEY ix_tasks_subject (subject),
-  KEY ix_tasks_topic (topic),
-  KEY ix_tasks_difficulty (difficulty)
+  -- Filter columns + id for keyset pagination of GET /api/tasks. Existing databases:
+  -- ALTER TABLE tasks DROP INDEX ix_tasks_subject, DROP INDEX ix_tasks_topic, DROP INDEX ix_tasks_difficulty,
+  --   ADD KEY ix_tasks_subject_id (subject, id), ADD KEY ix_tasks_topic_id (topic, id),
+  --   ADD KEY ix_tasks_subject_topic_id (subject, topic, id), ADD KEY ix_tasks_difficulty_id (difficulty, id);
+  KEY ix_tasks_subject_id (subject, id),
+  KEY ix_tasks_topic_id (topic, id),
+  KEY ix_tasks_subject_topic_id (subject, topic, id),
+  KEY ix_tasks_difficulty_id (difficulty, id),
+  -- Catch-up of the in-process search index (APP_TASK_SEARCH_BACKEND=index). Existing databases:
+  -- ALTER TABLE tasks ADD KEY ix_tasks_updated_at (updated_at);
+  KEY ix_tasks_updated_at (updated_at),
+  -- Ranked search for APP_TASK_SEARCH_BACKEND=fulltext. Existing databases:
+  -- ALTER TABLE tasks ADD FULLTEXT KEY ft_tasks_title_statement (title, statement);
+  FULLTEXT KEY ft_tasks_title_statement (title, statement)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_general_ci;
+
+-- Tasks per (subject, topic, difficulty) for GET /api/tasks/facets, updated together with every task write.
+-- The application fills it from tasks on startup while it is empty; scripts/rebuild_task_facets.py recounts it.
+CREATE TABLE IF NOT EXISTS task_facet_counts (
+  subject VARCHAR(80) NOT NULL,
+  topic VARCHAR(120) NOT NULL,
+  difficulty INT NOT NULL,
+  task_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (subject, topic, difficulty)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_general_ci;
 
 CREATE TABLE IF NOT EXISTS submissions (
@@ -43,7 +64,13 @@ CREATE TABLE IF NOT EXISTS submissions (
   duration_ms INT NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
-  KEY ix_submissions_user_id (user_id),
+  -- One answer per user and task; POST /api/tasks/{id}/submit relies on it to reject duplicates.
+  -- Existing databases (keeps the first answer of any duplicates):
+  -- DELETE s FROM submissions s JOIN submissions f
+  --   ON f.user_id = s.user_id AND f.task_id = s.task_id AND f.id < s.id;
+  -- ALTER TABLE submissions ADD UNIQUE KEY uq_submissions_user_task (user_id, task_id),
+  --   DROP INDEX ix_submissions_user_id;
+  UNIQUE KEY uq_submissions_user_task (user_id, task_id),
   KEY ix_submissions_task_id (task_id),
   CONSTRAINT fk_submissions_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
   CONSTRAINT fk_submissions_task FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
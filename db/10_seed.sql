@@ -31,3 +31,7 @@ VALUES
     'YES',
     JSON_ARRAY('Проверьте регистр: сравнение без учета регистра.')
   );
+
+INSERT INTO task_facet_counts (subject, topic, difficulty, task_count)
+SELECT subject, topic, difficulty, COUNT(*) FROM tasks GROUP BY subject, topic, difficulty
+ON DUPLICATE KEY UPDATE task_count = VALUES(task_count);